@@ -0,0 +1,274 @@
+import logging
+import math
+import os
+import sqlite3
+import threading
+import time
+import uuid
+from flask import g, jsonify, request, session
+from cache import LRUCache
+from config import Config
+from metrics import admission_rejections
+from ratelimit import TokenBucket, take_tokens
+
+logger = logging.getLogger(__name__)
+
+# Request admission in front of the blueprints. Each endpoint maps to a class
+# (Config.ADMISSION_ENDPOINT_CLASSES); a class with limits (Config.ADMISSION_LIMITS) gets, in order:
+#   concurrency/max_waiters/      at most `concurrency` in flight; up to max_waiters
+#   queue_timeout                 requests wait up to queue_timeout for a slot,
+#                                 any further ones are shed at once            -> 503
+#   user_rate/user_burst          token bucket per user (or client address)   -> 429
+#   endpoint_rate/endpoint_burst  token bucket shared by all callers          -> 503
+# The slot comes first so a request shed for capacity costs the caller no tokens; a request
+# then rejected by a bucket hands its slot straight back. Shed requests carry Retry-After.
+# A waiting request holds a worker thread, so concurrency + max_waiters per class are sized
+# from Config.WEB_THREADS; classes without limits (cheap reads like /api/auth/me) are never
+# delayed and always find a free thread, so expensive endpoints cannot starve them.
+#
+# ADMISSION_BACKEND 'memory' keeps the state per process; 'sqlite' keeps it in a SQLite file
+# (ADMISSION_SQLITE_PATH) so the limits hold across all worker processes on one host.
+
+class MemoryAdmissionStore:
+    def __init__(self):
+        self._buckets = LRUCache(Config.ADMISSION_MAX_BUCKETS) # Idle per-user buckets age out
+        self._bucket_lock = threading.Lock()
+        self._slots = {}
+        self._waiters = {}
+        self._slots_cond = threading.Condition()
+
+    def take(self, key, rate, capacity):
+        with self._bucket_lock:
+            bucket = self._buckets.get(key)
+            if bucket is None:
+                bucket = TokenBucket(rate, capacity)
+                self._buckets.set(key, bucket)
+        return bucket.try_acquire()
+
+    def acquire_slot(self, name, limit, timeout, max_waiters=None):
+        # max_waiters None means no bound on how many wait
+        deadline = time.monotonic() + timeout
+        with self._slots_cond:
+            if self._slots.get(name, 0) >= limit:
+                if timeout <= 0 or (max_waiters is not None and self._waiters.get(name, 0) >= max_waiters):
+                    return None
+                self._waiters[name] = self._waiters.get(name, 0) + 1
+                try:
+                    while self._slots.get(name, 0) >= limit:
+                        remaining = deadline - time.monotonic()
+                        if remaining <= 0:
+                            return None
+                        self._slots_cond.wait(remaining)
+                finally:
+                    self._waiters[name] -= 1
+            self._slots[name] = self._slots.get(name, 0) + 1
+            return name
+
+    def release_slot(self, name, token):
+        with self._slots_cond:
+            self._slots[name] -= 1
+            self._slots_cond.notify()
+
+class SQLiteAdmissionStore:
+    # Buckets and in-flight slots live in one SQLite file shared by the host's workers. Every
+    # change runs in a BEGIN IMMEDIATE transaction, which serializes writers across processes.
+    # Slots held by a worker that died are reclaimed after ADMISSION_SLOT_TTL seconds, a waiter
+    # row once its queue_timeout has passed, and a bucket row once it has refilled (full_at),
+    # since a missing row means a full bucket.
+    POLL_INTERVAL = 0.02
+
+    def __init__(self, path):
+        self.path = path
+        self._local = threading.local()
+        with self._transaction() as conn:
+            conn.execute("CREATE TABLE IF NOT EXISTS buckets (key TEXT PRIMARY KEY, tokens REAL, updated REAL, full_at REAL)")
+            conn.execute("CREATE INDEX IF NOT EXISTS buckets_by_full_at ON buckets (full_at)")
+            conn.execute("CREATE TABLE IF NOT EXISTS slots (token TEXT PRIMARY KEY, name TEXT, acquired REAL)")
+            conn.execute("CREATE INDEX IF NOT EXISTS slots_by_name ON slots (name, acquired)")
+            conn.execute("CREATE TABLE IF NOT EXISTS waiters (token TEXT PRIMARY KEY, name TEXT, expires REAL)")
+            conn.execute("CREATE INDEX IF NOT EXISTS waiters_by_name ON waiters (name, expires)")
+
+    def _conn(self):
+        conn = getattr(self._local, 'conn', None)
+        if conn is None or self._local.pid != os.getpid():
+            conn = sqlite3.connect(self.path, timeout=5, isolation_level=None)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=OFF") # Limiter state is disposable
+            self._local.conn, self._local.pid = conn, os.getpid()
+        return conn
+
+    def _transaction(self):
+        store = self
+        class Transaction:
+            def __enter__(self):
+                self.conn = store._conn()
+                self.conn.execute("BEGIN IMMEDIATE")
+                return self.conn
+            def __exit__(self, exc_type, exc, tb):
+                self.conn.execute("ROLLBACK" if exc_type else "COMMIT")
+        return Transaction()
+
+    def take(self, key, rate, capacity):
+        now = time.time() # Wall clock: monotonic clocks are not comparable across processes
+        with self._transaction() as conn:
+            conn.execute("DELETE FROM buckets WHERE full_at < ?", (now,))
+            row = conn.execute("SELECT tokens, updated FROM buckets WHERE key = ?", (key,)).fetchone()
+            tokens, updated = row if row else (capacity, now)
+            acquired, wait, tokens = take_tokens(tokens, updated, now, rate, capacity)
+            conn.execute("INSERT OR REPLACE INTO buckets (key, tokens, updated, full_at) VALUES (?, ?, ?, ?)",
+                         (key, tokens, now, now + (capacity - tokens) / rate))
+        return acquired, wait
+
+    def _try_slot(self, name, limit):
+        now = time.time()
+        with self._transaction() as conn:
+            conn.execute("DELETE FROM slots WHERE name = ? AND acquired < ?", (name, now - Config.ADMISSION_SLOT_TTL))
+            (in_flight,) = conn.execute("SELECT COUNT(*) FROM slots WHERE name = ?", (name,)).fetchone()
+            if in_flight >= limit:
+                return None
+            token = uuid.uuid4().hex
+            conn.execute("INSERT INTO slots (token, name, acquired) VALUES (?, ?, ?)", (token, name, now))
+            return token
+
+    def _join_queue(self, name, max_waiters, timeout):
+        now = time.time()
+        with self._transaction() as conn:
+            conn.execute("DELETE FROM waiters WHERE name = ? AND expires < ?", (name, now))
+            (waiting,) = conn.execute("SELECT COUNT(*) FROM waiters WHERE name = ?", (name,)).fetchone()
+            if max_waiters is not None and waiting >= max_waiters:
+                return None
+            token = uuid.uuid4().hex
+            conn.execute("INSERT INTO waiters (token, name, expires) VALUES (?, ?, ?)", (token, name, now + timeout))
+            return token
+
+    def acquire_slot(self, name, limit, timeout, max_waiters=None):
+        deadline = time.monotonic() + timeout
+        token = self._try_slot(name, limit)
+        if token is not None or timeout <= 0:
+            return token
+        waiter = self._join_queue(name, max_waiters, timeout)
+        if waiter is None:
+            return None
+        try:
+            while True:
+                time.sleep(min(self.POLL_INTERVAL, max(0.0, deadline - time.monotonic())))
+                token = self._try_slot(name, limit)
+                if token is not None or time.monotonic() >= deadline:
+                    return token
+        finally:
+            with self._transaction() as conn:
+                conn.execute("DELETE FROM waiters WHERE token = ?", (waiter,))
+
+    def release_slot(self, name, token):
+        with self._transaction() as conn:
+            conn.execute("DELETE FROM slots WHERE token = ?", (token,))
+
+def create_store(backend=None):
+    backend = backend or Config.ADMISSION_BACKEND
+    if backend == 'sqlite':
+        return SQLiteAdmissionStore(Config.ADMISSION_SQLITE_PATH)
+    return MemoryAdmissionStore()
+
+_store = None
+_store_lock = threading.Lock()
+
+def get_store():
+    global _store
+    if _store is None:
+        with _store_lock:
+            if _store is None:
+                _store = create_store()
+    return _store
+
+def admit(endpoint, caller):
+    # Runs the checks for one request. Returns (rejection, slot): rejection is None or
+    # (status, message, Retry-After seconds); a slot must be handed back with release().
+    # Blocks while waiting for a concurrency slot, so async callers run it in a thread.
+    endpoint_class = Config.ADMISSION_ENDPOINT_CLASSES.get(endpoint)
+    limits = Config.ADMISSION_LIMITS.get(endpoint_class)
+    if not limits:
+        return None, None
+    store = get_store()
+    slot = None
+    if limits.get('concurrency'):
+        timeout = limits.get('queue_timeout', 0)
+        token = store.acquire_slot(endpoint_class, limits['concurrency'], timeout, limits.get('max_waiters'))
+        if token is None:
+            return _shed(503, "Server busy, try again later", max(timeout, 1), endpoint_class, 'concurrency'), None
+        slot = (endpoint_class, token)
+    rejection = None
+    if limits.get('user_rate'):
+        acquired, wait = store.take(f"user:{endpoint_class}:{caller}", limits['user_rate'],
+                                    limits.get('user_burst', limits['user_rate']))
+        if not acquired:
+            rejection = _shed(429, "Too many requests, slow down", wait, endpoint_class, 'user_rate')
+    if rejection is None and limits.get('endpoint_rate'):
+        acquired, wait = store.take(f"endpoint:{endpoint_class}", limits['endpoint_rate'],
+                                    limits.get('endpoint_burst', limits['endpoint_rate']))
+        if not acquired:
+            rejection = _shed(503, "Server busy, try again later", wait, endpoint_class, 'endpoint_rate')
+    if rejection is not None:
+        release(slot)
+        return rejection, None
+    return None, slot
+
+def release(slot):
+    if slot is not None:
+        get_store().release_slot(*slot)
+
+def _shed(status, message, retry_after, endpoint_class, reason):
+    admission_rejections.inc((endpoint_class, reason))
+    retry_after = retry_after if math.isfinite(retry_after) else Config.ADMISSION_MAX_RETRY_AFTER
+    return status, message, max(1, min(math.ceil(retry_after), Config.ADMISSION_MAX_RETRY_AFTER))
+
+def _response(rejection):
+    status, message, retry_after = rejection
+    return jsonify({"message": message}), status, {"Retry-After": str(retry_after)}
+
+def _admit():
+    rejection, g.admission_slot = admit(request.endpoint, session.get('user_id') or request.remote_addr)
+    if rejection:
+        return _response(rejection)
+    return None
+
+def _release(exc=None):
+    release(g.pop('admission_slot', None))
+
+def _check_thread_budget():
+    # Running and waiting requests of the limited classes must not be able to take every thread
+    limits = Config.ADMISSION_LIMITS.values()
+    held = sum(l.get('concurrency', 0) + (l.get('max_waiters') or 0) for l in limits)
+    if held >= Config.WEB_THREADS or any(l.get('concurrency') and l.get('max_waiters') is None for l in limits):
+        logger.warning("Admission limits can hold all %d WEB_THREADS (concurrency + max_waiters = %d); "
+                       "unlimited endpoints may queue behind them", Config.WEB_THREADS, held)
+
+def init_admission(app):
+    if not app.config.get('ADMISSION_ENABLED'):
+        return
+    _check_thread_budget()
+    app.before_request(_admit)
+    app.teardown_request(_release)
+
+def init_async_admission(app):
+    # The same checks for the Quart app in asgi.py; endpoint names match routes.py, and the
+    # store is shared with the Flask app in the same process. Store calls may block (slot
+    # queueing, SQLite locks), so they run off the event loop.
+    if not app.config.get('ADMISSION_ENABLED'):
+        return
+    import asyncio
+    from quart import g as async_g, jsonify as async_jsonify, request as async_request, session as async_session
+
+    @app.before_request
+    async def admit_async():
+        caller = async_session.get('user_id') or async_request.remote_addr
+        rejection, async_g.admission_slot = await asyncio.to_thread(admit, async_request.endpoint, caller)
+        if rejection:
+            status, message, retry_after = rejection
+            return async_jsonify({"message": message}), status, {"Retry-After": str(retry_after)}
+        return None
+
+    @app.teardown_request
+    async def release_async(exc=None):
+        slot = async_g.pop('admission_slot', None)
+        if slot is not None:
+            await asyncio.to_thread(release, slot)
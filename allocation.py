@@ -0,0 +1,226 @@
+import uuid
+from datetime import datetime
+import numpy as np
+from pymongo import InsertOne
+from database import db
+from config import Config
+from geo import EARTH_RADIUS_KM, to_lng_lat
+
+# Batch supply/demand allocation. For each produce type, active listings (supply) are assigned
+# to active buyer requests (demand) to minimise price + transport cost:
+#   1. listings and requests are bucketed into a km grid; only pairs in neighbouring cells within
+#      ALLOCATION_MAX_DISTANCE_KM are costed, block by block, so no dense matrix is ever built;
+#      where a cell's neighbourhood holds more than ALLOCATION_MAX_CANDIDATES_PER_CELL requests, its
+#      listings are split into ALLOCATION_CANDIDATE_CELL_KM sub-cells that each cost only their
+#      nearest requests, so a dense region costs O(listings x candidates) pairs, not O(listings x requests);
+#   2. each listing keeps its ALLOCATION_MAX_EDGES_PER_LISTING cheapest feasible edges;
+#   3. the sparse transport problem is solved with the least-cost (matrix minimum) rule:
+#      edges are filled in cost order with as much quantity as both sides still have.
+# Results go to `allocations`; `allocation_runs` points each produce type at its current run.
+
+LISTING_FIELDS = {"farmer_id": 1, "quantity": 1, "unit": 1, "price_per_unit": 1, "location": 1,
+                  "available_from": 1, "available_until": 1}
+REQUEST_FIELDS = {"buyer_id": 1, "quantity_needed": 1, "unit": 1, "target_price_per_unit": 1,
+                  "delivery_location": 1, "needed_by": 1}
+
+def _float(value, default=np.nan):
+    try:
+        return float(value)
+    except (TypeError, ValueError):
+        return default
+
+def _day(value):
+    if isinstance(value, datetime):
+        return np.datetime64(value.date(), 'D')
+    try:
+        return np.datetime64(str(value)[:10], 'D')
+    except ValueError:
+        return np.datetime64('NaT')
+
+def _load(collection, query, fields, location_field, quantity_field, price_field):
+    # Columnar arrays for one side of the market; documents without a usable location or quantity are skipped
+    ids, owners, lng, lat, qty, price, units, start, end = [], [], [], [], [], [], [], [], []
+    owner_field = 'farmer_id' if 'farmer_id' in fields else 'buyer_id'
+    for doc in collection.find(query, fields).batch_size(5000):
+        point = to_lng_lat(doc.get(location_field))
+        quantity = _float(doc.get(quantity_field), 0.0)
+        if not point or quantity <= 0:
+            continue
+        ids.append(doc['_id'])
+        owners.append(doc.get(owner_field))
+        lng.append(point[0])
+        lat.append(point[1])
+        qty.append(quantity)
+        price.append(_float(doc.get(price_field)))
+        units.append(str(doc.get('unit', '')).strip().lower())
+        start.append(_day(doc.get('available_from')))
+        end.append(_day(doc.get('needed_by', doc.get('available_until'))))
+    return {
+        "ids": ids, "owners": owners,
+        "lng": np.array(lng, dtype=np.float64), "lat": np.array(lat, dtype=np.float64),
+        "qty": np.array(qty, dtype=np.float64), "price": np.array(price, dtype=np.float64),
+        "units": units, "start": np.array(start, dtype='datetime64[D]'), "end": np.array(end, dtype='datetime64[D]')
+    }
+
+def _project(side, lat0):
+    # Equirectangular projection around lat0 in km. Distances stay within ~1% while the data
+    # spans a few degrees of latitude (one country's market) and cost a fraction of haversine.
+    x = np.radians(side['lng']) * np.cos(np.radians(lat0)) * EARTH_RADIUS_KM
+    y = np.radians(side['lat']) * EARTH_RADIUS_KM
+    return x.astype(np.float32), y.astype(np.float32)
+
+def _grid(x, y, cell_km):
+    # Integer km cells -> {cell: indices}
+    cells = np.stack([np.floor(x / cell_km), np.floor(y / cell_km)], axis=1).astype(np.int64)
+    if not len(cells):
+        return {}
+    keys, inverse = np.unique(cells, axis=0, return_inverse=True)
+    inverse = inverse.reshape(-1)
+    order = np.argsort(inverse, kind='stable')
+    bounds = np.cumsum(np.bincount(inverse, minlength=len(keys)))
+    groups, begin = {}, 0
+    for key, end in zip(map(tuple, keys.tolist()), bounds.tolist()):
+        groups[key] = order[begin:end]
+        begin = end
+    return groups
+
+def _candidate_groups(l_idx, r_idx, lx, ly, rx, ry, max_candidates, candidate_cell_km):
+    # Yields (listings, requests) pairs to cost. Cost is listing price + distance, so the cheap
+    # requests for a listing are its nearest ones; crowded cells keep those per sub-cell.
+    if len(r_idx) <= max_candidates:
+        yield l_idx, r_idx
+        return
+    for (sx, sy), members in _grid(lx[l_idx], ly[l_idx], candidate_cell_km).items():
+        centre_x, centre_y = (sx + 0.5) * candidate_cell_km, (sy + 0.5) * candidate_cell_km
+        dist = np.hypot(rx[r_idx] - centre_x, ry[r_idx] - centre_y)
+        yield l_idx[members], r_idx[np.argpartition(dist, max_candidates - 1)[:max_candidates]]
+
+def candidate_edges(listings, requests, max_km, cell_km, max_edges, max_candidates, candidate_cell_km,
+                    block_size, cost_per_km, price_tolerance):
+    lat0 = float(np.mean(np.concatenate([listings['lat'], requests['lat']])))
+    lx, ly = _project(listings, lat0)
+    rx, ry = _project(requests, lat0)
+    listing_cells = _grid(lx, ly, cell_km)
+    request_cells = _grid(rx, ry, cell_km)
+    ring = int(np.ceil(max_km / cell_km))
+    offsets = [(dx, dy) for dx in range(-ring, ring + 1) for dy in range(-ring, ring + 1)]
+    unit_codes = {}
+    listing_units = np.array([unit_codes.setdefault(u, len(unit_codes)) for u in listings['units']], dtype=np.int64)
+    request_units = np.array([unit_codes.setdefault(u, len(unit_codes)) for u in requests['units']], dtype=np.int64)
+    # Unpriced listings stay NaN, which fails every price comparison below: they are never allocated
+    listing_price = listings['price'].astype(np.float32)
+    request_ceiling = np.where(np.isnan(requests['price']), np.inf,
+                               requests['price'] * (1 + price_tolerance)).astype(np.float32)
+
+    edge_l, edge_r, edge_cost, edge_dist = [], [], [], []
+    for (cx, cy), cell_listings in listing_cells.items():
+        neighbours = [request_cells[(cx + dx, cy + dy)] for dx, dy in offsets if (cx + dx, cy + dy) in request_cells]
+        if not neighbours:
+            continue
+        for l_idx, r_idx in _candidate_groups(cell_listings, np.concatenate(neighbours), lx, ly, rx, ry,
+                                              max_candidates, candidate_cell_km):
+            rows = max(1, block_size // len(r_idx)) # Bound each distance block to ~block_size pairs
+            for begin in range(0, len(l_idx), rows):
+                li = l_idx[begin:begin + rows]
+                dist = np.hypot(lx[li, None] - rx[None, r_idx], ly[li, None] - ry[None, r_idx])
+                cost = listing_price[li, None] + cost_per_km * dist
+                feasible = (
+                    (dist <= max_km)
+                    & (listing_units[li, None] == request_units[None, r_idx])
+                    & (listing_price[li, None] <= request_ceiling[None, r_idx])
+                    # Listing must be available by the time the buyer needs the produce
+                    & ~(listings['start'][li, None] > requests['end'][None, r_idx])
+                )
+                cost = np.where(feasible, cost, np.inf)
+                if cost.shape[1] > max_edges:
+                    keep = np.argpartition(cost, max_edges - 1, axis=1)[:, :max_edges]
+                else:
+                    keep = np.broadcast_to(np.arange(cost.shape[1]), cost.shape)
+                kept_cost = np.take_along_axis(cost, keep, axis=1)
+                kept_dist = np.take_along_axis(dist, keep, axis=1)
+                mask = np.isfinite(kept_cost)
+                edge_l.append(np.broadcast_to(li[:, None], keep.shape)[mask])
+                edge_r.append(r_idx[keep][mask])
+                edge_cost.append(kept_cost[mask])
+                edge_dist.append(kept_dist[mask])
+    if not edge_l:
+        empty = np.array([], dtype=np.int64)
+        return empty, empty, np.array([]), np.array([])
+    return np.concatenate(edge_l), np.concatenate(edge_r), np.concatenate(edge_cost), np.concatenate(edge_dist)
+
+def solve_least_cost(supply, demand, edge_l, edge_r, edge_cost):
+    # Fills edges cheapest first; returns (edge index, quantity) pairs
+    supply = supply.tolist()
+    demand = demand.tolist()
+    order = np.argsort(edge_cost, kind='stable')
+    assignments = []
+    for e, l, r in zip(order.tolist(), edge_l[order].tolist(), edge_r[order].tolist()):
+        quantity = min(supply[l], demand[r])
+        if quantity <= 0:
+            continue
+        supply[l] -= quantity
+        demand[r] -= quantity
+        assignments.append((e, quantity))
+    return assignments
+
+def allocate_produce_type(produce_type, run_id, now):
+    listings = _load(db.produce_listings, {"produce_type": produce_type, "is_active": True},
+                     LISTING_FIELDS, 'location', 'quantity', 'price_per_unit')
+    requests = _load(db.buyer_requests, {"produce_type": produce_type, "is_active": True},
+                     REQUEST_FIELDS, 'delivery_location', 'quantity_needed', 'target_price_per_unit')
+    stats = {"listings": len(listings['ids']), "requests": len(requests['ids']), "edges": 0,
+             "allocations": 0, "quantity": 0.0}
+    if not listings['ids'] or not requests['ids']:
+        return stats
+
+    edge_l, edge_r, edge_cost, edge_dist = candidate_edges(
+        listings, requests,
+        max_km=Config.ALLOCATION_MAX_DISTANCE_KM, cell_km=Config.ALLOCATION_CELL_KM,
+        max_edges=Config.ALLOCATION_MAX_EDGES_PER_LISTING,
+        max_candidates=Config.ALLOCATION_MAX_CANDIDATES_PER_CELL,
+        candidate_cell_km=Config.ALLOCATION_CANDIDATE_CELL_KM, block_size=Config.ALLOCATION_BLOCK_SIZE,
+        cost_per_km=Config.ALLOCATION_COST_PER_KM, price_tolerance=Config.ALLOCATION_PRICE_TOLERANCE
+    )
+    stats['edges'] = len(edge_l)
+    ops = []
+    for e, quantity in solve_least_cost(listings['qty'], requests['qty'], edge_l, edge_r, edge_cost):
+        l, r = int(edge_l[e]), int(edge_r[e])
+        price = listings['price'][l]
+        ops.append(InsertOne({
+            "run_id": run_id, "produce_type": produce_type,
+            "listing_id": str(listings['ids'][l]), "farmer_id": listings['owners'][l],
+            "request_id": str(requests['ids'][r]), "buyer_id": requests['owners'][r],
+            "quantity": quantity, "unit": listings['units'][l],
+            "price_per_unit": float(price),
+            "distance_km": round(float(edge_dist[e]), 3), "cost_per_unit": round(float(edge_cost[e]), 4),
+            "created_at": now
+        }))
+        stats['quantity'] += quantity
+        if len(ops) >= 1000:
+            db.allocations.bulk_write(ops, ordered=False)
+            ops = []
+    if ops:
+        db.allocations.bulk_write(ops, ordered=False)
+    stats['allocations'] = db.allocations.count_documents({"run_id": run_id, "produce_type": produce_type})
+    return stats
+
+def run_allocation(produce_types=None):
+    run_id = uuid.uuid4().hex
+    started_at = datetime.utcnow()
+    # Produce types with a previous run are included even when nothing is active any more, so
+    # their allocations are cleared instead of served from a stale run
+    produce_types = produce_types or sorted(
+        set(db.produce_listings.distinct("produce_type", {"is_active": True}))
+        | set(db.allocation_runs.distinct("_id"))
+    )
+    stats = {}
+    for produce_type in produce_types:
+        stats[produce_type] = allocate_produce_type(produce_type, run_id, started_at)
+        # Readers follow allocation_runs, so a produce type switches to the new run in one write;
+        # its previous allocations are dropped afterwards
+        db.allocation_runs.update_one({"_id": produce_type}, {"$set": {
+            "run_id": run_id, "started_at": started_at, "finished_at": datetime.utcnow(),
+            "stats": stats[produce_type]
+        }}, upsert=True)
+        db.allocations.delete_many({"produce_type": produce_type, "run_id": {"$ne": run_id}})
+    return run_id, stats
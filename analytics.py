@@ -0,0 +1,116 @@
+import math
+import numpy as np
+from cache import LRUCache
+from config import Config
+from database import db
+import versions
+
+# Rolling price statistics over the daily rollups (one document per produce/region/day), loaded
+# as columnar NumPy arrays with one query per (produce_type, region). Results are cached per
+# (produce_type, region, window), and regional spreads once per produce type, until the
+# market_prices version moves (see versions.py).
+_cache = LRUCache(Config.ANALYTICS_CACHE_SIZE, Config.ANALYTICS_CACHE_TTL)
+
+def load_series(produce_type, region):
+    cursor = db.market_price_rollups.find(
+        {"produce_type": produce_type, "region": region, "period": "day"},
+        {"_id": 0, "period_start": 1, "close": 1}
+    ).sort("period_start", 1)
+    rows = [(doc['period_start'], doc['close']) for doc in cursor]
+    days = np.array([r[0] for r in rows], dtype='datetime64[D]')
+    close = np.fromiter((r[1] for r in rows), dtype=np.float64, count=len(rows))
+    return days, close
+
+def _positive(values):
+    # Ingest accepts a price of 0; leave such closes out of logs and ratios instead of producing inf
+    return np.where(values > 0, values, np.nan)
+
+def moving_average(values, window):
+    out = np.full(len(values), np.nan)
+    if len(values) >= window:
+        csum = np.cumsum(np.insert(values, 0, 0.0))
+        out[window - 1:] = (csum[window:] - csum[:-window]) / window
+    return out
+
+def rolling_volatility(values, window):
+    # Standard deviation of daily log returns over the trailing window
+    out = np.full(len(values), np.nan)
+    if len(values) > window:
+        returns = np.diff(np.log(_positive(values)))
+        windows = np.lib.stride_tricks.sliding_window_view(returns, window)
+        out[window:] = windows.std(axis=1, ddof=1) if window > 1 else 0.0
+    return out
+
+def pct_change(values, window):
+    out = np.full(len(values), np.nan)
+    if len(values) > window:
+        out[window:] = values[window:] / _positive(values[:-window]) - 1
+    return out
+
+def _last(values):
+    return None if not len(values) or not np.isfinite(values[-1]) else round(float(values[-1]), 6)
+
+def _regional_spreads(produce_type, version):
+    cached = _cache.get(('spreads', produce_type))
+    if cached is not None and cached[0] == version:
+        return cached[1]
+    spreads = _compute_regional_spreads(produce_type)
+    _cache.set(('spreads', produce_type), (version, spreads))
+    return spreads
+
+def _compute_regional_spreads(produce_type):
+    # Latest close per region and its spread against the cross-region mean on common days
+    regions = db.market_price_rollups.distinct("region", {"produce_type": produce_type, "period": "day"})
+    series = {region: load_series(produce_type, region) for region in regions}
+    series = {region: s for region, s in series.items() if len(s[0])}
+    if not series:
+        return {}
+    all_days = np.unique(np.concatenate([days for days, _ in series.values()]))
+    matrix = np.full((len(series), len(all_days)), np.nan)
+    for row, (days, close) in enumerate(series.values()):
+        matrix[row, np.searchsorted(all_days, days)] = close
+    # Carry each region's last known price forward so sparse regions stay comparable
+    valid = ~np.isnan(matrix)
+    index = np.where(valid, np.arange(len(all_days)), 0)
+    np.maximum.accumulate(index, axis=1, out=index)
+    filled = matrix[np.arange(len(series))[:, None], index]
+    filled[~np.maximum.accumulate(valid, axis=1)] = np.nan
+    latest = filled[:, -1]
+    mean = np.nanmean(latest)
+    return {
+        "as_of": str(all_days[-1]),
+        "mean": round(float(mean), 6),
+        "max_spread": round(float(np.nanmax(latest) - np.nanmin(latest)), 6),
+        "regions": {region: {"close": _last(filled[row]), "spread": round(float(latest[row] - mean), 6)}
+                    for row, region in enumerate(series)}
+    }
+
+def price_analytics(produce_type, region, window=7, points=90):
+    key = (produce_type, region, window)
+    version = versions.current('market_prices')
+    cached = _cache.get(key)
+    if cached is not None and cached[0] == version:
+        result = cached[1]
+    else:
+        days, close = load_series(produce_type, region)
+        ma = moving_average(close, window)
+        vol = rolling_volatility(close, window)
+        change = pct_change(close, window)
+        result = {
+            "produce_type": produce_type, "region": region, "window": window,
+            "observations": len(close),
+            "latest": {"date": str(days[-1]) if len(days) else None, "close": _last(close),
+                       "moving_average": _last(ma), "volatility": _last(vol), "pct_change": _last(change)},
+            "series": {"date": days.astype(str).tolist(),
+                       "close": close.round(6).tolist(),
+                       "moving_average": np.round(ma, 6).tolist(),
+                       "volatility": np.round(vol, 6).tolist(),
+                       "pct_change": np.round(change, 6).tolist()},
+            "regional_spreads": _regional_spreads(produce_type, version)
+        }
+        _cache.set(key, (version, result))
+    # Trim the series per request without touching the cached copy
+    series = {name: values[-points:] for name, values in result['series'].items()}
+    series = {name: [None if isinstance(v, float) and not math.isfinite(v) else v for v in values] # NaN/inf -> null
+              for name, values in series.items()}
+    return dict(result, series=series)
@@ -1,31 +1,43 @@
 from flask import Flask
-from flask_session import Session # For session management
 from config import Config
-from routes import auth_bp, produce_bp, market_bp, buyer_bp
-from database import db # Ensure database connection is initialized
+from json_provider import MongoJSONProvider
+import database
+from metrics import init_metrics
+from admission import init_admission
+from sessions import init_sessions
+from expiry import start_sweeper
 
-app = Flask(__name__)
-app.config.from_object(Config)
+def create_app(config_class=Config):
+    # No database calls happen here: the Mongo client is created lazily per process and
+    # indexes are created out of band with `python manage.py migrate`.
+    app = Flask(__name__)
+    app.config.from_object(config_class)
+    app.json = MongoJSONProvider(app) # Encodes ObjectId, datetime and Decimal128 directly
+    database.configure(app.config)
 
-# Initialize Flask-Session
-Session(app)
+    # Filesystem (Flask-Session), Mongo-backed or signed-cookie sessions, per SESSION_TYPE
+    init_sessions(app)
 
-# Register blueprints
-app.register_blueprint(auth_bp)
-app.register_blueprint(produce_bp)
-app.register_blueprint(market_bp)
-app.register_blueprint(buyer_bp)
+    # Register blueprints
+    from routes import auth_bp, produce_bp, market_bp, buyer_bp
+    app.register_blueprint(auth_bp)
+    app.register_blueprint(produce_bp)
+    app.register_blueprint(market_bp)
+    app.register_blueprint(buyer_bp)
 
-@app.route('/')
-def index():
-    return "Agritech Market Match Backend is Running!"
+    init_metrics(app) # Per-route latency, Mongo command tracing and /metrics
+    init_admission(app) # Per-user/endpoint rate limits and concurrency caps; sheds with 429/503
 
-if __name__ == '__main__':
-    # Ensure MongoDB indexes are created/updated on startup
-    # (This is handled in database.py when 'db' is accessed)
-    print("Connecting to MongoDB and ensuring indexes...")
-    # Accessing 'db' ensures the connection and index creation happens
-    # You might want a more explicit check or migration system for production
-    db.users.find_one({}) # A simple query to force connection
+    if app.config.get('EXPIRY_SWEEP_INTERVAL'):
+        start_sweeper(app.config['EXPIRY_SWEEP_INTERVAL'])
+
+    @app.route('/')
+    def index():
+        return "Agritech Market Match Backend is Running!"
+
+    return app
 
+app = create_app() # For `flask run` and `gunicorn app:app`
+
+if __name__ == '__main__':
     app.run(debug=True, port=5000) # debug=True for development, set to False for production
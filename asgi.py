@@ -0,0 +1,152 @@
+import asyncio
+import io
+from datetime import datetime
+from functools import partial
+from itsdangerous import BadSignature, Signer
+from quart import Quart
+from quart.sessions import SessionInterface, SecureCookieSession
+from werkzeug.exceptions import HTTPException
+from hypercorn.app_wrappers import InvalidPathError, WSGIWrapper, _build_environ
+from config import Config
+from json_provider import MongoJSONProvider
+import async_database
+import database
+from async_database import get_async_db, close_async_client
+
+# Optional ASGI serving mode:
+#   hypercorn asgi:application --workers 4
+# Requests for the routes in async_routes.py are handled by a Quart app on Motor; every other
+# request falls through to the regular Flask app, run on the event loop's thread pool. Both read
+# the same session cookie, so SESSION_TYPE must be 'mongodb' or 'signed' (filesystem sessions
+# are only readable through Flask-Session). `gunicorn app:app` remains the WSGI mode.
+# Flask requests get a wsgi.input that reads the ASGI body as the route consumes it (see
+# StreamingWSGIWrapper), so uploads such as /api/market/bulk stream as they do under gunicorn.
+
+class AsyncMongoSessionInterface(SessionInterface):
+    # Reads sessions written by sessions.MongoSessionInterface. The async routes never change
+    # the session (login and logout go through Flask), so nothing is written back here.
+    def _signer(self, app):
+        return Signer(app.secret_key, salt='mongo-session')
+
+    async def open_session(self, app, request):
+        cookie = request.cookies.get(self.get_cookie_name(app))
+        if cookie:
+            try:
+                sid = self._signer(app).unsign(cookie).decode() if app.config.get('SESSION_USE_SIGNER') else cookie
+            except BadSignature:
+                sid = None
+            if sid:
+                doc = await get_async_db().sessions.find_one({"_id": sid, "expires_at": {"$gt": datetime.utcnow()}})
+                if doc:
+                    return SecureCookieSession(doc.get('data'))
+        return SecureCookieSession()
+
+    async def save_session(self, app, session, response):
+        return None
+
+class ReceiveStream(io.RawIOBase):
+    # Blocking reader over ASGI http.request messages, for the WSGI thread. Each read that runs
+    # out of data awaits the next message on the event loop, so the client is only read as fast
+    # as the app consumes the body.
+    def __init__(self, receive, call_soon):
+        self._receive = receive
+        self._call_soon = call_soon
+        self._pending = b''
+        self._done = False
+
+    def readable(self):
+        return True
+
+    def readinto(self, buffer):
+        while not self._pending and not self._done:
+            message = self._call_soon(self._receive)
+            self._pending = message.get('body', b'')
+            self._done = not message.get('more_body', False) # Also ends on http.disconnect
+        size = min(len(buffer), len(self._pending))
+        buffer[:size] = self._pending[:size]
+        self._pending = self._pending[size:]
+        return size
+
+class StreamingWSGIWrapper(WSGIWrapper):
+    # hypercorn's WSGIWrapper reads the whole body into memory before calling the app and answers
+    # 400 past max_body_size (64 KiB by default), which breaks bulk uploads; this one passes the
+    # body through ReceiveStream instead
+    def __init__(self, app):
+        super().__init__(app, max_body_size=None)
+
+    async def handle_http(self, scope, receive, send, sync_spawn, call_soon):
+        try:
+            environ = _build_environ(scope, b'')
+        except InvalidPathError:
+            await send({"type": "http.response.start", "status": 404, "headers": []})
+        else:
+            environ['wsgi.input'] = io.BufferedReader(ReceiveStream(receive, call_soon))
+            environ['wsgi.input_terminated'] = True # Read to EOF, with or without Content-Length
+            await sync_spawn(self.run_app, environ, partial(call_soon, send))
+        await send({"type": "http.response.body", "body": b"", "more_body": False})
+
+def wsgi_to_asgi(wsgi_app):
+    # Same threading as hypercorn's AsyncioWSGIMiddleware: the app runs on the loop's default
+    # executor and hops back onto the loop to receive and send
+    wrapper = StreamingWSGIWrapper(wsgi_app)
+
+    async def app(scope, receive, send):
+        loop = asyncio.get_running_loop()
+
+        def call_soon(func, *args):
+            return asyncio.run_coroutine_threadsafe(func(*args), loop).result()
+
+        await wrapper(scope, receive, send, partial(loop.run_in_executor, None), call_soon)
+    return app
+
+def create_async_app(config_class=Config):
+    if config_class.SESSION_TYPE not in ('mongodb', 'signed'):
+        raise RuntimeError("ASGI mode needs SESSION_TYPE 'mongodb' or 'signed'")
+    app = Quart(__name__)
+    app.config.from_object(config_class)
+    app.json = MongoJSONProvider(app)
+    async_database.configure(app.config)
+    database.configure(app.config) # Sync helpers the async routes run in threads
+    if config_class.SESSION_TYPE == 'mongodb':
+        app.session_interface = AsyncMongoSessionInterface()
+    # 'signed' uses Quart's default cookie session, which reads Flask's signed cookie as-is
+
+    from async_routes import auth_bp, produce_bp, market_bp, buyer_bp
+    app.register_blueprint(auth_bp)
+    app.register_blueprint(produce_bp)
+    app.register_blueprint(market_bp)
+    app.register_blueprint(buyer_bp)
+
+    from admission import init_async_admission
+    init_async_admission(app) # Same limits as the Flask app for the endpoints served here
+
+    @app.after_serving
+    async def shutdown():
+        close_async_client()
+
+    return app
+
+def create_asgi_app(config_class=Config):
+    from app import create_app
+    async_app = create_async_app(config_class)
+    flask_app = create_app(config_class)
+    wsgi_app = wsgi_to_asgi(flask_app)
+    # Routing is decided by the Flask url map, so e.g. /api/produce/nearby is not mistaken for
+    # /api/produce/<id>; a request goes async when the endpoint it resolves to has an async twin
+    adapter = flask_app.url_map.bind('localhost')
+    async_endpoints = set(async_app.view_functions)
+
+    def is_async(scope):
+        try:
+            endpoint, _ = adapter.match(scope['path'], method=scope['method'])
+        except HTTPException:
+            return False
+        return endpoint in async_endpoints
+
+    async def application(scope, receive, send):
+        if scope['type'] == 'lifespan' or (scope['type'] == 'http' and is_async(scope)):
+            return await async_app(scope, receive, send)
+        return await wsgi_app(scope, receive, send)
+    return application
+
+application = create_asgi_app()
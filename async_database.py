@@ -0,0 +1,50 @@
+import asyncio
+from config import Config
+
+# Motor (asyncio MongoDB driver) client for the ASGI mode in asgi.py. Like database.py the
+# client is created lazily; a Motor client is bound to the event loop it first runs on, so one
+# is kept per loop. Settings are the same MONGO_* keys the sync client uses, taken from the app
+# config passed to configure() (create_async_app does this) or from Config.
+SETTINGS = ('MONGO_URI', 'MONGO_MAX_POOL_SIZE', 'MONGO_MIN_POOL_SIZE', 'MONGO_CONNECT_TIMEOUT_MS',
+            'MONGO_SERVER_SELECTION_TIMEOUT_MS', 'MONGO_SOCKET_TIMEOUT_MS', 'MONGO_READ_PREFERENCE')
+_settings = {}
+_clients = {}
+
+def configure(config):
+    # config is a Quart app.config mapping or a Config-like class; clients built from other
+    # settings are dropped and recreated on next use
+    get = config.get if hasattr(config, 'get') else lambda key, default=None: getattr(config, key, default)
+    settings = {key: get(key, getattr(Config, key)) for key in SETTINGS}
+    if settings != _settings:
+        _settings.clear()
+        _settings.update(settings)
+        _clients.clear()
+
+def _create_client():
+    settings = _settings or {key: getattr(Config, key) for key in SETTINGS}
+    if settings['MONGO_URI'].startswith('mongomock://'):
+        # In-memory store for local experiments (optional mongomock-motor dependency)
+        from mongomock_motor import AsyncMongoMockClient
+        return AsyncMongoMockClient(settings['MONGO_URI'].replace('mongomock://', 'mongodb://', 1))
+    from motor.motor_asyncio import AsyncIOMotorClient
+    return AsyncIOMotorClient(
+        settings['MONGO_URI'],
+        maxPoolSize=settings['MONGO_MAX_POOL_SIZE'],
+        minPoolSize=settings['MONGO_MIN_POOL_SIZE'],
+        connectTimeoutMS=settings['MONGO_CONNECT_TIMEOUT_MS'],
+        serverSelectionTimeoutMS=settings['MONGO_SERVER_SELECTION_TIMEOUT_MS'],
+        socketTimeoutMS=settings['MONGO_SOCKET_TIMEOUT_MS'],
+        readPreference=settings['MONGO_READ_PREFERENCE']
+    )
+
+def get_async_db():
+    loop = asyncio.get_running_loop()
+    client = _clients.get(loop)
+    if client is None:
+        client = _clients[loop] = _create_client()
+    return client.get_database() # The database named in MONGO_URI
+
+def close_async_client():
+    client = _clients.pop(asyncio.get_running_loop(), None)
+    if client is not None:
+        client.close()
@@ -0,0 +1,163 @@
+import asyncio
+from functools import wraps
+from bson.errors import InvalidId
+from bson.objectid import ObjectId
+from quart import Blueprint, request, jsonify, session
+from async_database import get_async_db
+from catalog import lookup_produce_type
+from matching import (
+    parse_match_args, requests_query, listings_query, request_ranking, request_matches,
+    listing_ranking, listing_matches, REQUEST_PROJECTION, LISTING_PROJECTION
+)
+from models import user_cache
+from sms_queue import get_sms_queue
+from subscriptions import open_recipients
+
+# Async (Quart + Motor) versions of the I/O-bound endpoints, served by asgi.py. They answer
+# exactly like their counterparts in routes.py; independent Mongo lookups are awaited together
+# and no handler blocks the event loop on the database. Every other route is still served by
+# the Flask app.
+produce_bp = Blueprint('produce', __name__, url_prefix='/api/produce')
+market_bp = Blueprint('market', __name__, url_prefix='/api/market')
+buyer_bp = Blueprint('buyer', __name__, url_prefix='/api/buyer')
+auth_bp = Blueprint('auth', __name__, url_prefix='/api/auth')
+
+def login_required(f):
+    @wraps(f)
+    async def decorated_function(*args, **kwargs):
+        if 'user_id' not in session:
+            return jsonify({"message": "Unauthorized"}), 401
+        return await f(*args, **kwargs)
+    return decorated_function
+
+def _object_id(value):
+    try:
+        return ObjectId(value)
+    except (InvalidId, TypeError):
+        return None
+
+async def get_user(user_id):
+    # Same cache as models.get_cached_user, filled through Motor on a miss
+    user = user_cache.get(user_id)
+    if user is None:
+        user = await get_async_db().users.find_one({"_id": _object_id(user_id)}, {"password": 0})
+        if user is None:
+            return None
+        user_cache.set(user_id, user)
+    return dict(user)
+
+async def session_role():
+    role = session.get('user_type')
+    if role:
+        return role
+    user = await get_user(session['user_id'])
+    return user.get('user_type') if user else None
+
+# --- Auth ---
+@auth_bp.route('/me', methods=['GET'])
+@login_required
+async def get_current_user():
+    # Read fresh, like routes.get_current_user; the user cache only serves role checks
+    user = await get_async_db().users.find_one({"_id": _object_id(session['user_id'])}, {"password": 0})
+    if user:
+        return jsonify(user), 200
+    return jsonify({"message": "User not found"}), 404
+
+# --- Single documents ---
+@produce_bp.route('/<id>', methods=['GET'])
+@login_required
+async def get_single_produce(id):
+    listing = await get_async_db().produce_listings.find_one({"_id": _object_id(id)})
+    if listing:
+        return jsonify(listing), 200
+    return jsonify({"message": "Listing not found"}), 404
+
+@buyer_bp.route('/<id>', methods=['GET'])
+@login_required
+async def get_single_request(id):
+    req = await get_async_db().buyer_requests.find_one({"_id": _object_id(id)})
+    if req:
+        return jsonify(req), 200
+    return jsonify({"message": "Request not found"}), 404
+
+# --- Matching ---
+# The document and the caller's role are fetched concurrently; candidates are then read with
+# one Motor query and streamed through the same bounded ranking as the sync routes.
+@produce_bp.route('/<listing_id>/match', methods=['GET'])
+@login_required
+async def find_matches_for_listing(listing_id):
+    try:
+        limit, offset, max_distance_km = parse_match_args(request.args)
+    except ValueError as e:
+        return jsonify({"message": str(e)}), 400
+    db = get_async_db()
+    listing, role = await asyncio.gather(
+        db.produce_listings.find_one({"_id": _object_id(listing_id)}),
+        session_role()
+    )
+    if role != 'farmer':
+        return jsonify({"message": "Forbidden: Farmer access required"}), 403
+    if not listing:
+        return jsonify({"message": "Listing not found"}), 404
+    if listing['farmer_id'] != session['user_id']:
+        return jsonify({"message": "Forbidden"}), 403
+
+    top = request_ranking(listing, limit, offset, max_distance_km)
+    async for req in db.buyer_requests.find(requests_query(listing), REQUEST_PROJECTION):
+        top.add(req)
+    matches, total = request_matches(top)
+    return jsonify({"message": "Potential matches found", "matches": matches,
+                    "total": total, "limit": limit, "offset": offset}), 200
+
+@buyer_bp.route('/<request_id>/match', methods=['GET'])
+@login_required
+async def find_matches_for_request(request_id):
+    try:
+        limit, offset, max_distance_km = parse_match_args(request.args)
+    except ValueError as e:
+        return jsonify({"message": str(e)}), 400
+    db = get_async_db()
+    req, role = await asyncio.gather(
+        db.buyer_requests.find_one({"_id": _object_id(request_id)}),
+        session_role()
+    )
+    if role != 'buyer':
+        return jsonify({"message": "Forbidden: Buyer access required"}), 403
+    if not req:
+        return jsonify({"message": "Request not found"}), 404
+    if req['buyer_id'] != session['user_id']:
+        return jsonify({"message": "Forbidden"}), 403
+
+    top = listing_ranking(req, limit, offset, max_distance_km)
+    async for listing in db.produce_listings.find(listings_query(req, max_distance_km), LISTING_PROJECTION):
+        top.add(listing)
+    matches, total = listing_matches(top)
+    return jsonify({"message": "Potential matches found", "matches": matches,
+                    "total": total, "limit": limit, "offset": offset}), 200
+
+# --- Price alerts ---
+@market_bp.route('/send_price_alert', methods=['POST'])
+@login_required
+async def send_price_alert_to_farmers():
+    data = await request.get_json()
+    # The catalog lookup may refresh its version from Mongo, so it runs off the event loop
+    try:
+        produce_type = await asyncio.to_thread(lookup_produce_type, data.get('produce_type'))
+    except ValueError as e:
+        return jsonify({"message": str(e)}), 400
+    region = data.get('region')
+    price = data.get('price')
+    unit = data.get('unit')
+
+    if not all([produce_type, region, price, unit]):
+        return jsonify({"message": "Missing required fields for alert"}), 400
+
+    # The first batch is fetched off the event loop; the rest of the same sync cursor is read
+    # lazily by the SMS queue's worker threads, so the list is never materialized
+    recipients = await asyncio.to_thread(open_recipients, produce_type, region)
+    if recipients is None:
+        return jsonify({"message": "No relevant farmers found to send alert"}), 404
+
+    message = f"Agritech Alert: Latest market price for {produce_type} in {region} is {price} {unit}."
+    job_id = get_sms_queue().enqueue(recipients, message, dedupe_key=message)
+    return jsonify({"message": "Price alert queued", "job_id": job_id}), 202
@@ -0,0 +1,111 @@
+from datetime import datetime
+from bson.errors import InvalidId
+from bson.objectid import ObjectId
+from pymongo import InsertOne, UpdateOne
+from pymongo.errors import BulkWriteError
+from config import Config
+from database import db
+from models import (
+    prepare_produce_listing, prepare_listing_update, prepare_buyer_request, prepare_request_update,
+    find_user_profile, LISTING_REQUIRED_FIELDS, REQUEST_REQUIRED_FIELDS, PROTECTED_FIELDS
+)
+import subscriptions
+import versions
+
+# Batched creates, updates and deactivations of one owner's listings or requests:
+#   [{"op": "create", "data": {...}}, {"op": "update", "id": "...", "data": {...}},
+#    {"op": "deactivate", "id": "..."}]
+# All valid operations go to Mongo in one unordered bulk_write with the owner in every update
+# filter. BulkWriteResult only has totals, so the outcome of each write is read back: the owner
+# never changes, so an id found with this owner after the write is one whose write applied (one
+# the owner deletes meanwhile reads as not found, which is where it ends up anyway). One more
+# query tells "not found" from "not yours". Nothing is stamped on the documents, so concurrent
+# batches touching the same documents cannot misreport each other's writes.
+KINDS = {
+    'produce_listings': {"owner": 'farmer_id', "required": LISTING_REQUIRED_FIELDS,
+                         "prepare": prepare_produce_listing, "prepare_update": prepare_listing_update},
+    'buyer_requests': {"owner": 'buyer_id', "required": REQUEST_REQUIRED_FIELDS,
+                       "prepare": prepare_buyer_request, "prepare_update": prepare_request_update},
+}
+OPS = ('create', 'update', 'deactivate')
+
+def _write(kind, owner_id, item, now):
+    # One operation -> (document id, bulk request); raises ValueError for invalid input
+    if not isinstance(item, dict) or item.get('op') not in OPS:
+        raise ValueError(f"op must be one of: {', '.join(OPS)}")
+    data = item.get('data')
+    if item['op'] != 'deactivate' and not isinstance(data, dict):
+        raise ValueError("data must be an object")
+
+    if item['op'] == 'create':
+        missing = [f for f in kind['required'] if f not in data]
+        if missing:
+            raise ValueError(f"Missing required fields: {', '.join(missing)}")
+        doc = kind['prepare']({k: v for k, v in data.items() if k not in PROTECTED_FIELDS})
+        doc.update({"_id": ObjectId(), kind['owner']: owner_id})
+        return doc['_id'], InsertOne(doc)
+
+    try:
+        doc_id = ObjectId(item.get('id'))
+    except (InvalidId, TypeError):
+        raise ValueError("id must be a valid ObjectId")
+    if item['op'] == 'update':
+        update = kind['prepare_update'](data)
+    else:
+        update = {"is_active": False, "updated_at": now}
+    return doc_id, UpdateOne({"_id": doc_id, kind['owner']: owner_id}, {"$set": update})
+
+def apply_batch(collection_name, owner_id, operations):
+    if not isinstance(operations, list) or not operations:
+        raise ValueError("operations must be a non-empty list")
+    if len(operations) > Config.BATCH_MAX_OPERATIONS:
+        raise ValueError(f"At most {Config.BATCH_MAX_OPERATIONS} operations per batch")
+    kind = KINDS[collection_name]
+    collection = db[collection_name]
+    batch_id = ObjectId()
+    now = datetime.utcnow()
+
+    results = []
+    writes, positions = [], [] # Bulk requests and the result each belongs to
+    for index, item in enumerate(operations):
+        result = {"index": index, "op": item.get('op') if isinstance(item, dict) else None}
+        results.append(result)
+        try:
+            result['id'], write = _write(kind, owner_id, item, now)
+        except ValueError as e:
+            result.update(status=400, error=str(e))
+            continue
+        writes.append(write)
+        positions.append(index)
+
+    failed = {}
+    if writes:
+        try:
+            collection.bulk_write(writes, ordered=False)
+        except BulkWriteError as e:
+            for error in e.details.get('writeErrors', []):
+                failed[positions[error['index']]] = error.get('errmsg', 'Write failed')
+
+    # Which writes landed: created documents and updates whose id + owner filter matched
+    pending = [results[i]['id'] for i in positions if i not in failed]
+    applied = {doc['_id']: doc for doc in collection.find({"_id": {"$in": pending}, kind['owner']: owner_id})}
+    missing = [doc_id for doc_id in pending if doc_id not in applied]
+    existing = {doc['_id'] for doc in collection.find({"_id": {"$in": missing}}, {"_id": 1})} if missing else set()
+    for index in positions:
+        result = results[index]
+        if index in failed:
+            result.update(status=500, error=failed[index])
+        elif result['id'] in applied:
+            result['status'] = 201 if result['op'] == 'create' else 200
+        elif result['id'] in existing:
+            result.update(status=403, error="Forbidden: not your document")
+        else:
+            result.update(status=404, error="Not found")
+
+    if applied:
+        versions.bump(collection_name)
+        if collection_name == 'produce_listings':
+            # Created, updated and deactivated listings re-synced in one bulk write
+            subscriptions.sync_listings(applied.values(), find_user_profile(owner_id))
+    return {"batch_id": batch_id, "applied": sum(1 for r in results if r.get('status') in (200, 201)),
+            "failed": sum(1 for r in results if r.get('status') not in (200, 201)), "results": results}
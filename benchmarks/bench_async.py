@@ -0,0 +1,168 @@
+# Concurrent-connection throughput of the WSGI mode (gunicorn gthread, app:app) against the
+# ASGI mode (hypercorn, asgi:application) on the I/O-bound endpoints that have async versions.
+# Both servers run as subprocesses against the same MongoDB; a real mongod is required since
+# the in-memory mongomock store is not shared between processes.
+#   MONGO_URI=mongodb://localhost:27017/bench python benchmarks/bench_async.py --connections 16 64 256
+import argparse
+import asyncio
+import json
+import os
+import random
+import subprocess
+import sys
+import time
+from collections import defaultdict
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from datagen import PASSWORD, generate
+from driver import percentile
+
+MODES = {
+    'wsgi': lambda port, workers, threads: [
+        'gunicorn', '--workers', str(workers), '--threads', str(threads), '--worker-class', 'gthread',
+        '--bind', f'127.0.0.1:{port}', 'app:app'],
+    'asgi': lambda port, workers, threads: [
+        'hypercorn', '--workers', str(workers), '--bind', f'127.0.0.1:{port}', 'asgi:application'],
+}
+
+# (weight, label, role, path builder)
+WORKLOAD = [
+    (4, "GET /api/produce/<listing_id>/match", 'farmer', lambda rng, user: f"/api/produce/{rng.choice(user['owned'])}/match?limit=20"),
+    (3, "GET /api/buyer/<request_id>/match", 'buyer', lambda rng, user: f"/api/buyer/{rng.choice(user['owned'])}/match?limit=20"),
+    (2, "GET /api/produce/<id>", 'farmer', lambda rng, user: f"/api/produce/{rng.choice(user['owned'])}"),
+    (2, "GET /api/auth/me", 'any', lambda rng, user: "/api/auth/me"),
+]
+
+def _wait_for(url, process, timeout=30):
+    import httpx
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        if process.poll() is not None:
+            raise RuntimeError(f"Server exited with {process.returncode}")
+        try:
+            httpx.get(url, timeout=1)
+            return
+        except httpx.TransportError:
+            time.sleep(0.2)
+    raise RuntimeError(f"Server at {url} did not start")
+
+async def _login(client, users):
+    # One Cookie header per user; the shared client's own jar is cleared so sessions don't mix
+    headers = []
+    for user in users:
+        response = await client.post('/api/auth/login', json={"email": user['email'], "password": PASSWORD})
+        if response.status_code != 200:
+            raise RuntimeError(f"Login failed for {user['email']}: {response.status_code}")
+        headers.append({"Cookie": "; ".join(f"{k}={v}" for k, v in response.cookies.items())})
+        client.cookies.clear()
+    return headers
+
+async def load(base_url, users, connections, duration, seed):
+    import httpx
+    limits = httpx.Limits(max_connections=connections, max_keepalive_connections=connections)
+    latencies = defaultdict(list)
+    errors = defaultdict(int)
+    async with httpx.AsyncClient(base_url=base_url, limits=limits, timeout=60) as client:
+        headers = await _login(client, users)
+        deadline = time.perf_counter() + duration
+
+        async def connection(index):
+            rng = random.Random(seed + index)
+            user, cookie = users[index % len(users)], headers[index % len(users)]
+            mix = [w for w in WORKLOAD if w[2] in ('any', user['role'])]
+            weights = [w[0] for w in mix]
+            while time.perf_counter() < deadline:
+                _, label, _, build = rng.choices(mix, weights)[0]
+                start = time.perf_counter()
+                try:
+                    response = await client.get(build(rng, user), headers=cookie)
+                    failed = response.status_code >= 400
+                except httpx.HTTPError:
+                    failed = True
+                latencies[label].append(time.perf_counter() - start)
+                if failed:
+                    errors[label] += 1
+
+        started = time.perf_counter()
+        await asyncio.gather(*(connection(i) for i in range(connections)))
+        elapsed = time.perf_counter() - started
+
+    all_values = sorted(v for values in latencies.values() for v in values)
+    endpoints = {}
+    for label, values in sorted(latencies.items()):
+        values.sort()
+        endpoints[label] = {"count": len(values), "errors": errors[label],
+                            "p50_ms": round(percentile(values, 50) * 1000, 3),
+                            "p99_ms": round(percentile(values, 99) * 1000, 3)}
+    return {"connections": connections, "requests": len(all_values),
+            "errors": sum(errors.values()),
+            "throughput_rps": round(len(all_values) / elapsed, 2),
+            "p50_ms": round(percentile(all_values, 50) * 1000, 3) if all_values else None,
+            "p99_ms": round(percentile(all_values, 99) * 1000, 3) if all_values else None,
+            "endpoints": endpoints}
+
+def main():
+    parser = argparse.ArgumentParser(description="WSGI vs ASGI concurrent-connection benchmark")
+    parser.add_argument('--connections', type=int, nargs='+', default=[16, 64, 256])
+    parser.add_argument('--duration', type=float, default=20, help="Seconds per mode and connection count")
+    parser.add_argument('--workers', type=int, default=2, help="Server processes in both modes")
+    parser.add_argument('--threads', type=int, default=8, help="Threads per gunicorn worker (WSGI mode)")
+    parser.add_argument('--listings', type=int, default=5000)
+    parser.add_argument('--requests', type=int, default=5000)
+    parser.add_argument('--users', type=int, default=64, help="Logged-in farmers and buyers to spread load over")
+    parser.add_argument('--port', type=int, default=8765)
+    parser.add_argument('--seed', type=int, default=42)
+    parser.add_argument('--output', help="Write the JSON report to this file")
+    args = parser.parse_args()
+
+    if os.environ.get('MONGO_URI', '').startswith('mongomock://'):
+        parser.error("bench_async needs a real MongoDB shared by the server processes")
+    env = dict(os.environ, SESSION_TYPE='mongodb', SMS_PROVIDER='local', EXPIRY_SWEEP_INTERVAL='0',
+               ADMISSION_ENABLED='false') # Measure the endpoints, not the load shedding in front of them
+    os.environ.update(env)
+    from config import Config
+    from database import get_client, get_db
+    from migrations import ensure_indexes
+    db = get_db()
+    get_client().drop_database(db.name)
+    ensure_indexes(db)
+    dataset = generate(db, 100, 100, args.listings, args.requests, 0.1, args.seed)
+
+    owned = defaultdict(list)
+    for item in dataset['listings'] + dataset['requests']:
+        owned[item['owner']].append(item['id'])
+    users = ([dict(u, role='farmer', owned=owned[u['id']]) for u in dataset['farmers'] if owned[u['id']]] +
+             [dict(u, role='buyer', owned=owned[u['id']]) for u in dataset['buyers'] if owned[u['id']]])
+    random.Random(args.seed).shuffle(users)
+    users = users[:args.users]
+
+    report = {"meta": {"mongo_uri": Config.MONGO_URI.split('@')[-1], "workers": args.workers,
+                       "threads": args.threads, "duration_s": args.duration,
+                       "listings": args.listings, "requests": args.requests}, "modes": {}}
+    base_url = f"http://127.0.0.1:{args.port}"
+    for mode, command in MODES.items():
+        process = subprocess.Popen(command(args.port, args.workers, args.threads), cwd=ROOT, env=env,
+                                   stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+        try:
+            _wait_for(base_url + '/', process)
+            report['modes'][mode] = [asyncio.run(load(base_url, users, n, args.duration, args.seed))
+                                     for n in args.connections]
+        finally:
+            process.terminate()
+            process.wait()
+
+    report['asgi_vs_wsgi_throughput'] = {
+        str(w['connections']): round(a['throughput_rps'] / w['throughput_rps'], 2) if w['throughput_rps'] else None
+        for w, a in zip(report['modes']['wsgi'], report['modes']['asgi'])
+    }
+    output = json.dumps(report, indent=2)
+    if args.output:
+        with open(args.output, 'w') as f:
+            f.write(output)
+    print(output)
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,67 @@
+# Compares the old list-endpoint serialization (rewrite _id to str in place on the documents
+# pymongo returned, then Flask's default jsonify) with MongoJSONProvider on synthetic produce
+# listings. Each timed run gets freshly built documents, as each request did.
+#   python benchmarks/bench_json.py [items] [repeats]
+import os
+import sys
+import time
+from datetime import datetime, timedelta
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from bson.objectid import ObjectId
+from flask import Flask, jsonify
+from json_provider import MongoJSONProvider, orjson
+
+def make_listings(n):
+    now = datetime.utcnow()
+    return [{
+        "_id": ObjectId(),
+        "farmer_id": str(ObjectId()),
+        "produce_type": "maize",
+        "quantity": 100 + i % 900,
+        "unit": "kg",
+        "price_per_unit": float(30 + i % 20),
+        "available_from": "2024-01-01",
+        "available_until": "2024-12-31",
+        "location": {"type": "Point", "coordinates": [36.8 + i * 1e-4, -1.3]},
+        "is_active": True,
+        "created_at": now - timedelta(minutes=i),
+        "updated_at": now
+    } for i in range(n)]
+
+def timed(fn, items, repeats):
+    best = float('inf')
+    for _ in range(repeats):
+        docs = make_listings(items) # Not timed: stands in for the documents off the cursor
+        start = time.perf_counter()
+        fn(docs)
+        best = min(best, time.perf_counter() - start)
+    return best
+
+def main():
+    items = int(sys.argv[1]) if len(sys.argv) > 1 else 10000
+    repeats = int(sys.argv[2]) if len(sys.argv) > 2 else 5
+
+    legacy_app = Flask('legacy')
+    fast_app = Flask('fast')
+    fast_app.json = MongoJSONProvider(fast_app)
+
+    def legacy(docs):
+        for doc in docs: # What every list handler did before the provider
+            doc['_id'] = str(doc['_id'])
+        with legacy_app.app_context():
+            jsonify(docs).get_data()
+
+    def provider(docs):
+        with fast_app.app_context():
+            jsonify(docs).get_data()
+
+    results = {"items": items, "encoder": "orjson" if orjson else "json"}
+    for name, fn in (("legacy_jsonify", legacy), ("provider_jsonify", provider)):
+        results[name + "_ms"] = round(timed(fn, items, repeats) * 1000, 2)
+    results["speedup"] = round(results["legacy_jsonify_ms"] / results["provider_jsonify_ms"], 2)
+    print(results)
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,56 @@
+# Compares the session backends on the read path (GET /api/auth/me, session unchanged) and
+# the write path (POST /api/auth/login, session rewritten).
+#   MONGO_URI=mongomock://localhost/bench python benchmarks/bench_sessions.py [requests]
+import json
+import os
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from driver import percentile
+
+def bench(session_type, requests):
+    from app import create_app
+    from config import Config
+    from models import create_user, find_user_by_email
+
+    class BenchConfig(Config):
+        SESSION_TYPE = session_type
+        SESSION_FILE_DIR = tempfile.mkdtemp(prefix='bench_sessions_')
+        METRICS_ENABLED = False
+
+    app = create_app(BenchConfig)
+    email = f"session-bench-{session_type}@bench.example"
+    if not find_user_by_email(email):
+        create_user({"email": email, "password": "password", "user_type": "farmer", "name": "Bench",
+                     "contact_number": "+254700000000", "location": "Nakuru"})
+    client = app.test_client()
+    credentials = {"email": email, "password": "password"}
+    client.post('/api/auth/login', json=credentials)
+
+    results = {}
+    for label, call in (("read", lambda: client.get('/api/auth/me')),
+                        ("write", lambda: client.post('/api/auth/login', json=credentials))):
+        timings = []
+        for _ in range(requests):
+            start = time.perf_counter()
+            response = call()
+            timings.append(time.perf_counter() - start)
+            assert response.status_code == 200, response.status_code
+        timings.sort()
+        results[label] = {"mean_ms": round(sum(timings) / len(timings) * 1000, 3),
+                          "p50_ms": round(percentile(timings, 50) * 1000, 3),
+                          "p95_ms": round(percentile(timings, 95) * 1000, 3)}
+    if session_type == 'filesystem':
+        results['session_files'] = len(os.listdir(BenchConfig.SESSION_FILE_DIR))
+    return results
+
+def main():
+    requests = int(sys.argv[1]) if len(sys.argv) > 1 else 500
+    print(json.dumps({t: bench(t, requests) for t in ('filesystem', 'mongodb', 'signed')}, indent=2))
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,150 @@
+# Synthetic marketplace data: farmers, buyers, geolocated listings, buyer requests and
+# years of daily market prices, written straight into the configured database.
+#   python benchmarks/datagen.py --farmers 1000 --buyers 1000 --listings 20000 --requests 20000 --price-years 3
+import argparse
+import hashlib
+import os
+import random
+import sys
+from datetime import datetime, timedelta
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from bson.objectid import ObjectId
+from catalog import canonical_produce_type, seed_catalog
+from geo import geohash_encode
+from price_storage import ensure_series_collection, price_collection, timeseries_enabled, to_stored
+
+PASSWORD = 'password'
+PRODUCE_TYPES = ['maize', 'beans', 'potatoes', 'tomatoes', 'kale', 'onions', 'avocado', 'mangoes']
+UNIT_PRICES = {'maize': 40, 'beans': 110, 'potatoes': 35, 'tomatoes': 60, 'kale': 30, 'onions': 80,
+               'avocado': 25, 'mangoes': 20}
+# Region centres as (lng, lat)
+REGIONS = {
+    'Nakuru': (36.07, -0.30), 'Eldoret': (35.27, 0.51), 'Kisumu': (34.76, -0.09),
+    'Nairobi': (36.82, -1.29), 'Meru': (37.65, 0.05), 'Kitale': (35.00, 1.02),
+    'Machakos': (37.26, -1.52), 'Nyeri': (36.95, -0.42)
+}
+BATCH_SIZE = 1000
+
+def _point(rng, region, spread=0.4):
+    lng, lat = REGIONS[region]
+    return round(lng + rng.uniform(-spread, spread), 5), round(lat + rng.uniform(-spread, spread), 5)
+
+def _insert(collection, docs):
+    for i in range(0, len(docs), BATCH_SIZE):
+        collection.insert_many(docs[i:i + BATCH_SIZE], ordered=False)
+
+def _users(rng, user_type, count, password_hash, now):
+    users = []
+    for i in range(count):
+        region = rng.choice(list(REGIONS))
+        users.append({
+            "_id": ObjectId(), "email": f"{user_type}{i}@bench.example", "password": password_hash,
+            "user_type": user_type, "name": f"{user_type.title()} {i}",
+            "contact_number": f"+2547{rng.randrange(10 ** 8):08d}", "location": region, "created_at": now
+        })
+    return users
+
+def generate(db, farmers=100, buyers=100, listings=2000, requests=2000, price_years=1, seed=42):
+    rng = random.Random(seed)
+    now = datetime.utcnow()
+    today = now.date()
+    password_hash = hashlib.sha256(PASSWORD.encode()).hexdigest()
+    # Stored produce types are catalog ids, as the API writes them (e.g. 'kale' -> 'sukuma-wiki')
+    seed_catalog()
+    canonical = {produce_type: canonical_produce_type(produce_type) for produce_type in PRODUCE_TYPES}
+
+    farmer_docs = _users(rng, 'farmer', farmers, password_hash, now)
+    buyer_docs = _users(rng, 'buyer', buyers, password_hash, now)
+    _insert(db.users, farmer_docs + buyer_docs)
+
+    listing_docs = []
+    for _ in range(listings):
+        farmer = rng.choice(farmer_docs)
+        produce_type = rng.choice(PRODUCE_TYPES)
+        lng, lat = _point(rng, farmer['location'])
+        start = today + timedelta(days=rng.randrange(-30, 30))
+        listing_docs.append({
+            "_id": ObjectId(), "farmer_id": str(farmer['_id']), "produce_type": canonical[produce_type],
+            "quantity": rng.randrange(50, 5000), "unit": "kg",
+            "price_per_unit": round(UNIT_PRICES[produce_type] * rng.uniform(0.7, 1.3), 2),
+            "available_from": start.isoformat(),
+            "available_until": (start + timedelta(days=rng.randrange(7, 90))).isoformat(),
+            "location": {"type": "Point", "coordinates": [lng, lat]},
+            "location_geohash": geohash_encode(lng, lat), "region": farmer['location'],
+            "is_active": True, "created_at": now, "updated_at": now
+        })
+    _insert(db.produce_listings, listing_docs)
+
+    request_docs = []
+    for _ in range(requests):
+        buyer = rng.choice(buyer_docs)
+        produce_type = rng.choice(PRODUCE_TYPES)
+        lng, lat = _point(rng, buyer['location'])
+        request_docs.append({
+            "_id": ObjectId(), "buyer_id": str(buyer['_id']), "produce_type": canonical[produce_type],
+            "quantity_needed": rng.randrange(50, 5000), "unit": "kg",
+            "target_price_per_unit": round(UNIT_PRICES[produce_type] * rng.uniform(0.7, 1.3), 2),
+            "delivery_location": {"type": "Point", "coordinates": [lng, lat]},
+            "is_active": True, "created_at": now, "updated_at": now
+        })
+    _insert(db.buyer_requests, request_docs)
+
+    # Prices go wherever MARKET_PRICE_STORAGE points the app, in the shape it stores them
+    if timeseries_enabled():
+        ensure_series_collection(db)
+    prices = 0
+    days = int(price_years * 365)
+    for produce_type in PRODUCE_TYPES:
+        for region in REGIONS:
+            price = UNIT_PRICES[produce_type]
+            batch = []
+            for d in range(days, 0, -1):
+                price = max(1.0, price * (1 + rng.gauss(0, 0.02))) # Random walk
+                recorded_at = datetime.combine(today - timedelta(days=d), datetime.min.time()) + timedelta(hours=9)
+                batch.append(to_stored({"produce_type": canonical[produce_type], "region": region,
+                                        "price": round(price, 2), "unit": "kg", "recorded_at": recorded_at,
+                                        "date_recorded": recorded_at.date().isoformat()}))
+            _insert(price_collection(db), batch)
+            prices += len(batch)
+
+    return {
+        "farmers": [{"id": str(u['_id']), "email": u['email']} for u in farmer_docs],
+        "buyers": [{"id": str(u['_id']), "email": u['email']} for u in buyer_docs],
+        "listings": [{"id": str(l['_id']), "owner": l['farmer_id']} for l in listing_docs],
+        "requests": [{"id": str(r['_id']), "owner": r['buyer_id']} for r in request_docs],
+        "prices": prices
+    }
+
+def build_derived():
+    # Subscriptions and rollups are normally maintained by the write paths
+    from subscriptions import rebuild_subscriptions
+    from rollups import rebuild_rollups
+    for name, rebuild in (("subscriptions", rebuild_subscriptions), ("rollups", rebuild_rollups)):
+        try:
+            rebuild()
+        except Exception as e: # mongomock lacks $merge and pipeline updates
+            print(f"Skipping {name} rebuild: {e}", file=sys.stderr)
+
+def main():
+    parser = argparse.ArgumentParser(description="Generate synthetic marketplace data")
+    parser.add_argument('--farmers', type=int, default=100)
+    parser.add_argument('--buyers', type=int, default=100)
+    parser.add_argument('--listings', type=int, default=2000)
+    parser.add_argument('--requests', type=int, default=2000)
+    parser.add_argument('--price-years', type=float, default=1)
+    parser.add_argument('--seed', type=int, default=42)
+    args = parser.parse_args()
+
+    from database import get_db
+    from migrations import ensure_indexes
+    db = get_db()
+    ensure_indexes(db)
+    dataset = generate(db, args.farmers, args.buyers, args.listings, args.requests, args.price_years, args.seed)
+    build_derived()
+    print(f"Generated {len(dataset['farmers'])} farmers, {len(dataset['buyers'])} buyers, "
+          f"{len(dataset['listings'])} listings, {len(dataset['requests'])} requests, {dataset['prices']} prices")
+
+if __name__ == '__main__':
+    main()
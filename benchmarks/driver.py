@@ -0,0 +1,185 @@
+# Mixed-workload load driver for the Flask app. Seeds synthetic data (see datagen.py), logs in
+# virtual farmers and buyers, runs a weighted mix of requests from N threads through the Flask
+# test client and reports throughput and p50/p95/p99 latency per endpoint as JSON.
+#   MONGO_URI=mongomock://localhost/bench python benchmarks/driver.py --duration 30 --output run.json
+#   MONGO_URI=mongodb://localhost:27017/bench python benchmarks/driver.py --compare run.json
+import argparse
+import json
+import os
+import random
+import sys
+import threading
+import time
+from collections import defaultdict
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from datagen import PASSWORD, PRODUCE_TYPES, REGIONS, build_derived, generate
+
+# (weight, label, role, request builder) -- builders return (method, url, json body or None)
+WORKLOAD = [
+    (20, "GET /api/produce/", 'any', lambda rng, user, data: ('GET', '/api/produce/?limit=100', None)),
+    (10, "GET /api/buyer/", 'any', lambda rng, user, data: ('GET', '/api/buyer/?limit=100', None)),
+    (10, "GET /api/market/", 'any', lambda rng, user, data: (
+        'GET', f"/api/market/?produce_type={rng.choice(PRODUCE_TYPES)}&region={rng.choice(list(REGIONS))}&limit=100", None)),
+    (8, "GET /api/market/summary", 'any', lambda rng, user, data: (
+        'GET', f"/api/market/summary?produce_type={rng.choice(PRODUCE_TYPES)}&region={rng.choice(list(REGIONS))}&days=90", None)),
+    (10, "GET /api/auth/me", 'any', lambda rng, user, data: ('GET', '/api/auth/me', None)),
+    (8, "GET /api/produce/nearby", 'any', lambda rng, user, data: (
+        'GET', "/api/produce/nearby?lng={}&lat={}&radius_km=25".format(*REGIONS[rng.choice(list(REGIONS))]), None)),
+    (10, "GET /api/produce/<listing_id>/match", 'farmer', lambda rng, user, data: (
+        'GET', f"/api/produce/{rng.choice(user['owned'])}/match?limit=20", None)),
+    (6, "GET /api/buyer/<request_id>/match", 'buyer', lambda rng, user, data: (
+        'GET', f"/api/buyer/{rng.choice(user['owned'])}/match?limit=20", None)),
+    (5, "POST /api/produce/", 'farmer', lambda rng, user, data: ('POST', '/api/produce/', {
+        "produce_type": rng.choice(PRODUCE_TYPES), "quantity": rng.randrange(50, 5000), "unit": "kg",
+        "price_per_unit": rng.randrange(20, 120), "available_from": "2024-01-01", "available_until": "2030-01-01",
+        "location": {"type": "Point", "coordinates": list(REGIONS[rng.choice(list(REGIONS))])}})),
+    (3, "POST /api/market/", 'any', lambda rng, user, data: ('POST', '/api/market/', {
+        "produce_type": rng.choice(PRODUCE_TYPES), "region": rng.choice(list(REGIONS)),
+        "price": rng.randrange(20, 120), "unit": "kg"})),
+    (2, "POST /api/market/send_price_alert", 'any', lambda rng, user, data: ('POST', '/api/market/send_price_alert', {
+        "produce_type": rng.choice(PRODUCE_TYPES), "region": rng.choice(list(REGIONS)),
+        "price": rng.randrange(20, 120), "unit": "kg"})),
+]
+
+# Write paths that need server features mongomock lacks (add_market_price keeps the rollups
+# current with pipeline updates); left out of the mix when MONGO_URI is mongomock://
+MONGOMOCK_UNSUPPORTED = {"POST /api/market/"}
+
+def percentile(sorted_values, pct):
+    # Nearest-rank percentile
+    if not sorted_values:
+        return None
+    rank = max(1, int(round(pct / 100.0 * len(sorted_values))))
+    return sorted_values[min(rank, len(sorted_values)) - 1]
+
+def _login(app, user):
+    client = app.test_client()
+    response = client.post('/api/auth/login', json={"email": user['email'], "password": PASSWORD})
+    if response.status_code != 200:
+        raise RuntimeError(f"Login failed for {user['email']}: {response.status_code}")
+    return client
+
+def run(app, dataset, duration, concurrency, seed=1, workload=WORKLOAD):
+    owned = defaultdict(list)
+    for item in dataset['listings'] + dataset['requests']:
+        owned[item['owner']].append(item['id'])
+    users = ([dict(u, role='farmer', owned=owned[u['id']]) for u in dataset['farmers'] if owned[u['id']]] +
+             [dict(u, role='buyer', owned=owned[u['id']]) for u in dataset['buyers'] if owned[u['id']]])
+
+    latencies = defaultdict(list)
+    errors = defaultdict(int)
+    lock = threading.Lock()
+    deadline = time.perf_counter() + duration
+
+    def worker(index):
+        rng = random.Random(seed + index)
+        user = users[index % len(users)]
+        client = _login(app, user)
+        mix = [w for w in workload if w[2] in ('any', user['role'])]
+        weights = [w[0] for w in mix]
+        local_latencies = defaultdict(list)
+        local_errors = defaultdict(int)
+        while time.perf_counter() < deadline:
+            _, label, _, build = rng.choices(mix, weights)[0]
+            method, url, body = build(rng, user, dataset)
+            start = time.perf_counter()
+            response = client.open(url, method=method, json=body)
+            response.get_data() # Include streaming/serialization in the measurement
+            local_latencies[label].append(time.perf_counter() - start)
+            if response.status_code >= 500 or response.status_code in (401, 403, 429):
+                local_errors[label] += 1
+        with lock:
+            for label, values in local_latencies.items():
+                latencies[label].extend(values)
+            for label, count in local_errors.items():
+                errors[label] += count
+
+    threads = [threading.Thread(target=worker, args=(i,)) for i in range(concurrency)]
+    started = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    elapsed = time.perf_counter() - started
+
+    endpoints = {}
+    for label, values in sorted(latencies.items()):
+        values.sort()
+        endpoints[label] = {
+            "count": len(values),
+            "errors": errors[label],
+            "throughput_rps": round(len(values) / elapsed, 2),
+            "mean_ms": round(sum(values) / len(values) * 1000, 3),
+            "p50_ms": round(percentile(values, 50) * 1000, 3),
+            "p95_ms": round(percentile(values, 95) * 1000, 3),
+            "p99_ms": round(percentile(values, 99) * 1000, 3)
+        }
+    total = sum(e['count'] for e in endpoints.values())
+    return {"elapsed_s": round(elapsed, 3), "requests": total,
+            "throughput_rps": round(total / elapsed, 2), "endpoints": endpoints}
+
+def compare(current, baseline):
+    # Relative change per endpoint and metric; negative latency deltas are improvements
+    diff = {}
+    for label, metrics in current['endpoints'].items():
+        before = baseline.get('endpoints', {}).get(label)
+        if not before:
+            continue
+        diff[label] = {key: round((metrics[key] - before[key]) / before[key] * 100, 1)
+                       for key in ('throughput_rps', 'p50_ms', 'p95_ms', 'p99_ms') if before.get(key)}
+    return diff
+
+def main():
+    parser = argparse.ArgumentParser(description="Mixed-workload benchmark for the marketplace API")
+    parser.add_argument('--farmers', type=int, default=100)
+    parser.add_argument('--buyers', type=int, default=100)
+    parser.add_argument('--listings', type=int, default=2000)
+    parser.add_argument('--requests', type=int, default=2000)
+    parser.add_argument('--price-years', type=float, default=1)
+    parser.add_argument('--duration', type=float, default=20, help="Seconds to run the workload")
+    parser.add_argument('--concurrency', type=int, default=8)
+    parser.add_argument('--seed', type=int, default=42)
+    parser.add_argument('--keep-data', action='store_true', help="Do not drop the database first")
+    parser.add_argument('--output', help="Write the JSON report to this file")
+    parser.add_argument('--compare', help="Baseline JSON report to compare against")
+    args = parser.parse_args()
+
+    os.environ.setdefault('SMS_PROVIDER', 'local') # Never hit a real SMS provider
+    from config import Config
+    from app import create_app
+    from database import get_client, get_db
+    from migrations import ensure_indexes
+
+    Config.SMS_PROVIDER = os.environ['SMS_PROVIDER']
+    Config.ADMISSION_ENABLED = False # Measure the endpoints, not the load shedding in front of them
+    db = get_db()
+    if not args.keep_data:
+        get_client().drop_database(db.name)
+    ensure_indexes(db)
+    dataset = generate(db, args.farmers, args.buyers, args.listings, args.requests, args.price_years, args.seed)
+    build_derived()
+
+    app = create_app()
+    workload = WORKLOAD
+    if Config.MONGO_URI.startswith('mongomock://'):
+        workload = [w for w in WORKLOAD if w[1] not in MONGOMOCK_UNSUPPORTED]
+    report = {
+        "meta": {"mongo_uri": Config.MONGO_URI.split('@')[-1], "concurrency": args.concurrency,
+                 "duration_s": args.duration, "farmers": args.farmers, "buyers": args.buyers,
+                 "listings": args.listings, "requests": args.requests, "price_years": args.price_years},
+        **run(app, dataset, args.duration, args.concurrency, args.seed, workload)
+    }
+    if args.compare:
+        with open(args.compare) as f:
+            report['compare_pct'] = compare(report, json.load(f))
+
+    output = json.dumps(report, indent=2)
+    if args.output:
+        with open(args.output, 'w') as f:
+            f.write(output)
+    print(output)
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,152 @@
+import bisect
+import threading
+import unicodedata
+from collections import Counter
+from pymongo.errors import DuplicateKeyError
+from config import Config
+from database import db
+import versions
+
+# produce_catalog holds one document per canonical produce type:
+#   {_id: "maize", name: "Maize", aliases: ["maize", "corn", "mais", "mahindi"], verified: true}
+# Write paths store the canonical id in produce_type, so "Maize", "maize " and "Mais" all
+# match each other in listings, requests, prices and alerts. Unknown types are registered on
+# first use under their normalized spelling as unverified entries: they canonicalize later
+# writes and filters but stay out of search until seeded or verified (manage.py
+# verify-produce-type), so one-off typos never surface as suggestions. Each process holds the catalog in memory as an
+# alias map plus a trigram index for typo-tolerant search, rebuilt when the catalog's version
+# (see versions.py) changes.
+SEED = {
+    "maize": ("Maize", ["corn", "mais", "mahindi"]),
+    "beans": ("Beans", ["bean", "maharagwe"]),
+    "potatoes": ("Potatoes", ["potato", "irish potatoes", "viazi"]),
+    "tomatoes": ("Tomatoes", ["tomato", "nyanya"]),
+    "onions": ("Onions", ["onion", "vitunguu"]),
+    "cabbages": ("Cabbages", ["cabbage", "kabichi"]),
+    "sukuma-wiki": ("Sukuma wiki", ["kale", "collard greens"]),
+    "bananas": ("Bananas", ["banana", "ndizi"]),
+    "rice": ("Rice", ["mchele"]),
+    "wheat": ("Wheat", ["ngano"]),
+}
+
+def normalize_key(text):
+    # Case-, accent- and whitespace-insensitive form used for all catalog lookups
+    text = unicodedata.normalize('NFKD', str(text))
+    text = ''.join(c for c in text if not unicodedata.combining(c)).casefold()
+    return ' '.join(''.join(c if c.isalnum() else ' ' for c in text).split())
+
+def slug(key):
+    return key.replace(' ', '-')
+
+def trigrams(key):
+    padded = f"  {key} "
+    return {padded[i:i + 3] for i in range(len(padded) - 2)}
+
+class CatalogIndex:
+    def __init__(self, entries):
+        self.names = {}
+        self.aliases = {} # normalized alias -> canonical id, verified or not
+        searchable = set()
+        for entry in entries:
+            self.names[entry['_id']] = entry.get('name', entry['_id'])
+            for alias in [entry['_id'].replace('-', ' '), entry.get('name', '')] + entry.get('aliases', []):
+                key = normalize_key(alias)
+                if key:
+                    self.aliases.setdefault(key, entry['_id'])
+                    if entry.get('verified') and self.aliases[key] == entry['_id']:
+                        searchable.add(key)
+        self.terms = sorted(searchable) # For prefix lookups with bisect
+        self.term_grams = {term: trigrams(term) for term in self.terms}
+        self.postings = {}
+        for term, grams in self.term_grams.items():
+            for gram in grams:
+                self.postings.setdefault(gram, []).append(term)
+
+    def search(self, query, limit=10):
+        key = normalize_key(query)
+        if not key:
+            return []
+        best = {} # id -> (rank, score, matched term); rank 0 exact, 1 prefix, 2 fuzzy
+        def consider(term, rank, score):
+            produce_id = self.aliases[term]
+            current = best.get(produce_id)
+            if current is None or (rank, -score) < (current[0], -current[1]):
+                best[produce_id] = (rank, score, term)
+
+        i = bisect.bisect_left(self.terms, key)
+        while i < len(self.terms) and self.terms[i].startswith(key):
+            term = self.terms[i]
+            consider(term, 0 if term == key else 1, len(key) / len(term))
+            i += 1
+        grams = trigrams(key)
+        shared = Counter(term for gram in grams for term in self.postings.get(gram, ()))
+        for term, count in shared.items():
+            score = count / (len(grams) + len(self.term_grams[term]) - count) # Jaccard similarity
+            if score >= Config.CATALOG_FUZZY_MIN_SCORE:
+                consider(term, 2, score)
+
+        ranked = sorted(best.items(), key=lambda item: (item[1][0], -item[1][1], item[0]))[:limit]
+        return [{"id": produce_id, "name": self.names[produce_id], "matched": term,
+                 "match": ("exact", "prefix", "fuzzy")[rank], "score": round(score, 3)}
+                for produce_id, (rank, score, term) in ranked]
+
+_index = None
+_index_version = None
+_lock = threading.Lock()
+
+def get_index():
+    global _index, _index_version
+    version = versions.current('produce_catalog')
+    if _index is None or version != _index_version:
+        with _lock:
+            if _index is None or version != _index_version:
+                _index = CatalogIndex(db.produce_catalog.find({}, {"name": 1, "aliases": 1, "verified": 1}))
+                _index_version = version
+    return _index
+
+def register(produce_id, name, aliases=(), verified=False):
+    update = {"$setOnInsert": {"name": name}, "$addToSet": {"aliases": {"$each": list(aliases)}}}
+    if verified:
+        update['$set'] = {"verified": True}
+    else:
+        update['$setOnInsert']['verified'] = False
+    try:
+        result = db.produce_catalog.update_one({"_id": produce_id}, update, upsert=True)
+    except DuplicateKeyError:
+        return # Registered concurrently by another worker, which bumps the version
+    # Re-registering a known type (e.g. from a worker whose index is a few seconds stale) changes
+    # nothing and must not make every worker rebuild its index
+    if result.upserted_id is not None or result.modified_count:
+        versions.bump('produce_catalog')
+
+def verify(produce_id):
+    # Makes an auto-registered produce type searchable; False if there is no such type
+    result = db.produce_catalog.update_one({"_id": produce_id}, {"$set": {"verified": True}})
+    if result.modified_count:
+        versions.bump('produce_catalog')
+    return result.matched_count > 0
+
+def canonical_produce_type(text, create=True):
+    # Canonical id for a free-text produce type; write paths register unknown types
+    key = normalize_key(text or '')
+    if not key:
+        raise ValueError("produce_type must contain letters or digits" if str(text or '').strip()
+                         else "produce_type is required")
+    produce_id = get_index().aliases.get(key)
+    if produce_id is not None:
+        return produce_id
+    produce_id = slug(key)
+    if create:
+        register(produce_id, str(text).strip(), [key])
+    return produce_id
+
+def lookup_produce_type(text):
+    # Query-side normalization: None stays None (no filter) and nothing is registered
+    return canonical_produce_type(text, create=False) if text else None
+
+def search_produce(query, limit=10):
+    return get_index().search(query, limit)
+
+def seed_catalog():
+    for produce_id, (name, aliases) in SEED.items():
+        register(produce_id, name, [normalize_key(a) for a in [name] + aliases], verified=True)
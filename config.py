@@ -0,0 +1,152 @@
+import os
+import tempfile
+from datetime import timedelta
+from dotenv import load_dotenv
+
+load_dotenv() # Load environment variables from .env file
+
+class Config:
+    SECRET_KEY = os.getenv('SECRET_KEY', 'your_secret_key_here') # IMPORTANT: Change this!
+    MONGO_URI = os.getenv('MONGO_URI', 'mongodb://localhost:27017/market_match_db')
+    MONGO_MAX_POOL_SIZE = int(os.getenv('MONGO_MAX_POOL_SIZE', 100)) # Per worker process
+    MONGO_MIN_POOL_SIZE = int(os.getenv('MONGO_MIN_POOL_SIZE', 0))
+    MONGO_CONNECT_TIMEOUT_MS = int(os.getenv('MONGO_CONNECT_TIMEOUT_MS', 5000))
+    MONGO_SERVER_SELECTION_TIMEOUT_MS = int(os.getenv('MONGO_SERVER_SELECTION_TIMEOUT_MS', 5000))
+    MONGO_SOCKET_TIMEOUT_MS = int(os.getenv('MONGO_SOCKET_TIMEOUT_MS', 0)) or None # None = no timeout
+    MONGO_READ_PREFERENCE = os.getenv('MONGO_READ_PREFERENCE', 'primary') # e.g. 'secondaryPreferred'
+    SESSION_TYPE = os.getenv('SESSION_TYPE', 'filesystem') # 'filesystem', 'mongodb' (shared, TTL-indexed) or 'signed' (stateless cookie)
+    PERMANENT_SESSION_LIFETIME = timedelta(days=int(os.getenv('SESSION_LIFETIME_DAYS', 7))) # Lifetime of 'mongodb' sessions
+    SESSION_PERMANENT = False
+    SESSION_USE_SIGNER = True
+    SESSION_FILE_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'flask_session_data')
+    
+    # SMS Service Configuration (e.g., Twilio)
+    SMS_ACCOUNT_SID = os.getenv('SMS_ACCOUNT_SID')
+    SMS_AUTH_TOKEN = os.getenv('SMS_AUTH_TOKEN')
+    SMS_FROM_NUMBER = os.getenv('SMS_FROM_NUMBER') # Your Twilio phone number
+
+
+    # Matching engine (produce listing <-> buyer request scoring)
+    MATCH_WEIGHTS = {'distance': 0.5, 'quantity': 0.3, 'price': 0.2}
+    MATCH_DISTANCE_SCALE_KM = float(os.getenv('MATCH_DISTANCE_SCALE_KM', 50)) # Distance at which the distance score halves
+    MATCH_UNKNOWN_SCORE = 0.5 # Neutral score when a location, quantity or price is missing
+    MATCH_PAGE_SIZE = 20
+    MATCH_MAX_PAGE_SIZE = 200
+    MATCH_MAX_OFFSET = 1000
+
+    # List endpoints (keyset pagination and NDJSON streaming)
+    PAGE_SIZE_DEFAULT = int(os.getenv('PAGE_SIZE_DEFAULT', 100))
+    PAGE_SIZE_MAX = int(os.getenv('PAGE_SIZE_MAX', 1000))
+    STREAM_BATCH_SIZE = 500 # Mongo cursor batch size used while streaming NDJSON
+
+    # In-process user cache used for role checks when the session has no user_type
+    USER_CACHE_SIZE = int(os.getenv('USER_CACHE_SIZE', 10000))
+    USER_CACHE_TTL = int(os.getenv('USER_CACHE_TTL', 300)) # Seconds
+
+    # Bulk market price ingestion
+    BULK_INSERT_BATCH_SIZE = int(os.getenv('BULK_INSERT_BATCH_SIZE', 1000))
+    BULK_MAX_ERRORS = 1000 # Row errors reported individually; further failures are only counted
+
+    # Market price rollups (/api/market/summary)
+    SUMMARY_DEFAULT_DAYS = 90
+    SUMMARY_MAX_DAYS = 3660
+
+    # Outbound SMS queue
+    SMS_PROVIDER = os.getenv('SMS_PROVIDER', 'console') # 'console' or 'local' (offline stand-in for load tests)
+    SMS_WORKERS = int(os.getenv('SMS_WORKERS', 4))
+    SMS_BATCH_SIZE = int(os.getenv('SMS_BATCH_SIZE', 50))
+    SMS_RATE_PER_SECOND = float(os.getenv('SMS_RATE_PER_SECOND', 20)) # Provider token bucket rate
+    SMS_MAX_RETRIES = 3
+    SMS_RETRY_BACKOFF = 1.0 # Seconds, doubled on every attempt
+    SMS_DEDUPE_TTL = 3600 # Identical alerts to the same number within this window are sent once
+    SMS_DEDUPE_MAX_MESSAGES = 100000
+
+    # Proximity search (/api/produce/nearby)
+    GEO_BACKEND = os.getenv('GEO_BACKEND', 'mongo') # 'mongo' ($geoNear on the 2dsphere index) or 'grid' (geohash fallback)
+    NEARBY_DEFAULT_RADIUS_KM = 25
+    NEARBY_MAX_RADIUS_KM = 500
+    NEARBY_PAGE_SIZE = 20
+    NEARBY_MAX_PAGE_SIZE = 100
+
+    # Instrumentation (/metrics, Prometheus text format)
+    METRICS_ENABLED = os.getenv('METRICS_ENABLED', 'true').lower() == 'true'
+    METRICS_SAMPLE_RATE = float(os.getenv('METRICS_SAMPLE_RATE', 0.01)) # Share of requests with Mongo command tracing; 0 = off
+    METRICS_LATENCY_BUCKETS = [0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10]
+    SLOW_REQUEST_MS = float(os.getenv('SLOW_REQUEST_MS', 500)) # Sampled requests slower than this are logged with a breakdown
+
+    # Expiry of listings past available_until and requests past needed_by
+    EXPIRY_SWEEP_INTERVAL = int(os.getenv('EXPIRY_SWEEP_INTERVAL', 0)) # Seconds; 0 = no in-process sweeper (use `manage.py expire`)
+
+    # Batch supply/demand allocation (`manage.py allocate`)
+    ALLOCATION_MAX_DISTANCE_KM = 150
+    ALLOCATION_CELL_KM = 25 # Spatial bucket size; smaller cells cost fewer pairs per listing
+    ALLOCATION_COST_PER_KM = float(os.getenv('ALLOCATION_COST_PER_KM', 0.05)) # Transport cost per unit per km
+    ALLOCATION_MAX_EDGES_PER_LISTING = 25
+    ALLOCATION_MAX_CANDIDATES_PER_CELL = 500 # Nearest requests costed per listing (sub-)cell in dense regions
+    ALLOCATION_CANDIDATE_CELL_KM = 2 # Sub-cell size used to pick those candidates
+    ALLOCATION_BLOCK_SIZE = 1000000 # Listing x request pairs costed per vectorized block
+    ALLOCATION_PRICE_TOLERANCE = 0.0 # Allow listings priced this fraction above a buyer's target price
+
+    # Price analytics (/api/market/analytics)
+    ANALYTICS_CACHE_SIZE = 1000
+    ANALYTICS_CACHE_TTL = 300 # Seconds; entries are also dropped as soon as the market_prices version moves
+    ANALYTICS_MAX_WINDOW = 365
+
+    # Conditional GET for list endpoints (see versions.py)
+    VERSION_CHECK_INTERVAL = float(os.getenv('VERSION_CHECK_INTERVAL', 2)) # Seconds a worker trusts its copy of a collection version
+    RESPONSE_CACHE_SIZE = int(os.getenv('RESPONSE_CACHE_SIZE', 512)) # Serialized list pages kept per process
+
+    # Delta sync (/api/produce/sync, /api/buyer/sync)
+    SYNC_PAGE_SIZE = 500
+    SYNC_MAX_PAGE_SIZE = 5000
+    SYNC_SETTLE_SECONDS = 5 # Changes younger than this wait for the next sync, covering in-flight writes
+    SYNC_TOMBSTONE_RETENTION_DAYS = int(os.getenv('SYNC_TOMBSTONE_RETENTION_DAYS', 30)) # Older cursors get 410 and must resync
+
+    # Market price storage layout: 'document' (market_prices) or 'timeseries' (market_price_series,
+    # populate it first with `manage.py migrate-prices-timeseries`)
+    MARKET_PRICE_STORAGE = os.getenv('MARKET_PRICE_STORAGE', 'document')
+
+    # Produce catalog search (/api/produce/search)
+    CATALOG_FUZZY_MIN_SCORE = 0.3 # Trigram Jaccard similarity needed for a fuzzy match
+    CATALOG_SEARCH_MAX = 25
+
+    # Batch writes (/api/produce/batch, /api/buyer/batch)
+    BATCH_MAX_OPERATIONS = 500
+
+    # Admission control (see admission.py): endpoints map to classes, classes to limits.
+    # Endpoints not listed, or classes without limits, are admitted unconditionally.
+    ADMISSION_ENABLED = os.getenv('ADMISSION_ENABLED', 'true').lower() == 'true'
+    ADMISSION_BACKEND = os.getenv('ADMISSION_BACKEND', 'memory') # 'memory' (per process) or 'sqlite' (per host)
+    ADMISSION_SQLITE_PATH = os.getenv('ADMISSION_SQLITE_PATH', os.path.join(tempfile.gettempdir(), 'agritech_admission.db'))
+    ADMISSION_SLOT_TTL = 300 # Seconds before a slot left by a crashed worker is reclaimed
+    ADMISSION_MAX_BUCKETS = 100000 # Per-user buckets kept by the memory backend
+    ADMISSION_MAX_RETRY_AFTER = 60
+    ADMISSION_ENDPOINT_CLASSES = {
+        'produce.find_matches_for_listing': 'match',
+        'buyer.find_matches_for_request': 'match',
+        'market.send_price_alert_to_farmers': 'alert',
+        'market.bulk_add_prices': 'bulk',
+        'produce.batch_produce': 'bulk',
+        'buyer.batch_requests': 'bulk',
+        'produce.get_nearby_produce': 'heavy_read',
+        'market.get_price_summary_route': 'heavy_read',
+        'market.get_price_analytics': 'heavy_read',
+        'produce.sync_produce': 'heavy_read',
+        'buyer.sync_requests': 'heavy_read',
+    }
+    # Request threads per worker process; run gunicorn with --threads $WEB_THREADS. A request
+    # holds its thread while it runs and while it waits for a slot, so each class gets a share
+    # of these (concurrency + max_waiters), and the shares leave WEB_THREADS // 8 threads that
+    # only unlimited endpoints (e.g. /api/auth/me, /api/produce/<id>) can be using.
+    WEB_THREADS = int(os.getenv('WEB_THREADS', 16))
+    ADMISSION_LIMITS = {
+        'match': {"user_rate": 1.0, "user_burst": 5, "endpoint_rate": 50, "endpoint_burst": 100,
+                  "concurrency": max(1, WEB_THREADS // 4), "max_waiters": max(1, WEB_THREADS // 16),
+                  "queue_timeout": 2.0},
+        'alert': {"user_rate": 0.2, "user_burst": 2, "endpoint_rate": 5, "endpoint_burst": 10,
+                  "concurrency": max(1, WEB_THREADS // 16), "max_waiters": 0},
+        'bulk': {"user_rate": 0.2, "user_burst": 3, "concurrency": max(1, WEB_THREADS // 16),
+                 "max_waiters": max(1, WEB_THREADS // 16), "queue_timeout": 5.0},
+        'heavy_read': {"user_rate": 5.0, "user_burst": 20, "concurrency": max(1, WEB_THREADS // 4),
+                       "max_waiters": max(1, WEB_THREADS // 8), "queue_timeout": 2.0},
+    }
@@ -1,10 +1,77 @@
+import os
+import threading
 from pymongo import MongoClient
 from config import Config
+from metrics import command_listener
 
-client = MongoClient(Config.MONGO_URI)
-db = client.get_database() # This will get the database specified in MONGO_URI
+# The client is created lazily, once per process. MongoClient is not fork-safe, so a client
+# inherited from a pre-fork master (gunicorn --preload) is replaced on first use in the worker.
+# Nothing here talks to MongoDB at import time; indexes are managed by migrations.py.
+_settings = {}
+_client = None
+_client_pid = None
+_lock = threading.Lock()
 
-# Ensure indexes for faster querying
-db.users.create_index("email", unique=True)
-db.produce_listings.create_index([("location", "2dsphere")]) # For geospatial queries
-db.market_prices.create_index([("produce_type", 1), ("region", 1), ("date_recorded", -1)])
+def configure(config):
+    # config is a Flask app.config mapping or a Config-like class
+    global _client
+    get = config.get if hasattr(config, 'get') else lambda key, default=None: getattr(config, key, default)
+    settings = {key: get(key, getattr(Config, key)) for key in (
+        'MONGO_URI', 'MONGO_MAX_POOL_SIZE', 'MONGO_MIN_POOL_SIZE', 'MONGO_CONNECT_TIMEOUT_MS',
+        'MONGO_SERVER_SELECTION_TIMEOUT_MS', 'MONGO_SOCKET_TIMEOUT_MS', 'MONGO_READ_PREFERENCE',
+        'METRICS_ENABLED'
+    )}
+    with _lock:
+        if settings != _settings:
+            _settings.clear()
+            _settings.update(settings)
+            _client = None
+
+def _create_client():
+    settings = _settings or {key: getattr(Config, key) for key in dir(Config)
+                             if key.startswith('MONGO_') or key == 'METRICS_ENABLED'}
+    if settings['MONGO_URI'].startswith('mongomock://'):
+        # In-memory store for benchmarks and local experiments (optional mongomock dependency)
+        import mongomock
+        return mongomock.MongoClient(settings['MONGO_URI'].replace('mongomock://', 'mongodb://', 1))
+    return MongoClient(
+        settings['MONGO_URI'],
+        maxPoolSize=settings['MONGO_MAX_POOL_SIZE'],
+        minPoolSize=settings['MONGO_MIN_POOL_SIZE'],
+        connectTimeoutMS=settings['MONGO_CONNECT_TIMEOUT_MS'],
+        serverSelectionTimeoutMS=settings['MONGO_SERVER_SELECTION_TIMEOUT_MS'],
+        socketTimeoutMS=settings['MONGO_SOCKET_TIMEOUT_MS'],
+        readPreference=settings['MONGO_READ_PREFERENCE'],
+        event_listeners=[command_listener] if settings['METRICS_ENABLED'] else [],
+        connect=False # Connect on first operation, not at construction
+    )
+
+def get_client():
+    global _client, _client_pid
+    pid = os.getpid()
+    if _client is None or _client_pid != pid:
+        with _lock:
+            if _client is None or _client_pid != pid:
+                _client = _create_client()
+                _client_pid = pid
+    return _client
+
+def get_db():
+    return get_client().get_database() # This will get the database specified in MONGO_URI
+
+def close_client():
+    global _client
+    with _lock:
+        if _client is not None and _client_pid == os.getpid():
+            _client.close()
+        _client = None
+
+class _LazyDatabase:
+    # Stands in for the pymongo Database so `from database import db` keeps working
+    def __getattr__(self, name):
+        return getattr(get_db(), name)
+
+    def __getitem__(self, name):
+        return get_db()[name]
+
+db = _LazyDatabase()
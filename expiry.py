@@ -0,0 +1,66 @@
+import os
+import threading
+import time
+from datetime import datetime
+from database import db
+import versions
+
+# Deactivates listings whose available_until and buyer requests whose needed_by have passed,
+# so the active working set (and the partial indexes on it) only holds live supply and demand.
+# Dates may be stored as ISO strings or datetimes; Mongo only compares values of the same
+# type, so both forms are matched explicitly.
+EXPIRING = (
+    ('produce_listings', 'available_until'),
+    ('buyer_requests', 'needed_by'),
+)
+
+def _expired_query(field, now):
+    return {"is_active": True, "$or": [
+        {field: {"$lt": now.date().isoformat()}}, # "2024-05-01" is still available on May 1st
+        {field: {"$lt": now}}
+    ]}
+
+def expire_stale(now=None, batch_size=1000):
+    import subscriptions
+    now = now or datetime.utcnow()
+    counts = {}
+    for collection_name, field in EXPIRING:
+        collection = db[collection_name]
+        counts[collection_name] = 0
+        while True:
+            ids = [doc['_id'] for doc in collection.find(_expired_query(field, now), {"_id": 1}).limit(batch_size)]
+            if not ids:
+                break
+            result = collection.update_many(
+                {"_id": {"$in": ids}, "is_active": True},
+                {"$set": {"is_active": False, "expired_at": now, "updated_at": now}}
+            )
+            counts[collection_name] += result.modified_count
+            if result.modified_count:
+                versions.bump(collection_name)
+            if collection_name == 'produce_listings':
+                subscriptions.remove_listings(ids)
+            if len(ids) < batch_size:
+                break
+    return counts
+
+_sweeper_pid = None
+_sweeper_lock = threading.Lock()
+
+def start_sweeper(interval):
+    # In-process sweeper for single-node deployments; elsewhere run `manage.py expire` from cron
+    global _sweeper_pid
+    with _sweeper_lock:
+        if _sweeper_pid == os.getpid():
+            return
+        _sweeper_pid = os.getpid()
+
+    def sweep():
+        while True:
+            time.sleep(interval)
+            try:
+                expire_stale()
+            except Exception as e:
+                print(f"Expiry sweep failed: {e}")
+
+    threading.Thread(target=sweep, daemon=True).start()
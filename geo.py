@@ -0,0 +1,90 @@
+import math
+
+EARTH_RADIUS_KM = 6371.0088
+
+def to_lng_lat(location):
+    # Accepts GeoJSON points, [lng, lat] pairs or {"lat": .., "lng": ..} dicts
+    if not location:
+        return None
+    if isinstance(location, dict):
+        if 'coordinates' in location:
+            location = location['coordinates']
+        else:
+            lat = location.get('lat', location.get('latitude'))
+            lng = location.get('lng', location.get('lon', location.get('longitude')))
+            if lat is None or lng is None:
+                return None
+            location = [lng, lat]
+    if isinstance(location, (list, tuple)) and len(location) >= 2:
+        try:
+            lng, lat = float(location[0]), float(location[1])
+        except (TypeError, ValueError):
+            return None
+        if -180 <= lng <= 180 and -90 <= lat <= 90:
+            return lng, lat
+    return None
+
+def haversine_km(a, b):
+    # a and b are (lng, lat) tuples
+    lng1, lat1 = math.radians(a[0]), math.radians(a[1])
+    lng2, lat2 = math.radians(b[0]), math.radians(b[1])
+    h = math.sin((lat2 - lat1) / 2) ** 2 + math.cos(lat1) * math.cos(lat2) * math.sin((lng2 - lng1) / 2) ** 2
+    return 2 * EARTH_RADIUS_KM * math.asin(min(1.0, math.sqrt(h)))
+
+# --- Geohash grid ---
+# Used as a pure-Python fallback for proximity queries when the store has no $geoNear
+# (mongomock, local test stores). Listings carry a precomputed location_geohash.
+GEOHASH_BASE32 = '0123456789bcdefghjkmnpqrstuvwxyz'
+GEOHASH_PRECISION = 9
+
+def geohash_encode(lng, lat, precision=GEOHASH_PRECISION):
+    lng_range, lat_range = [-180.0, 180.0], [-90.0, 90.0]
+    chars, bits, bit_count, even = [], 0, 0, True
+    while len(chars) < precision:
+        rng, value = (lng_range, lng) if even else (lat_range, lat)
+        mid = (rng[0] + rng[1]) / 2
+        bits <<= 1
+        if value >= mid:
+            bits |= 1
+            rng[0] = mid
+        else:
+            rng[1] = mid
+        even = not even
+        bit_count += 1
+        if bit_count == 5:
+            chars.append(GEOHASH_BASE32[bits])
+            bits, bit_count = 0, 0
+    return ''.join(chars)
+
+def geohash_cell_size(precision):
+    # (width, height) of a cell in degrees
+    lng_bits = (5 * precision + 1) // 2
+    lat_bits = (5 * precision) // 2
+    return 360.0 / 2 ** lng_bits, 180.0 / 2 ** lat_bits
+
+def geohash_precision_for(radius_km, lat):
+    # Coarsest-to-finest search for the finest cells still at least radius_km across,
+    # so the centre cell plus its 8 neighbours always cover the search circle
+    lat_deg = radius_km / 111.32
+    lng_deg = radius_km / (111.32 * max(math.cos(math.radians(min(abs(lat) + lat_deg, 89.9))), 1e-6))
+    precision = 1
+    for p in range(1, GEOHASH_PRECISION + 1):
+        width, height = geohash_cell_size(p)
+        if width < lng_deg or height < lat_deg:
+            break
+        precision = p
+    return precision
+
+def geohash_cover(lng, lat, radius_km):
+    # Geohash prefixes whose cells cover the circle of radius_km around (lng, lat)
+    precision = geohash_precision_for(radius_km, lat)
+    width, height = geohash_cell_size(precision)
+    cells = set()
+    for dlat in (-height, 0, height):
+        cell_lat = lat + dlat
+        if cell_lat < -90 or cell_lat > 90:
+            continue
+        for dlng in (-width, 0, width):
+            cell_lng = (lng + dlng + 180) % 360 - 180
+            cells.add(geohash_encode(cell_lng, cell_lat, precision))
+    return sorted(cells)
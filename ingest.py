@@ -0,0 +1,114 @@
+import csv
+import json
+import math
+from datetime import datetime
+from pymongo.errors import BulkWriteError
+from database import db
+from config import Config
+from models import prepare_market_price
+from rollups import apply_prices
+import versions
+from price_storage import price_collection, to_stored
+
+PRICE_REQUIRED_FIELDS = ('produce_type', 'region', 'price', 'unit')
+PRICE_OPTIONAL_FIELDS = ('date_recorded', 'currency', 'source')
+
+# --- Row readers ---
+# Both readers consume the request body line by line and yield (line_number, row, error)
+def _decoded_lines(stream):
+    for line in stream:
+        yield line.decode('utf-8-sig') if isinstance(line, bytes) else line
+
+def iter_csv_rows(stream):
+    reader = csv.DictReader(_decoded_lines(stream))
+    missing = [f for f in PRICE_REQUIRED_FIELDS if f not in (reader.fieldnames or [])]
+    if missing:
+        raise ValueError(f"CSV header is missing columns: {', '.join(missing)}")
+    for row in reader:
+        row.pop(None, None) # Values beyond the header columns
+        yield reader.line_num, row, None
+
+def iter_ndjson_rows(stream):
+    for line_number, line in enumerate(_decoded_lines(stream), start=1):
+        line = line.strip()
+        if not line:
+            continue
+        try:
+            row = json.loads(line)
+        except ValueError as e:
+            yield line_number, None, f"Invalid JSON: {e}"
+            continue
+        if not isinstance(row, dict):
+            yield line_number, None, "Each line must be a JSON object"
+            continue
+        yield line_number, row, None
+
+# --- Validation ---
+def validate_price_row(row):
+    missing = [f for f in PRICE_REQUIRED_FIELDS if row.get(f) in (None, '')]
+    if missing:
+        return None, f"Missing required fields: {', '.join(missing)}"
+    try:
+        price = float(row['price'])
+    except (TypeError, ValueError):
+        return None, "price must be a number"
+    if not math.isfinite(price) or price < 0:
+        return None, "price must be a non-negative number"
+    recorded_on = None
+    if row.get('date_recorded'):
+        try:
+            recorded_on = datetime.strptime(str(row['date_recorded']), '%Y-%m-%d').date()
+        except ValueError:
+            return None, "date_recorded must be YYYY-MM-DD"
+    doc = {f: str(row[f]).strip() for f in ('produce_type', 'region', 'unit')}
+    doc['price'] = price
+    for f in ('currency', 'source'):
+        if row.get(f) not in (None, ''):
+            doc[f] = str(row[f]).strip()
+    try:
+        return prepare_market_price(doc, recorded_on), None
+    except ValueError as e: # produce_type with nothing left after normalization
+        return None, str(e)
+
+# --- Ingestion ---
+def ingest_market_prices(rows, batch_size=None):
+    batch_size = batch_size or Config.BULK_INSERT_BATCH_SIZE
+    report = {"received": 0, "inserted": 0, "failed": 0, "errors": [], "errors_truncated": False}
+
+    def add_error(line_number, message):
+        report['failed'] += 1
+        if len(report['errors']) < Config.BULK_MAX_ERRORS:
+            report['errors'].append({"row": line_number, "error": message})
+        else:
+            report['errors_truncated'] = True
+
+    def flush(docs, line_numbers):
+        failed = set()
+        try:
+            result = price_collection(db).insert_many([to_stored(doc) for doc in docs], ordered=False)
+            report['inserted'] += len(result.inserted_ids)
+        except BulkWriteError as e:
+            report['inserted'] += e.details.get('nInserted', 0)
+            for error in e.details.get('writeErrors', []):
+                failed.add(error['index'])
+                add_error(line_numbers[error['index']], error.get('errmsg', 'Write failed'))
+        apply_prices([doc for i, doc in enumerate(docs) if i not in failed])
+        if len(failed) < len(docs):
+            versions.bump('market_prices')
+
+    docs, line_numbers = [], []
+    for line_number, row, error in rows:
+        report['received'] += 1
+        if error is None:
+            doc, error = validate_price_row(row)
+        if error is not None:
+            add_error(line_number, error)
+            continue
+        docs.append(doc)
+        line_numbers.append(line_number)
+        if len(docs) >= batch_size:
+            flush(docs, line_numbers)
+            docs, line_numbers = [], []
+    if docs:
+        flush(docs, line_numbers)
+    return report
@@ -0,0 +1,56 @@
+import json
+from datetime import date, datetime
+from bson.decimal128 import Decimal128
+from bson.objectid import ObjectId
+from flask.json.provider import DefaultJSONProvider
+
+try:
+    import orjson # Optional: much faster encoder, used when installed
+except ImportError:
+    orjson = None
+
+# Mongo documents are encoded as they come from pymongo: ObjectId -> hex string,
+# datetime/date -> ISO 8601, Decimal128 -> decimal string. Routes never rewrite documents.
+def bson_default(value):
+    if isinstance(value, ObjectId):
+        return str(value)
+    if isinstance(value, (datetime, date)):
+        return value.isoformat()
+    if isinstance(value, Decimal128):
+        return str(value.to_decimal())
+    raise TypeError(f"Object of type {type(value).__name__} is not JSON serializable")
+
+def _default(value):
+    try:
+        return bson_default(value)
+    except TypeError:
+        return DefaultJSONProvider.default(value) # Decimal, UUID, dataclasses, ...
+
+if orjson is not None:
+    _ORJSON_OPTIONS = orjson.OPT_NON_STR_KEYS # datetime/date are encoded natively as ISO 8601
+
+    def dumps(obj):
+        return orjson.dumps(obj, default=_default, option=_ORJSON_OPTIONS).decode()
+else:
+    _encoder = json.JSONEncoder(default=_default, ensure_ascii=False, separators=(',', ':'))
+
+    def dumps(obj):
+        return _encoder.encode(obj)
+
+class MongoJSONProvider(DefaultJSONProvider):
+    sort_keys = False # Sorting keys is pure overhead on large list responses
+    default = staticmethod(_default)
+
+    def dumps(self, obj, **kwargs):
+        if not kwargs:
+            return dumps(obj)
+        kwargs.setdefault('default', self.default)
+        return json.dumps(obj, **kwargs)
+
+    def response(self, *args, **kwargs):
+        obj = self._prepare_response_obj(args, kwargs)
+        if self.compact is False or (self.compact is None and self._app.debug):
+            body = json.dumps(obj, default=self.default, indent=2, ensure_ascii=self.ensure_ascii)
+        else:
+            body = dumps(obj)
+        return self._app.response_class(body + '\n', mimetype=self.mimetype)
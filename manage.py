@@ -0,0 +1,164 @@
+import argparse
+
+# Maintenance commands, run out of band from the web workers:
+#   python manage.py migrate
+#   python manage.py rebuild-rollups
+#   python manage.py rebuild-subscriptions
+#   python manage.py backfill-geohash
+#   python manage.py backfill-updated-at
+#   python manage.py migrate-prices-timeseries [--batch-size 5000]
+#   python manage.py normalize-produce-types
+#   python manage.py verify-produce-type <produce_id>
+#   python manage.py expire [--loop --interval 300]
+#   python manage.py allocate [--produce-type maize]
+
+def migrate(args):
+    from migrations import ensure_indexes
+    ensure_indexes()
+    print("Indexes are up to date")
+
+def rebuild_rollups(args):
+    from rollups import rebuild_rollups
+    count = rebuild_rollups()
+    print(f"Rebuilt market price rollups: {count} documents")
+
+def rebuild_subscriptions(args):
+    from subscriptions import rebuild_subscriptions
+    count = rebuild_subscriptions()
+    print(f"Rebuilt price alert subscriptions: {count} listings")
+
+def backfill_geohash(args):
+    from pymongo import UpdateOne
+    from database import db
+    from geo import to_lng_lat, geohash_encode
+    import versions
+    ops, count = [], 0
+    for listing in db.produce_listings.find({"location_geohash": {"$exists": False}}, {"location": 1}):
+        point = to_lng_lat(listing.get('location'))
+        ops.append(UpdateOne({"_id": listing['_id']},
+                             {"$set": {"location_geohash": geohash_encode(*point) if point else None}}))
+        if len(ops) >= 1000:
+            count += db.produce_listings.bulk_write(ops, ordered=False).modified_count
+            ops = []
+    if ops:
+        count += db.produce_listings.bulk_write(ops, ordered=False).modified_count
+    if count:
+        versions.bump('produce_listings')
+    print(f"Backfilled location_geohash on {count} listings")
+
+def backfill_updated_at(args):
+    # Buyer requests created before they carried updated_at are invisible to delta sync
+    from database import db
+    import versions
+    result = db.buyer_requests.update_many(
+        {"updated_at": {"$exists": False}},
+        [{"$set": {"updated_at": {"$ifNull": ["$created_at", "$$NOW"]}}}]
+    )
+    if result.modified_count:
+        versions.bump('buyer_requests')
+    print(f"Backfilled updated_at on {result.modified_count} buyer requests")
+
+def migrate_prices_timeseries(args):
+    # Run before (and once more right before) setting MARKET_PRICE_STORAGE=timeseries
+    from database import db
+    from price_storage import migrate_to_timeseries, SERIES_COLLECTION
+    copied = migrate_to_timeseries(db, args.batch_size)
+    print(f"Copied {copied} market prices into {SERIES_COLLECTION}")
+
+def normalize_produce_types(args):
+    # Seed the catalog and rewrite stored produce types to canonical ids, then regenerate the
+    # collections keyed on produce_type (allocations catch up on the next `allocate` run)
+    from database import db
+    from catalog import seed_catalog, canonical_produce_type
+    from price_storage import price_collection, timeseries_enabled
+    from rollups import rebuild_rollups
+    from subscriptions import rebuild_subscriptions
+    import versions
+    seed_catalog()
+    prices_field = 'meta.produce_type' if timeseries_enabled() else 'produce_type'
+    for name, collection, field in (('produce_listings', db.produce_listings, 'produce_type'),
+                                    ('buyer_requests', db.buyer_requests, 'produce_type'),
+                                    ('market_prices', price_collection(db), prices_field)):
+        count = 0
+        for value in collection.distinct(field):
+            if not isinstance(value, str) or not value.strip():
+                continue
+            produce_id = canonical_produce_type(value)
+            if produce_id != value:
+                count += collection.update_many({field: value}, {"$set": {field: produce_id}}).modified_count
+        if count:
+            versions.bump(name)
+        print(f"Normalized produce_type on {count} {name}")
+    print(f"Rebuilt {rebuild_rollups()} rollups and {rebuild_subscriptions()} alert subscriptions")
+
+def verify_produce_type(args):
+    from catalog import verify
+    if not verify(args.produce_id):
+        raise SystemExit(f"No produce type {args.produce_id!r} in the catalog")
+    print(f"{args.produce_id} is verified and will show up in produce search")
+
+def expire(args):
+    import time
+    from expiry import expire_stale
+    while True:
+        counts = expire_stale()
+        print("Expired " + ", ".join(f"{count} {name}" for name, count in counts.items()))
+        if not args.loop:
+            break
+        time.sleep(args.interval)
+
+def allocate(args):
+    from allocation import run_allocation
+    run_id, stats = run_allocation(args.produce_type or None)
+    print(f"Allocation run {run_id}")
+    for produce_type, s in stats.items():
+        print(f"  {produce_type}: {s['listings']} listings, {s['requests']} requests, "
+              f"{s['edges']} candidate edges, {s['allocations']} allocations, {s['quantity']:.1f} units")
+
+def build_parser():
+    parser = argparse.ArgumentParser(description="Agritech Market Match maintenance commands")
+    commands = parser.add_subparsers(dest='command', required=True)
+
+    cmd = commands.add_parser('migrate', help="Create or update MongoDB indexes (idempotent)")
+    cmd.set_defaults(func=migrate)
+
+    cmd = commands.add_parser('rebuild-rollups', help="Regenerate market_price_rollups from market_prices")
+    cmd.set_defaults(func=rebuild_rollups)
+
+    cmd = commands.add_parser('rebuild-subscriptions', help="Regenerate alert_subscriptions from active listings")
+    cmd.set_defaults(func=rebuild_subscriptions)
+
+    cmd = commands.add_parser('backfill-geohash', help="Stamp location_geohash on listings created before it existed")
+    cmd.set_defaults(func=backfill_geohash)
+
+    cmd = commands.add_parser('backfill-updated-at', help="Stamp updated_at on buyer requests created before it existed")
+    cmd.set_defaults(func=backfill_updated_at)
+
+    cmd = commands.add_parser('migrate-prices-timeseries', help="Copy market_prices into the time-series collection")
+    cmd.add_argument('--batch-size', type=int, default=5000)
+    cmd.set_defaults(func=migrate_prices_timeseries)
+
+    cmd = commands.add_parser('normalize-produce-types', help="Seed the produce catalog and canonicalize stored produce types")
+    cmd.set_defaults(func=normalize_produce_types)
+
+    cmd = commands.add_parser('verify-produce-type', help="Make an auto-registered produce type searchable")
+    cmd.add_argument('produce_id')
+    cmd.set_defaults(func=verify_produce_type)
+
+    cmd = commands.add_parser('expire', help="Deactivate listings and requests whose availability has passed")
+    cmd.add_argument('--loop', action='store_true', help="Keep sweeping every --interval seconds")
+    cmd.add_argument('--interval', type=int, default=300)
+    cmd.set_defaults(func=expire)
+
+    cmd = commands.add_parser('allocate', help="Solve the batch supply/demand allocation (requires numpy)")
+    cmd.add_argument('--produce-type', action='append', help="Limit to these produce types (repeatable)")
+    cmd.set_defaults(func=allocate)
+
+    return parser
+
+def main(argv=None):
+    args = build_parser().parse_args(argv)
+    args.func(args)
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,171 @@
+import heapq
+import math
+from database import db
+from config import Config
+from geo import to_lng_lat, haversine_km, EARTH_RADIUS_KM
+
+# Only the fields the scorer and the response need are pulled from Mongo
+REQUEST_PROJECTION = {
+    'buyer_id': 1, 'produce_type': 1, 'quantity_needed': 1, 'unit': 1,
+    'delivery_location': 1, 'target_price_per_unit': 1
+}
+LISTING_PROJECTION = {
+    'farmer_id': 1, 'produce_type': 1, 'quantity': 1, 'unit': 1, 'price_per_unit': 1,
+    'location': 1, 'available_from': 1, 'available_until': 1
+}
+
+def _as_float(value):
+    try:
+        return float(value)
+    except (TypeError, ValueError):
+        return None
+
+# --- Scoring ---
+def distance_score(distance_km):
+    if distance_km is None:
+        return Config.MATCH_UNKNOWN_SCORE
+    return 1.0 / (1.0 + distance_km / Config.MATCH_DISTANCE_SCALE_KM)
+
+def quantity_score(offered, needed):
+    offered, needed = _as_float(offered), _as_float(needed)
+    if not offered or not needed or offered < 0 or needed < 0:
+        return Config.MATCH_UNKNOWN_SCORE
+    return min(offered, needed) / max(offered, needed)
+
+def price_score(listing_price, target_price):
+    listing_price, target_price = _as_float(listing_price), _as_float(target_price)
+    if not listing_price or not target_price or listing_price < 0 or target_price < 0:
+        return Config.MATCH_UNKNOWN_SCORE
+    if listing_price <= target_price:
+        return 1.0
+    return target_price / listing_price
+
+def score_pair(listing, req):
+    a = to_lng_lat(listing.get('location'))
+    b = to_lng_lat(req.get('delivery_location'))
+    distance_km = haversine_km(a, b) if a and b else None
+    scores = {
+        'distance': distance_score(distance_km),
+        'quantity': quantity_score(listing.get('quantity'), req.get('quantity_needed')),
+        'price': price_score(listing.get('price_per_unit'), req.get('target_price_per_unit'))
+    }
+    weights = Config.MATCH_WEIGHTS
+    total = sum(weights[k] * scores[k] for k in scores) / sum(weights.values())
+    return total, distance_km, scores
+
+# --- Ranking ---
+class TopMatches:
+    # Keeps only the best offset + limit candidates in a heap while they are fed one at a time,
+    # so neither a sync cursor nor an async one (async_routes) is ever held in memory
+    def __init__(self, pair_for, limit, offset, max_distance_km):
+        self.pair_for, self.limit, self.offset = pair_for, limit, offset
+        self.max_distance_km = max_distance_km
+        self.scored = []
+        self.total = 0
+        self._seq = 0
+
+    def add(self, doc):
+        listing, req = self.pair_for(doc)
+        score, distance_km, scores = score_pair(listing, req)
+        self._seq += 1
+        if self.max_distance_km is not None and (distance_km is None or distance_km > self.max_distance_km):
+            return
+        self.total += 1
+        # seq keeps ordering stable for equal scores and avoids comparing dicts
+        item = (score, -self._seq, doc, distance_km, scores)
+        if len(self.scored) < self.offset + self.limit:
+            heapq.heappush(self.scored, item)
+        elif item[:2] > self.scored[0][:2]:
+            heapq.heapreplace(self.scored, item)
+
+    def ranked(self):
+        return sorted(self.scored, key=lambda item: item[:2], reverse=True)[self.offset:self.offset + self.limit]
+
+def parse_match_args(args):
+    # ?limit=&offset=&max_distance_km= from a request args mapping
+    try:
+        limit = int(args.get('limit', Config.MATCH_PAGE_SIZE))
+        offset = int(args.get('offset', 0))
+        max_distance_km = args.get('max_distance_km')
+        max_distance_km = float(max_distance_km) if max_distance_km is not None else None
+    except ValueError:
+        raise ValueError("limit, offset and max_distance_km must be numbers")
+    if limit < 1 or offset < 0:
+        raise ValueError("limit must be positive and offset non-negative")
+    if max_distance_km is not None and not (math.isfinite(max_distance_km) and max_distance_km >= 0):
+        raise ValueError("max_distance_km must be a non-negative number")
+    # The ranking heap holds offset + limit candidates, so both are capped
+    return min(limit, Config.MATCH_MAX_PAGE_SIZE), min(offset, Config.MATCH_MAX_OFFSET), max_distance_km
+
+# --- Candidate queries ---
+# Split from the ranking below so the async routes can fetch candidates with their own driver
+def requests_query(listing):
+    return {"produce_type": listing['produce_type'], "is_active": True}
+
+def listings_query(req, max_distance_km=None):
+    query = {"produce_type": req['produce_type'], "is_active": True}
+    point = to_lng_lat(req.get('delivery_location'))
+    if point and max_distance_km is not None and Config.GEO_BACKEND == 'mongo':
+        # Let the 2dsphere index on produce_listings.location prune far away listings
+        query['location'] = {"$geoWithin": {"$centerSphere": [list(point), max_distance_km / EARTH_RADIUS_KM]}}
+    return query
+
+def match_listing(listing, limit=20, offset=0, max_distance_km=None):
+    candidates = db.buyer_requests.find(requests_query(listing), REQUEST_PROJECTION)
+    return rank_requests(listing, candidates, limit, offset, max_distance_km)
+
+def match_request(req, limit=20, offset=0, max_distance_km=None):
+    candidates = db.produce_listings.find(listings_query(req, max_distance_km), LISTING_PROJECTION)
+    return rank_listings(req, candidates, limit, offset, max_distance_km)
+
+def request_ranking(listing, limit=20, offset=0, max_distance_km=None):
+    return TopMatches(lambda req: (listing, req), limit, offset, max_distance_km)
+
+def request_matches(top):
+    matches = []
+    for score, _, req, distance_km, scores in top.ranked():
+        matches.append({
+            "request_id": str(req['_id']),
+            "buyer_id": req.get('buyer_id'),
+            "quantity_needed": req.get('quantity_needed'),
+            "unit": req.get('unit'),
+            "delivery_location": req.get('delivery_location'),
+            "target_price": req.get('target_price_per_unit'),
+            "distance_km": round(distance_km, 3) if distance_km is not None else None,
+            "score": round(score, 4),
+            "scores": {k: round(v, 4) for k, v in scores.items()}
+        })
+    return matches, top.total
+
+def rank_requests(listing, candidates, limit=20, offset=0, max_distance_km=None):
+    top = request_ranking(listing, limit, offset, max_distance_km)
+    for req in candidates:
+        top.add(req)
+    return request_matches(top)
+
+def listing_ranking(req, limit=20, offset=0, max_distance_km=None):
+    return TopMatches(lambda listing: (listing, req), limit, offset, max_distance_km)
+
+def listing_matches(top):
+    matches = []
+    for score, _, listing, distance_km, scores in top.ranked():
+        matches.append({
+            "listing_id": str(listing['_id']),
+            "farmer_id": listing.get('farmer_id'),
+            "quantity": listing.get('quantity'),
+            "unit": listing.get('unit'),
+            "price_per_unit": listing.get('price_per_unit'),
+            "location": listing.get('location'),
+            "available_from": listing.get('available_from'),
+            "available_until": listing.get('available_until'),
+            "distance_km": round(distance_km, 3) if distance_km is not None else None,
+            "score": round(score, 4),
+            "scores": {k: round(v, 4) for k, v in scores.items()}
+        })
+    return matches, top.total
+
+def rank_listings(req, candidates, limit=20, offset=0, max_distance_km=None):
+    top = listing_ranking(req, limit, offset, max_distance_km)
+    for listing in candidates:
+        top.add(listing)
+    return listing_matches(top)
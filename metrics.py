@@ -0,0 +1,188 @@
+import bisect
+import random
+import threading
+import time
+import bson
+from flask import Response, current_app, g, request
+from pymongo import monitoring
+from config import Config
+
+# --- Metric types ---
+def _escape(value):
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+def _labels(names, values, extra=None):
+    pairs = [f'{n}="{_escape(v)}"' for n, v in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    return '{' + ','.join(pairs) + '}' if pairs else ''
+
+class Counter:
+    def __init__(self, name, help_text, labelnames=()):
+        self.name, self.help, self.labelnames = name, help_text, labelnames
+        self._values = {}
+        self._lock = threading.Lock()
+
+    def inc(self, labels=(), amount=1):
+        with self._lock:
+            self._values[labels] = self._values.get(labels, 0) + amount
+
+    def render(self):
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} counter"]
+        with self._lock:
+            for labels, value in sorted(self._values.items()):
+                lines.append(f"{self.name}{_labels(self.labelnames, labels)} {value}")
+        return lines
+
+class Histogram:
+    def __init__(self, name, help_text, labelnames=(), buckets=None):
+        self.name, self.help, self.labelnames = name, help_text, labelnames
+        self.buckets = sorted(buckets or Config.METRICS_LATENCY_BUCKETS)
+        self._values = {} # labels -> [bucket counts..., sum, count]
+        self._lock = threading.Lock()
+
+    def observe(self, value, labels=()):
+        index = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            series = self._values.get(labels)
+            if series is None:
+                series = self._values[labels] = [0] * (len(self.buckets) + 2)
+            if index < len(self.buckets):
+                series[index] += 1
+            series[-2] += value
+            series[-1] += 1
+
+    def render(self):
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} histogram"]
+        with self._lock:
+            for labels, series in sorted(self._values.items()):
+                cumulative = 0
+                for bound, count in zip(self.buckets, series):
+                    cumulative += count
+                    le = _labels(self.labelnames, labels, 'le="%s"' % bound)
+                    lines.append(f"{self.name}_bucket{le} {cumulative}")
+                le = _labels(self.labelnames, labels, 'le="+Inf"')
+                lines.append(f"{self.name}_bucket{le} {series[-1]}")
+                lines.append(f"{self.name}_sum{_labels(self.labelnames, labels)} {series[-2]}")
+                lines.append(f"{self.name}_count{_labels(self.labelnames, labels)} {series[-1]}")
+        return lines
+
+http_latency = Histogram('http_request_duration_seconds', "Request latency per route",
+                         ('method', 'endpoint', 'status'))
+mongo_latency = Histogram('mongo_command_duration_seconds', "MongoDB command latency (sampled requests)",
+                          ('collection', 'command'))
+mongo_documents = Counter('mongo_command_documents_total', "Documents returned or written (sampled requests)",
+                          ('collection', 'command'))
+mongo_reply_bytes = Counter('mongo_command_reply_bytes_total', "BSON bytes returned (sampled requests)",
+                            ('collection', 'command'))
+mongo_failures = Counter('mongo_command_failures_total', "Failed MongoDB commands (sampled requests)",
+                         ('collection', 'command'))
+mongo_round_trips = Histogram('http_request_mongo_round_trips', "MongoDB round trips per sampled request",
+                              ('method', 'endpoint'), buckets=[0, 1, 2, 3, 5, 10, 20, 50, 100])
+admission_rejections = Counter('http_admission_rejections_total', "Requests shed by admission control",
+                               ('endpoint_class', 'reason'))
+METRICS = [http_latency, mongo_latency, mongo_documents, mongo_reply_bytes, mongo_failures, mongo_round_trips,
+           admission_rejections]
+
+# --- Mongo command instrumentation ---
+# Commands are attributed to the request running on the same thread. Nothing is recorded
+# (beyond a thread-local check) unless the request was sampled.
+_local = threading.local()
+
+def _reply_documents(reply):
+    cursor = reply.get('cursor')
+    if isinstance(cursor, dict):
+        return len(cursor.get('firstBatch', cursor.get('nextBatch', [])))
+    n = reply.get('n')
+    return n if isinstance(n, int) else 0
+
+class CommandListener(monitoring.CommandListener):
+    def started(self, event):
+        trace = getattr(_local, 'trace', None)
+        if trace is None:
+            return
+        target = event.command.get(event.command_name)
+        collection = event.command.get('collection') if event.command_name == 'getMore' else target
+        trace['pending'][event.request_id] = collection if isinstance(collection, str) else ''
+
+    def succeeded(self, event):
+        trace = getattr(_local, 'trace', None)
+        if trace is None:
+            return
+        collection = trace['pending'].pop(event.request_id, '')
+        seconds = event.duration_micros / 1e6
+        labels = (collection, event.command_name)
+        mongo_latency.observe(seconds, labels)
+        mongo_documents.inc(labels, _reply_documents(event.reply))
+        mongo_reply_bytes.inc(labels, len(bson.encode(event.reply)))
+        trace['round_trips'] += 1
+        trace['mongo_seconds'] += seconds
+        trace['commands'].append((event.command_name, collection, seconds))
+
+    def failed(self, event):
+        trace = getattr(_local, 'trace', None)
+        if trace is None:
+            return
+        collection = trace['pending'].pop(event.request_id, '')
+        mongo_failures.inc((collection, event.command_name))
+        trace['round_trips'] += 1
+        trace['mongo_seconds'] += event.duration_micros / 1e6
+
+command_listener = CommandListener()
+
+# --- Flask integration ---
+def _before_request():
+    g.metrics_start = time.perf_counter()
+    if Config.METRICS_SAMPLE_RATE and random.random() < Config.METRICS_SAMPLE_RATE:
+        _local.trace = {"pending": {}, "round_trips": 0, "mongo_seconds": 0.0, "commands": []}
+    else:
+        _local.trace = None
+
+def _after_request(response):
+    start = g.pop('metrics_start', None)
+    trace, _local.trace = getattr(_local, 'trace', None), None
+    if start is None:
+        return response
+    elapsed = time.perf_counter() - start
+    endpoint = request.url_rule.rule if request.url_rule else 'unmatched'
+    http_latency.observe(elapsed, (request.method, endpoint, str(response.status_code)))
+    if trace is not None:
+        mongo_round_trips.observe(trace['round_trips'], (request.method, endpoint))
+        if elapsed * 1000 >= Config.SLOW_REQUEST_MS:
+            # Time not spent in Mongo is Python work: filtering, scoring and serialization
+            slowest = sorted(trace['commands'], key=lambda c: c[2], reverse=True)[:5]
+            current_app.logger.warning(
+                "Slow request %s %s: %.1fms total, %.1fms in %d Mongo round trips, %.1fms in Python; slowest: %s",
+                request.method, request.path, elapsed * 1000, trace['mongo_seconds'] * 1000,
+                trace['round_trips'], (elapsed - trace['mongo_seconds']) * 1000,
+                ', '.join(f"{cmd} {coll} {sec * 1000:.1f}ms" for cmd, coll, sec in slowest) or 'none'
+            )
+    return response
+
+def render_metrics():
+    lines = []
+    for metric in METRICS:
+        lines.extend(metric.render())
+    # Process-level gauges from the caches and the SMS queue
+    from models import user_cache
+    from pagination import response_cache
+    for name, cache in (("user_cache", user_cache), ("response_cache", response_cache)):
+        lines.append(f"# TYPE {name} gauge")
+        for key, value in cache.stats().items():
+            lines.append(f'{name}{{stat="{key}"}} {value}')
+    import sms_queue
+    if sms_queue._sms_queue is not None:
+        lines.append("# TYPE sms_queue gauge")
+        for key, value in sms_queue._sms_queue.stats().items():
+            lines.append(f'sms_queue{{stat="{key}"}} {value}')
+    return '\n'.join(lines) + '\n'
+
+def init_metrics(app):
+    if not app.config.get('METRICS_ENABLED'):
+        return
+    app.before_request(_before_request)
+    app.after_request(_after_request)
+
+    @app.route('/metrics')
+    def metrics():
+        return Response(render_metrics(), mimetype='text/plain; version=0.0.4')
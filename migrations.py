@@ -0,0 +1,49 @@
+from pymongo.errors import OperationFailure
+from database import get_db
+from config import Config
+from price_storage import timeseries_enabled, ensure_series_collection
+
+# Index migrations, run out of band with `python manage.py migrate` (never at worker startup).
+# create_index is a no-op when an identical index already exists, so this is safe to re-run.
+
+ACTIVE = {"partialFilterExpression": {"is_active": True}}
+
+def _drop_index(collection, name):
+    try:
+        collection.drop_index(name)
+    except OperationFailure:
+        pass # Already gone
+
+def ensure_indexes(db=None):
+    db = db if db is not None else get_db()
+    db.users.create_index("email", unique=True)
+    db.produce_listings.create_index([("location", "2dsphere")]) # For geospatial queries
+    # Hot list, match and expiry queries all filter on is_active: True, so their indexes only
+    # cover active documents and stay proportional to live supply and demand
+    _drop_index(db.produce_listings, "produce_type_1_is_active_1") # Replaced by the partial index below
+    _drop_index(db.buyer_requests, "produce_type_1_is_active_1")
+    db.produce_listings.create_index([("_id", 1), ("is_active", 1)], name="active_by_id", **ACTIVE)
+    db.produce_listings.create_index([("produce_type", 1)], name="active_by_produce_type", **ACTIVE)
+    db.produce_listings.create_index([("available_until", 1)], name="active_by_available_until", **ACTIVE)
+    db.produce_listings.create_index("farmer_id")
+    db.produce_listings.create_index("location_geohash") # Prefix lookups for the geohash proximity fallback
+    db.buyer_requests.create_index([("_id", 1), ("is_active", 1)], name="active_by_id", **ACTIVE)
+    db.buyer_requests.create_index([("produce_type", 1)], name="active_by_produce_type", **ACTIVE)
+    db.buyer_requests.create_index([("needed_by", 1)], name="active_by_needed_by", **ACTIVE)
+    # Delta sync reads every change, active or not, in (updated_at, _id) order
+    db.produce_listings.create_index([("updated_at", 1), ("_id", 1)], name="by_updated_at")
+    db.buyer_requests.create_index([("updated_at", 1), ("_id", 1)], name="by_updated_at")
+    db.tombstones.create_index([("collection", 1), ("deleted_at", 1), ("_id", 1)])
+    db.tombstones.create_index("deleted_at", expireAfterSeconds=Config.SYNC_TOMBSTONE_RETENTION_DAYS * 86400)
+    db.market_prices.create_index([("produce_type", 1), ("region", 1), ("date_recorded", -1)])
+    if timeseries_enabled():
+        ensure_series_collection(db) # Must exist as a time-series collection before anything writes to it
+    db.market_price_rollups.create_index(
+        [("produce_type", 1), ("region", 1), ("period", 1), ("period_start", 1)], unique=True
+    )
+    db.alert_subscriptions.create_index([("produce_type", 1), ("region", 1)]) # Price alert fan-out
+    db.alert_subscriptions.create_index("farmer_id")
+    db.sessions.create_index("expires_at", expireAfterSeconds=0) # Mongo session backend TTL
+    db.allocations.create_index([("produce_type", 1), ("run_id", 1), ("_id", 1)])
+    db.allocations.create_index("farmer_id")
+    db.allocations.create_index("buyer_id")
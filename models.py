@@ -2,6 +2,23 @@ from database import db
 from datetime import datetime
 from bson.objectid import ObjectId # For unique MongoDB IDs
 import hashlib # For password hashing
+from pagination import keyset_filter
+from cache import LRUCache
+from config import Config
+from rollups import apply_prices
+from pymongo import ReturnDocument
+import subscriptions
+import versions
+from sync import record_tombstone
+from price_storage import price_collection, price_sort, price_query, to_stored, api_stages, timeseries_enabled
+from geo import to_lng_lat, geohash_encode
+from catalog import canonical_produce_type
+
+# Keyset sort orders for the paginated list queries (_id breaks ties)
+PRODUCE_SORT = [("_id", 1)]
+BUYER_REQUEST_SORT = [("_id", 1)]
+MARKET_PRICE_SORT = price_sort() # Depends on MARKET_PRICE_STORAGE
+ALLOCATION_SORT = [("_id", 1)]
 
 # --- User Management ---
 def create_user(user_data):
@@ -16,70 +33,202 @@ def find_user_by_email(email):
 def find_user_by_id(user_id):
     return db.users.find_one({"_id": ObjectId(user_id)})
 
+def find_user_profile(user_id):
+    # Current profile without the password hash, always read from Mongo
+    return db.users.find_one({"_id": ObjectId(user_id)}, {"password": 0})
+
+# Users without their password hash, keyed by string id, for role checks on every request.
+# The cache is per process and update_user only invalidates it locally, so anything that shows
+# or stores profile fields (/me, alert subscriptions) reads find_user_profile instead.
+user_cache = LRUCache(Config.USER_CACHE_SIZE, Config.USER_CACHE_TTL)
+
+def get_cached_user(user_id):
+    user = user_cache.get(user_id)
+    if user is None:
+        user = find_user_profile(user_id)
+        if user is None:
+            return None
+        user_cache.set(user_id, user)
+    return dict(user) # Callers may mutate their copy
+
+def update_user(user_id, update_data):
+    if 'password' in update_data:
+        update_data['password'] = hashlib.sha256(update_data['password'].encode()).hexdigest()
+    update_data['updated_at'] = datetime.utcnow()
+    result = db.users.update_one({"_id": ObjectId(user_id)}, {"$set": update_data})
+    user_cache.invalidate(str(user_id))
+    user = find_user_profile(user_id)
+    if user and user.get('user_type') == 'farmer':
+        subscriptions.resync_farmer(user) # Contact number or location may have changed
+    return result
+
+def delete_user(user_id):
+    result = db.users.delete_one({"_id": ObjectId(user_id)})
+    user_cache.invalidate(str(user_id))
+    subscriptions.remove_farmer(user_id)
+    return result
+
 def verify_password(hashed_password, provided_password):
     return hashed_password == hashlib.sha256(provided_password.encode()).hexdigest()
 
 # --- Produce Listing Management ---
-def create_produce_listing(listing_data):
+def _stamp_geohash(listing_data):
+    # Precomputed cell for the geohash-grid proximity fallback
+    point = to_lng_lat(listing_data.get('location'))
+    listing_data['location_geohash'] = geohash_encode(*point) if point else None
+
+LISTING_REQUIRED_FIELDS = ['produce_type', 'quantity', 'unit', 'price_per_unit', 'available_from', 'available_until']
+REQUEST_REQUIRED_FIELDS = ['produce_type', 'quantity_needed', 'unit', 'delivery_location']
+
+# Fields a client update may never set; the owner fields are what the write filters check
+PROTECTED_FIELDS = ('_id', 'farmer_id', 'buyer_id', 'created_at')
+
+def owner_filter(doc_id, owner_field=None, owner_id=None):
+    query = {"_id": ObjectId(doc_id)}
+    if owner_id is not None:
+        query[owner_field] = owner_id
+    return query
+
+def document_exists(collection_name, doc_id):
+    return db[collection_name].find_one({"_id": ObjectId(doc_id)}, {"_id": 1}) is not None
+
+def prepare_produce_listing(listing_data):
+    listing_data['produce_type'] = canonical_produce_type(listing_data['produce_type'])
+    _stamp_geohash(listing_data)
     listing_data['created_at'] = datetime.utcnow()
     listing_data['updated_at'] = datetime.utcnow()
     listing_data['is_active'] = True
-    return db.produce_listings.insert_one(listing_data)
+    return listing_data
+
+def prepare_listing_update(update_data):
+    update_data = {k: v for k, v in update_data.items() if k not in PROTECTED_FIELDS}
+    update_data['updated_at'] = datetime.utcnow()
+    if 'produce_type' in update_data:
+        update_data['produce_type'] = canonical_produce_type(update_data['produce_type'])
+    if 'location' in update_data:
+        _stamp_geohash(update_data)
+    return update_data
+
+def create_produce_listing(listing_data):
+    result = db.produce_listings.insert_one(prepare_produce_listing(listing_data))
+    versions.bump('produce_listings')
+    subscriptions.sync_listing(listing_data, find_user_profile(listing_data['farmer_id']))
+    return result
 
-def get_all_produce_listings():
-    return list(db.produce_listings.find({"is_active": True}))
+def get_all_produce_listings(after=None, projection=None, limit=0):
+    query = keyset_filter({"is_active": True}, PRODUCE_SORT, after)
+    return db.produce_listings.find(query, projection).sort(PRODUCE_SORT).limit(limit)
 
 def get_produce_listing_by_id(listing_id):
     return db.produce_listings.find_one({"_id": ObjectId(listing_id)})
 
-def update_produce_listing(listing_id, update_data):
-    update_data['updated_at'] = datetime.utcnow()
-    return db.produce_listings.update_one(
-        {"_id": ObjectId(listing_id)},
-        {"$set": update_data}
+def update_produce_listing(listing_id, update_data, farmer_id=None):
+    # With farmer_id the ownership check is part of the filter: None means missing or not theirs
+    listing = db.produce_listings.find_one_and_update(
+        owner_filter(listing_id, 'farmer_id', farmer_id),
+        {"$set": prepare_listing_update(update_data)},
+        return_document=ReturnDocument.AFTER
     )
-
-def delete_produce_listing(listing_id):
-    return db.produce_listings.delete_one({"_id": ObjectId(listing_id)})
+    if listing:
+        versions.bump('produce_listings')
+        subscriptions.sync_listing(listing, find_user_profile(listing['farmer_id']))
+    return listing
+
+def delete_produce_listing(listing_id, farmer_id=None):
+    listing = db.produce_listings.find_one_and_delete(owner_filter(listing_id, 'farmer_id', farmer_id), {"_id": 1})
+    if listing:
+        record_tombstone('produce_listings', listing['_id'])
+        versions.bump('produce_listings')
+        subscriptions.remove_listing(listing['_id'])
+    return listing
 
 # --- Market Price Data ---
+def prepare_market_price(price_data, recorded_on=None):
+    price_data['produce_type'] = canonical_produce_type(price_data['produce_type'])
+    now = datetime.utcnow()
+    if recorded_on is None or recorded_on == now.date():
+        price_data['recorded_at'] = now
+    else:
+        price_data['recorded_at'] = datetime(recorded_on.year, recorded_on.month, recorded_on.day)
+    price_data['date_recorded'] = price_data['recorded_at'].date().isoformat() # Store as ISO date string
+    return price_data
+
 def add_market_price(price_data):
-    price_data['date_recorded'] = datetime.utcnow().date().isoformat() # Store as ISO date string
-    return db.market_prices.insert_one(price_data)
-
-def get_market_prices(produce_type=None, region=None, date_from=None, date_to=None):
-    query = {}
-    if produce_type:
-        query['produce_type'] = produce_type
-    if region:
-        query['region'] = region
-    if date_from or date_to:
-        date_query = {}
-        if date_from:
-            date_query['$gte'] = date_from
-        if date_to:
-            date_query['$lte'] = date_to
-        query['date_recorded'] = date_query
-    return list(db.market_prices.find(query).sort("date_recorded", -1))
+    result = price_collection(db).insert_one(to_stored(prepare_market_price(price_data)))
+    apply_prices([price_data]) # Keep the daily/weekly rollups current
+    versions.bump('market_prices') # After the rollups, so analytics never caches them under the new version
+    return result
+
+def get_market_prices(produce_type=None, region=None, date_from=None, date_to=None,
+                      after=None, projection=None, limit=0):
+    query = keyset_filter(price_query(produce_type, region, date_from, date_to), MARKET_PRICE_SORT, after)
+    if not timeseries_enabled():
+        return db.market_prices.find(query, projection).sort(MARKET_PRICE_SORT).limit(limit)
+    # Time-series buckets are filtered and sorted in stored form, then reshaped for the API
+    pipeline = [{"$match": query}, {"$sort": dict(MARKET_PRICE_SORT)}]
+    if limit:
+        pipeline.append({"$limit": limit})
+    pipeline += api_stages()
+    if projection:
+        pipeline.append({"$project": projection})
+    return price_collection(db).aggregate(pipeline)
 
 # --- Buyer Requests ---
-def create_buyer_request(request_data):
+def prepare_buyer_request(request_data):
+    request_data['produce_type'] = canonical_produce_type(request_data['produce_type'])
     request_data['created_at'] = datetime.utcnow()
+    request_data['updated_at'] = datetime.utcnow()
     request_data['is_active'] = True
-    return db.buyer_requests.insert_one(request_data)
+    return request_data
 
-def get_all_buyer_requests():
-    return list(db.buyer_requests.find({"is_active": True}))
+def prepare_request_update(update_data):
+    update_data = {k: v for k, v in update_data.items() if k not in PROTECTED_FIELDS}
+    update_data['updated_at'] = datetime.utcnow()
+    if 'produce_type' in update_data:
+        update_data['produce_type'] = canonical_produce_type(update_data['produce_type'])
+    return update_data
+
+def create_buyer_request(request_data):
+    result = db.buyer_requests.insert_one(prepare_buyer_request(request_data))
+    versions.bump('buyer_requests')
+    return result
+
+def get_all_buyer_requests(after=None, projection=None, limit=0):
+    query = keyset_filter({"is_active": True}, BUYER_REQUEST_SORT, after)
+    return db.buyer_requests.find(query, projection).sort(BUYER_REQUEST_SORT).limit(limit)
 
 def get_buyer_request_by_id(request_id):
     return db.buyer_requests.find_one({"_id": ObjectId(request_id)})
 
-def update_buyer_request(request_id, update_data):
-    return db.buyer_requests.update_one(
-        {"_id": ObjectId(request_id)},
-        {"$set": update_data}
+def update_buyer_request(request_id, update_data, buyer_id=None):
+    req = db.buyer_requests.find_one_and_update(
+        owner_filter(request_id, 'buyer_id', buyer_id),
+        {"$set": prepare_request_update(update_data)},
+        return_document=ReturnDocument.AFTER
     )
-
-def delete_buyer_request(request_id):
-    return db.buyer_requests.delete_one({"_id": ObjectId(request_id)})
-
+    if req:
+        versions.bump('buyer_requests')
+    return req
+
+def delete_buyer_request(request_id, buyer_id=None):
+    req = db.buyer_requests.find_one_and_delete(owner_filter(request_id, 'buyer_id', buyer_id), {"_id": 1})
+    if req:
+        record_tombstone('buyer_requests', req['_id'])
+        versions.bump('buyer_requests')
+    return req
+
+
+# --- Allocations (written by `manage.py allocate`) ---
+def get_allocations(produce_type=None, farmer_id=None, buyer_id=None, after=None, projection=None, limit=0):
+    # Only the current run of each produce type is visible
+    runs = db.allocation_runs.find({"_id": produce_type} if produce_type else {}, {"run_id": 1})
+    current = [{"produce_type": run['_id'], "run_id": run['run_id']} for run in runs]
+    if not current:
+        current = [{"_id": None}] # Nothing allocated yet
+    query = {"$or": current}
+    if farmer_id:
+        query['farmer_id'] = farmer_id
+    if buyer_id:
+        query['buyer_id'] = buyer_id
+    query = keyset_filter(query, ALLOCATION_SORT, after)
+    return db.allocations.find(query, projection).sort(ALLOCATION_SORT).limit(limit)
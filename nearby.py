@@ -0,0 +1,65 @@
+import re
+from database import db
+from config import Config
+from geo import geohash_cover, haversine_km, to_lng_lat
+
+def _listing_query(produce_type=None, max_price=None, available_from=None, available_until=None):
+    query = {"is_active": True}
+    if produce_type:
+        query['produce_type'] = produce_type
+    if max_price is not None:
+        query['price_per_unit'] = {"$lte": max_price}
+    # Listing availability must overlap the requested window
+    if available_until:
+        query['available_from'] = {"$lte": available_until}
+    if available_from:
+        query['available_until'] = {"$gte": available_from}
+    return query
+
+def _near_with_mongo(point, radius_km, query, limit, offset):
+    pipeline = [
+        {"$geoNear": {
+            "near": {"type": "Point", "coordinates": list(point)},
+            "key": "location",
+            "distanceField": "distance_m",
+            "maxDistance": radius_km * 1000,
+            "spherical": True,
+            "query": query
+        }},
+        {"$skip": offset},
+        {"$limit": limit}
+    ]
+    results = []
+    for listing in db.produce_listings.aggregate(pipeline):
+        listing['distance_km'] = round(listing.pop('distance_m') / 1000, 3)
+        results.append(listing)
+    return results
+
+def _near_with_grid(point, radius_km, query, limit, offset):
+    # Candidates come from the geohash cells covering the circle, then exact distances are applied
+    cells = geohash_cover(point[0], point[1], radius_km)
+    query = dict(query)
+    query['$or'] = [{"location_geohash": {"$regex": "^" + re.escape(cell)}} for cell in cells]
+    results = []
+    for listing in db.produce_listings.find(query):
+        location = to_lng_lat(listing.get('location'))
+        if not location:
+            continue
+        distance_km = haversine_km(point, location)
+        if distance_km <= radius_km:
+            listing['distance_km'] = round(distance_km, 3)
+            results.append(listing)
+    results.sort(key=lambda listing: listing['distance_km'])
+    return results[offset:offset + limit]
+
+def find_nearby_listings(point, radius_km, produce_type=None, max_price=None,
+                         available_from=None, available_until=None, limit=20, offset=0):
+    query = _listing_query(produce_type, max_price, available_from, available_until)
+    if Config.GEO_BACKEND == 'mongo':
+        # Only a store without $geoNear support falls back to the geohash grid; server errors
+        # such as a missing 2dsphere index propagate instead of hiding behind a Python scan
+        try:
+            return _near_with_mongo(point, radius_km, query, limit, offset)
+        except NotImplementedError:
+            pass
+    return _near_with_grid(point, radius_km, query, limit, offset)
@@ -0,0 +1,139 @@
+import base64
+import hashlib
+from bson import json_util
+from flask import request, jsonify, Response
+from cache import LRUCache
+from config import Config
+from json_provider import dumps
+import versions
+
+# --- Keyset cursors ---
+# A cursor is the sort-key values of the last document on a page, serialized with
+# bson.json_util (so ObjectIds and datetimes round-trip) and base64url encoded.
+def encode_cursor(doc, sort):
+    raw = json_util.dumps([doc.get(field) for field, _ in sort])
+    return base64.urlsafe_b64encode(raw.encode()).decode().rstrip('=')
+
+def decode_cursor(token, sort):
+    try:
+        raw = base64.urlsafe_b64decode(token + '=' * (-len(token) % 4)).decode()
+        values = json_util.loads(raw)
+    except (ValueError, TypeError):
+        raise ValueError("Invalid 'after' cursor")
+    if not isinstance(values, list) or len(values) != len(sort):
+        raise ValueError("Invalid 'after' cursor")
+    return values
+
+def keyset_filter(query, sort, after):
+    # Everything strictly after `after` in `sort` order:
+    # (a, b) > (x, y)  <=>  a > x  or  (a == x and b > y)
+    if not after:
+        return query
+    clauses = []
+    for i, (field, direction) in enumerate(sort):
+        clause = {prev: after[j] for j, (prev, _) in enumerate(sort[:i])}
+        clause[field] = {"$gt" if direction == 1 else "$lt": after[i]}
+        clauses.append(clause)
+    keyset = clauses[0] if len(clauses) == 1 else {"$or": clauses}
+    return {"$and": [query, keyset]} if query else keyset
+
+def parse_fields(fields, sort):
+    if not fields:
+        return None
+    projection = {}
+    for field in fields.split(','):
+        field = field.strip()
+        if not field:
+            continue
+        if field.startswith('$'):
+            raise ValueError(f"Invalid field: {field}")
+        projection[field] = 1
+    # Sort keys are always needed to build the next cursor
+    for field, _ in sort:
+        projection[field] = 1
+    return projection
+
+# --- Request helpers ---
+def parse_page_args(sort):
+    limit = request.args.get('limit')
+    if limit is not None:
+        try:
+            limit = int(limit)
+        except ValueError:
+            raise ValueError("limit must be an integer")
+        if limit < 1:
+            raise ValueError("limit must be positive")
+        limit = min(limit, Config.PAGE_SIZE_MAX)
+    after = request.args.get('after')
+    after = decode_cursor(after, sort) if after else None
+    projection = parse_fields(request.args.get('fields'), sort)
+    return limit, after, projection
+
+def wants_ndjson():
+    if request.args.get('format') == 'ndjson':
+        return True
+    return request.accept_mimetypes.best == 'application/x-ndjson'
+
+def ndjson_response(cursor):
+    if hasattr(cursor, 'batch_size'):
+        cursor = cursor.batch_size(Config.STREAM_BATCH_SIZE)
+    def generate():
+        # Documents are encoded one by one as they come off the Mongo cursor
+        for doc in cursor:
+            yield dumps(doc) + '\n'
+    return Response(generate(), mimetype='application/x-ndjson')
+
+def page_response(cursor, limit, sort):
+    docs = []
+    next_cursor = None
+    for doc in cursor:
+        if len(docs) == limit:
+            # cursor was fetched with limit + 1, so one extra document means there is a next page
+            next_cursor = encode_cursor(docs[-1], sort)
+            break
+        docs.append(doc)
+    response = jsonify(docs)
+    if next_cursor:
+        response.headers['X-Next-Cursor'] = next_cursor
+    return response
+
+# --- Conditional GET ---
+# Serialized pages keyed by (collection, version, query string). A write bumps the version,
+# so stale pages are never served; they just age out of the LRU.
+response_cache = LRUCache(Config.RESPONSE_CACHE_SIZE)
+
+def _etag(collection, version):
+    key = f"{collection}:{version}:{request.query_string.decode()}"
+    return hashlib.sha1(key.encode()).hexdigest()
+
+def _conditional(response, etag):
+    response.set_etag(etag)
+    response.headers['Cache-Control'] = 'no-cache' # Clients must revalidate, which is a cheap 304
+    return response
+
+def list_response(fetch, sort, collection=None):
+    # fetch(after, projection, limit) returns a sorted Mongo cursor (limit 0 = no limit).
+    # With `collection`, paginated pages carry an ETag derived from the collection version;
+    # an unchanged poll is answered with 304 or from the cache without touching the cursor.
+    limit, after, projection = parse_page_args(sort)
+    if wants_ndjson():
+        return ndjson_response(fetch(after, projection, limit or 0))
+    limit = limit or Config.PAGE_SIZE_DEFAULT
+    if collection is None:
+        return page_response(fetch(after, projection, limit + 1), limit, sort)
+
+    version = versions.current(collection)
+    etag = _etag(collection, version)
+    if request.if_none_match.contains(etag):
+        return _conditional(Response(status=304), etag)
+    key = (collection, version, request.query_string)
+    cached = response_cache.get(key)
+    if cached is not None:
+        body, next_cursor = cached
+        response = Response(body, mimetype='application/json')
+        if next_cursor:
+            response.headers['X-Next-Cursor'] = next_cursor
+        return _conditional(response, etag)
+    response = page_response(fetch(after, projection, limit + 1), limit, sort)
+    response_cache.set(key, (response.get_data(), response.headers.get('X-Next-Cursor')))
+    return _conditional(response, etag)
@@ -0,0 +1,117 @@
+from datetime import datetime, timedelta
+from pymongo.errors import CollectionInvalid
+from config import Config
+
+# Storage layouts for market prices, chosen with MARKET_PRICE_STORAGE:
+#   'document'   - one standalone document per price in market_prices, dated by the
+#                  date_recorded ISO string (the original layout)
+#   'timeseries' - a MongoDB time-series collection (market_price_series) with recorded_at
+#                  as the time field and {produce_type, region} as the meta field, so Mongo
+#                  stores each series in compressed, time-ordered buckets
+# Either way callers read and write the same API shape (produce_type, region, date_recorded,
+# recorded_at, price, ...); this module translates to and from the stored form.
+SERIES_COLLECTION = 'market_price_series'
+META_FIELDS = ('produce_type', 'region')
+
+def timeseries_enabled():
+    return Config.MARKET_PRICE_STORAGE == 'timeseries'
+
+def price_collection(db):
+    return db[SERIES_COLLECTION] if timeseries_enabled() else db.market_prices
+
+def price_sort():
+    # Keyset order for listing prices: newest first, _id breaks ties
+    if timeseries_enabled():
+        return [("recorded_at", -1), ("_id", -1)]
+    return [("date_recorded", -1), ("_id", -1)]
+
+def _series_doc(doc):
+    series = {k: v for k, v in doc.items() if k not in META_FIELDS and k != 'date_recorded'}
+    series['meta'] = {f: doc.get(f) for f in META_FIELDS}
+    return series
+
+def to_stored(doc):
+    # API shape -> stored shape; returns a new dict so callers keep the API form
+    return _series_doc(doc) if timeseries_enabled() else doc
+
+def api_stages():
+    # Aggregation stages that turn stored documents back into the API shape
+    if not timeseries_enabled():
+        return []
+    return [
+        {"$addFields": {
+            "produce_type": "$meta.produce_type",
+            "region": "$meta.region",
+            "date_recorded": {"$dateToString": {"format": "%Y-%m-%d", "date": "$recorded_at"}}
+        }},
+        {"$project": {"meta": 0}}
+    ]
+
+def _parse_day(value, name):
+    try:
+        return datetime.strptime(value, '%Y-%m-%d')
+    except (TypeError, ValueError):
+        raise ValueError(f"{name} must be YYYY-MM-DD")
+
+def price_query(produce_type=None, region=None, date_from=None, date_to=None):
+    # Filter in stored field names; date bounds are whole days, inclusive
+    query = {}
+    prefix = 'meta.' if timeseries_enabled() else ''
+    if produce_type:
+        query[prefix + 'produce_type'] = produce_type
+    if region:
+        query[prefix + 'region'] = region
+    if date_from or date_to:
+        date_query = {}
+        if timeseries_enabled():
+            if date_from:
+                date_query['$gte'] = _parse_day(date_from, 'date_from')
+            if date_to:
+                date_query['$lt'] = _parse_day(date_to, 'date_to') + timedelta(days=1)
+            query['recorded_at'] = date_query
+        else:
+            if date_from:
+                date_query['$gte'] = date_from
+            if date_to:
+                date_query['$lte'] = date_to
+            query['date_recorded'] = date_query
+    return query
+
+def ensure_series_collection(db):
+    try:
+        db.create_collection(SERIES_COLLECTION, timeseries={
+            "timeField": "recorded_at", "metaField": "meta", "granularity": "hours"
+        })
+    except CollectionInvalid:
+        pass # Already exists
+    db[SERIES_COLLECTION].create_index([("meta.produce_type", 1), ("meta.region", 1), ("recorded_at", -1)])
+
+def migrate_to_timeseries(db, batch_size=5000):
+    # Copy market_prices into the time-series collection in _id order. Progress is checkpointed,
+    # so the copy can be interrupted and re-run, and re-running just before switching
+    # MARKET_PRICE_STORAGE picks up prices written since the last pass. Time-series collections
+    # do not enforce unique _ids: a run killed between an insert and its checkpoint leaves that
+    # batch to be copied again.
+    ensure_series_collection(db)
+    state = db.migration_state.find_one({"_id": SERIES_COLLECTION}) or {}
+    last_id = state.get('last_id')
+    copied = 0
+    while True:
+        query = {"_id": {"$gt": last_id}} if last_id else {}
+        batch = list(db.market_prices.find(query).sort("_id", 1).limit(batch_size))
+        if not batch:
+            break
+        docs = []
+        for doc in batch:
+            if not doc.get('recorded_at'):
+                try:
+                    doc['recorded_at'] = datetime.strptime(doc['date_recorded'], '%Y-%m-%d')
+                except (KeyError, TypeError, ValueError):
+                    continue # No usable timestamp; a time-series document requires one
+            docs.append(_series_doc(doc))
+        if docs:
+            db[SERIES_COLLECTION].insert_many(docs, ordered=False)
+        copied += len(docs)
+        last_id = batch[-1]['_id']
+        db.migration_state.update_one({"_id": SERIES_COLLECTION}, {"$set": {"last_id": last_id}}, upsert=True)
+    return copied
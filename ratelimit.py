@@ -0,0 +1,43 @@
+import threading
+import time
+
+def take_tokens(tokens, updated, now, rate, capacity, wanted=1):
+    # Pure token-bucket step, shared by TokenBucket and stores that keep bucket state elsewhere
+    # (admission.SQLiteAdmissionStore). Returns (acquired, seconds to wait, tokens left).
+    tokens = min(capacity, tokens + max(0.0, now - updated) * rate)
+    if tokens >= wanted:
+        return True, 0.0, tokens - wanted
+    if rate <= 0:
+        return False, float('inf'), tokens
+    return False, (wanted - tokens) / rate, tokens
+
+class TokenBucket:
+    # Classic token bucket: `rate` tokens per second, bursts of up to `capacity`.
+    def __init__(self, rate, capacity=None):
+        self.rate = float(rate)
+        self.capacity = float(capacity if capacity is not None else max(rate, 1))
+        self._tokens = self.capacity
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def try_acquire(self, tokens=1):
+        # Returns (acquired, seconds until enough tokens would be available)
+        with self._lock:
+            now = time.monotonic()
+            acquired, wait, self._tokens = take_tokens(self._tokens, self._updated, now,
+                                                       self.rate, self.capacity, tokens)
+            self._updated = now
+            return acquired, wait
+
+    def acquire(self, tokens=1, timeout=None):
+        tokens = min(tokens, self.capacity)
+        deadline = None if timeout is None else time.monotonic() + timeout
+        while True:
+            acquired, wait = self.try_acquire(tokens)
+            if acquired:
+                return True
+            if deadline is not None:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0 or wait > remaining:
+                    return False
+            time.sleep(min(wait, 1.0))
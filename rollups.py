@@ -0,0 +1,141 @@
+from datetime import datetime, timedelta
+from pymongo import UpdateOne
+from database import db
+from price_storage import price_collection, api_stages
+import versions
+
+# market_price_rollups holds one document per (produce_type, region, period, period_start)
+# with open/high/low/close/mean/count, kept current by add_market_price and bulk ingestion.
+PERIODS = ('day', 'week')
+
+def period_start(ts, period):
+    day = ts.date()
+    if period == 'week':
+        day -= timedelta(days=day.weekday()) # Weeks start on Monday
+    return datetime(day.year, day.month, day.day)
+
+def _price_time(doc):
+    return doc.get('recorded_at') or datetime.strptime(doc['date_recorded'], '%Y-%m-%d')
+
+def _price_value(doc):
+    try:
+        return float(doc['price'])
+    except (KeyError, TypeError, ValueError):
+        return None
+
+# --- Incremental maintenance ---
+def _partials(docs):
+    # Collapse a batch of prices into one partial OHLC per rollup key
+    partials = {}
+    for doc in docs:
+        price = _price_value(doc)
+        if price is None:
+            continue
+        ts = _price_time(doc)
+        for period in PERIODS:
+            key = (doc['produce_type'], doc['region'], period, period_start(ts, period))
+            p = partials.get(key)
+            if p is None:
+                partials[key] = {"open": price, "open_at": ts, "close": price, "close_at": ts,
+                                 "high": price, "low": price, "sum": price, "count": 1}
+                continue
+            if ts < p['open_at']:
+                p['open'], p['open_at'] = price, ts
+            if ts >= p['close_at']:
+                p['close'], p['close_at'] = price, ts
+            p['high'] = max(p['high'], price)
+            p['low'] = min(p['low'], price)
+            p['sum'] += price
+            p['count'] += 1
+    return partials
+
+def _merge_pipeline(p):
+    # Pipeline update so a single upsert can merge the partial into the stored rollup.
+    # Fields in the first $set stage are evaluated against the document before the update.
+    return [
+        {"$set": {
+            "open": {"$cond": [{"$or": [{"$eq": [{"$type": "$open_at"}, "missing"]},
+                                        {"$lt": [p['open_at'], "$open_at"]}]},
+                               {"$literal": p['open']}, "$open"]},
+            "open_at": {"$min": ["$open_at", p['open_at']]},
+            "close": {"$cond": [{"$or": [{"$eq": [{"$type": "$close_at"}, "missing"]},
+                                         {"$gte": [p['close_at'], "$close_at"]}]},
+                                {"$literal": p['close']}, "$close"]},
+            "close_at": {"$max": ["$close_at", p['close_at']]},
+            "high": {"$max": ["$high", {"$literal": p['high']}]},
+            "low": {"$min": ["$low", {"$literal": p['low']}]},
+            "sum": {"$add": [{"$ifNull": ["$sum", 0]}, {"$literal": p['sum']}]},
+            "count": {"$add": [{"$ifNull": ["$count", 0]}, p['count']]}
+        }},
+        {"$set": {"mean": {"$divide": ["$sum", "$count"]}, "updated_at": "$$NOW"}}
+    ]
+
+def apply_prices(docs):
+    ops = []
+    partials = _partials(docs)
+    for (produce_type, region, period, start), p in partials.items():
+        ops.append(UpdateOne(
+            {"produce_type": produce_type, "region": region, "period": period, "period_start": start},
+            _merge_pipeline(p),
+            upsert=True
+        ))
+    if ops:
+        db.market_price_rollups.bulk_write(ops, ordered=False)
+    return len(ops)
+
+# --- Full rebuild ---
+def rebuild_rollups():
+    db.market_price_rollups.delete_many({})
+    ts = {"$ifNull": ["$recorded_at", {"$dateFromString": {"dateString": "$date_recorded", "onError": None}}]}
+    for period in PERIODS:
+        trunc = {"date": "$_ts", "unit": period}
+        if period == 'week':
+            trunc['startOfWeek'] = 'monday'
+        pipeline = api_stages() + [
+            {"$addFields": {
+                "_ts": ts,
+                "_price": {"$convert": {"input": "$price", "to": "double", "onError": None, "onNull": None}}
+            }},
+            {"$match": {"_ts": {"$ne": None}, "_price": {"$ne": None}}},
+            {"$sort": {"_ts": 1}},
+            {"$group": {
+                "_id": {"produce_type": "$produce_type", "region": "$region",
+                        "period_start": {"$dateTrunc": trunc}},
+                "open": {"$first": "$_price"}, "open_at": {"$first": "$_ts"},
+                "close": {"$last": "$_price"}, "close_at": {"$last": "$_ts"},
+                "high": {"$max": "$_price"}, "low": {"$min": "$_price"},
+                "sum": {"$sum": "$_price"}, "count": {"$sum": 1}
+            }},
+            {"$project": {
+                "_id": 0, "produce_type": "$_id.produce_type", "region": "$_id.region",
+                "period": {"$literal": period}, "period_start": "$_id.period_start",
+                "open": 1, "open_at": 1, "close": 1, "close_at": 1, "high": 1, "low": 1,
+                "sum": 1, "count": 1, "mean": {"$divide": ["$sum", "$count"]}, "updated_at": "$$NOW"
+            }},
+            {"$merge": {"into": "market_price_rollups",
+                        "on": ["produce_type", "region", "period", "period_start"],
+                        "whenMatched": "replace", "whenNotMatched": "insert"}}
+        ]
+        price_collection(db).aggregate(pipeline, allowDiskUse=True)
+    versions.bump('market_prices') # Drops analytics cached from the old rollups in every worker
+    return db.market_price_rollups.count_documents({})
+
+# --- Queries ---
+SUMMARY_PROJECTION = {"_id": 0, "produce_type": 1, "region": 1, "period": 1, "period_start": 1,
+                      "open": 1, "high": 1, "low": 1, "close": 1, "mean": 1, "count": 1}
+
+def get_price_summary(produce_type=None, region=None, period='day', date_from=None, date_to=None):
+    query = {"period": period}
+    if produce_type:
+        query['produce_type'] = produce_type
+    if region:
+        query['region'] = region
+    if date_from or date_to:
+        start_query = {}
+        if date_from:
+            start_query['$gte'] = period_start(date_from, period)
+        if date_to:
+            start_query['$lte'] = date_to
+        query['period_start'] = start_query
+    return db.market_price_rollups.find(query, SUMMARY_PROJECTION).sort(
+        [("produce_type", 1), ("region", 1), ("period_start", 1)])
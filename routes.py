@@ -1,15 +1,30 @@
 from flask import Blueprint, request, jsonify, session, redirect, url_for
 from models import (
-    create_user, find_user_by_email, verify_password, find_user_by_id,
+    create_user, find_user_by_email, verify_password, get_cached_user, find_user_profile,
     create_produce_listing, get_all_produce_listings, get_produce_listing_by_id,
     update_produce_listing, delete_produce_listing,
     add_market_price, get_market_prices,
     create_buyer_request, get_all_buyer_requests, get_buyer_request_by_id,
-    update_buyer_request, delete_buyer_request
+    update_buyer_request, delete_buyer_request,
+    get_allocations, document_exists, LISTING_REQUIRED_FIELDS, REQUEST_REQUIRED_FIELDS,
+    PRODUCE_SORT, BUYER_REQUEST_SORT, MARKET_PRICE_SORT, ALLOCATION_SORT
 )
-from services.sms_service import send_sms
+from pagination import list_response
+from rollups import get_price_summary, PERIODS
+from analytics import price_analytics
+from ingest import iter_csv_rows, iter_ndjson_rows, ingest_market_prices
+from matching import match_listing, match_request, parse_match_args
+from sms_queue import get_sms_queue
+from nearby import find_nearby_listings
+from geo import to_lng_lat
+from subscriptions import open_recipients
+from sync import sync_changes, CursorExpired
+from catalog import lookup_produce_type, search_produce
+from batch import apply_batch
+from config import Config
 from bson.objectid import ObjectId
 from functools import wraps
+from datetime import datetime, timedelta
 
 # Create blueprints for modularity
 auth_bp = Blueprint('auth', __name__, url_prefix='/api/auth')
@@ -26,25 +41,48 @@ def login_required(f):
         return f(*args, **kwargs)
     return decorated_function
 
-def farmer_required(f):
-    @wraps(f)
-    def decorated_function(*args, **kwargs):
-        if 'user_id' not in session:
-            return jsonify({"message": "Unauthorized"}), 401
-        user = find_user_by_id(session['user_id'])
-        if not user or user.get('user_type') != 'farmer':
-            return jsonify({"message": "Forbidden: Farmer access required"}), 403
-        return f(*args, **kwargs)
-    return decorated_function
-
-def buyer_required(f):
+def session_role():
+    # login and register store user_type in the session; older sessions fall back to the user cache
+    role = session.get('user_type')
+    if role:
+        return role
+    user = get_cached_user(session['user_id'])
+    if not user:
+        return None
+    session['user_type'] = user.get('user_type')
+    return session['user_type']
+
+def role_required(role, message):
+    def decorator(f):
+        @wraps(f)
+        def decorated_function(*args, **kwargs):
+            if 'user_id' not in session:
+                return jsonify({"message": "Unauthorized"}), 401
+            if session_role() != role:
+                return jsonify({"message": message}), 403
+            return f(*args, **kwargs)
+        return decorated_function
+    return decorator
+
+def owner_write_miss(collection_name, doc_id, noun, verb):
+    # An owner-filtered write matched nothing; only now look up whether the document exists
+    if not document_exists(collection_name, doc_id):
+        return jsonify({"message": f"{noun} not found"}), 404
+    return jsonify({"message": f"Forbidden: You can only {verb} your own {noun.lower()}s"}), 403
+
+farmer_required = role_required('farmer', "Forbidden: Farmer access required")
+buyer_required = role_required('buyer', "Forbidden: Buyer access required")
+
+def produce_type_param(f):
+    # Passes the canonical produce_type from the query string (JSON body on writes) as a keyword
+    # argument, None when absent; 400 when it has no letters or digits
     @wraps(f)
     def decorated_function(*args, **kwargs):
-        if 'user_id' not in session:
-            return jsonify({"message": "Unauthorized"}), 401
-        user = find_user_by_id(session['user_id'])
-        if not user or user.get('user_type') != 'buyer':
-            return jsonify({"message": "Forbidden: Buyer access required"}), 403
+        source = request.args if request.method == 'GET' else (request.get_json(silent=True) or {})
+        try:
+            kwargs['produce_type'] = lookup_produce_type(source.get('produce_type'))
+        except ValueError as e:
+            return jsonify({"message": str(e)}), 400
         return f(*args, **kwargs)
     return decorated_function
 
@@ -93,11 +131,8 @@ def logout():
 @auth_bp.route('/me', methods=['GET'])
 @login_required
 def get_current_user():
-    user = find_user_by_id(session['user_id'])
+    user = find_user_profile(session['user_id']) # Read fresh: another worker may have updated it
     if user:
-        # Remove sensitive data like password hash before sending
-        user.pop('password', None)
-        user['_id'] = str(user['_id']) # Convert ObjectId to string
         return jsonify(user), 200
     return jsonify({"message": "User not found"}), 404
 
@@ -106,8 +141,7 @@ def get_current_user():
 @farmer_required
 def add_produce():
     data = request.json
-    required_fields = ['produce_type', 'quantity', 'unit', 'price_per_unit', 'available_from', 'available_until']
-    if not all(field in data for field in required_fields):
+    if not all(field in data for field in LISTING_REQUIRED_FIELDS):
         return jsonify({"message": "Missing required fields"}), 400
     
     data['farmer_id'] = session['user_id'] # Link listing to farmer
@@ -115,24 +149,111 @@ def add_produce():
     try:
         result = create_produce_listing(data)
         return jsonify({"message": "Produce listing added successfully", "listing_id": str(result.inserted_id)}), 201
+    except ValueError as e:
+        return jsonify({"message": str(e)}), 400
     except Exception as e:
         return jsonify({"message": f"Failed to add listing: {str(e)}"}), 500
 
 @produce_bp.route('/', methods=['GET'])
 @login_required # Anyone logged in can view all produce
 def get_produce():
-    listings = get_all_produce_listings()
-    for listing in listings:
-        listing['_id'] = str(listing['_id'])
-        # Optionally, fetch farmer details if needed
-    return jsonify(listings), 200
+    # Paginated with ?limit=&after=<cursor>&fields=, or streamed with ?format=ndjson
+    try:
+        return list_response(get_all_produce_listings, PRODUCE_SORT, 'produce_listings')
+    except ValueError as e:
+        return jsonify({"message": str(e)}), 400
+
+def sync_response(collection_name):
+    # ?cursor=<token from the previous sync>&limit=; no cursor starts a full sync
+    try:
+        limit = int(request.args['limit']) if 'limit' in request.args else None
+    except ValueError:
+        return jsonify({"message": "limit must be an integer"}), 400
+    if limit is not None and limit < 1:
+        return jsonify({"message": "limit must be positive"}), 400
+    try:
+        return jsonify(sync_changes(collection_name, request.args.get('cursor'), limit)), 200
+    except CursorExpired as e:
+        return jsonify({"message": str(e)}), 410
+    except ValueError as e:
+        return jsonify({"message": str(e)}), 400
+
+@produce_bp.route('/sync', methods=['GET'])
+@login_required
+def sync_produce():
+    return sync_response('produce_listings')
+
+@produce_bp.route('/search', methods=['GET'])
+@login_required
+def search_produce_types():
+    # Prefix and typo-tolerant lookup over the produce catalog, e.g. ?q=mahin
+    query = request.args.get('q', '')
+    try:
+        limit = min(int(request.args.get('limit', 10)), Config.CATALOG_SEARCH_MAX)
+    except ValueError:
+        return jsonify({"message": "limit must be an integer"}), 400
+    if not query.strip() or limit < 1:
+        return jsonify({"message": "q is required and limit must be positive"}), 400
+    return jsonify({"results": search_produce(query, limit)}), 200
+
+@produce_bp.route('/nearby', methods=['GET'])
+@login_required
+@produce_type_param
+def get_nearby_produce(produce_type):
+    # ?lng=&lat=&radius_km=[&produce_type=&max_price=&available_from=&available_until=&limit=&offset=]
+    try:
+        lng = float(request.args['lng'])
+        lat = float(request.args['lat'])
+        radius_km = float(request.args.get('radius_km', Config.NEARBY_DEFAULT_RADIUS_KM))
+        max_price = request.args.get('max_price')
+        max_price = float(max_price) if max_price is not None else None
+        limit = int(request.args.get('limit', Config.NEARBY_PAGE_SIZE))
+        offset = int(request.args.get('offset', 0))
+    except KeyError:
+        return jsonify({"message": "lng and lat are required"}), 400
+    except ValueError:
+        return jsonify({"message": "lng, lat, radius_km, max_price, limit and offset must be numbers"}), 400
+
+    point = to_lng_lat([lng, lat])
+    if not point or radius_km <= 0:
+        return jsonify({"message": "Invalid coordinates or radius"}), 400
+    if limit < 1 or offset < 0:
+        return jsonify({"message": "limit must be positive and offset non-negative"}), 400
+    radius_km = min(radius_km, Config.NEARBY_MAX_RADIUS_KM)
+    limit = min(limit, Config.NEARBY_MAX_PAGE_SIZE)
+
+    listings = find_nearby_listings(
+        point, radius_km,
+        produce_type=produce_type,
+        max_price=max_price,
+        available_from=request.args.get('available_from'),
+        available_until=request.args.get('available_until'),
+        limit=limit + 1, offset=offset
+    )
+    return jsonify({"results": listings[:limit], "limit": limit, "offset": offset,
+                    "has_more": len(listings) > limit}), 200
+
+def batch_response(collection_name, owner_id):
+    # {"operations": [...]}; per-item statuses are in the body, so the batch itself is 200
+    data = request.json or {}
+    try:
+        report = apply_batch(collection_name, owner_id, data.get('operations'))
+    except ValueError as e:
+        return jsonify({"message": str(e)}), 400
+    except Exception as e:
+        return jsonify({"message": f"Batch failed: {str(e)}"}), 500
+    return jsonify(report), 200
+
+@produce_bp.route('/batch', methods=['POST'])
+@farmer_required
+def batch_produce():
+    return batch_response('produce_listings', session['user_id'])
 
 @produce_bp.route('/<id>', methods=['GET'])
 @login_required
 def get_single_produce(id):
     listing = get_produce_listing_by_id(id)
     if listing:
-        listing['_id'] = str(listing['_id'])
         return jsonify(listing), 200
     return jsonify({"message": "Listing not found"}), 404
 
@@ -140,35 +261,27 @@ def get_single_produce(id):
 @farmer_required
 def update_produce(id):
     data = request.json
-    listing = get_produce_listing_by_id(id)
-    if not listing:
-        return jsonify({"message": "Listing not found"}), 404
-    
-    # Ensure farmer can only update their own listings
-    if listing['farmer_id'] != session['user_id']:
-        return jsonify({"message": "Forbidden: You can only update your own listings"}), 403
-
+    # Ensure farmer can only update their own listings: the owner is part of the write filter
     try:
-        update_produce_listing(id, data)
-        return jsonify({"message": "Listing updated successfully"}), 200
+        listing = update_produce_listing(id, data, farmer_id=session['user_id'])
+    except ValueError as e:
+        return jsonify({"message": str(e)}), 400
     except Exception as e:
         return jsonify({"message": f"Failed to update listing: {str(e)}"}), 500
+    if not listing:
+        return owner_write_miss('produce_listings', id, "Listing", "update")
+    return jsonify({"message": "Listing updated successfully", "listing": listing}), 200
 
 @produce_bp.route('/<id>', methods=['DELETE'])
 @farmer_required
 def delete_produce(id):
-    listing = get_produce_listing_by_id(id)
-    if not listing:
-        return jsonify({"message": "Listing not found"}), 404
-    
-    if listing['farmer_id'] != session['user_id']:
-        return jsonify({"message": "Forbidden: You can only delete your own listings"}), 403
-
     try:
-        delete_produce_listing(id)
-        return jsonify({"message": "Listing deleted successfully"}), 200
+        listing = delete_produce_listing(id, farmer_id=session['user_id'])
     except Exception as e:
         return jsonify({"message": f"Failed to delete listing: {str(e)}"}), 500
+    if not listing:
+        return owner_write_miss('produce_listings', id, "Listing", "delete")
+    return jsonify({"message": "Listing deleted successfully"}), 200
 
 # --- Market Price Routes (Admin/Data Entry - simplified for now) ---
 @market_bp.route('/', methods=['POST'])
@@ -186,29 +299,102 @@ def add_price():
     try:
         result = add_market_price(data)
         return jsonify({"message": "Market price added successfully", "price_id": str(result.inserted_id)}), 201
+    except ValueError as e:
+        return jsonify({"message": str(e)}), 400
     except Exception as e:
         return jsonify({"message": f"Failed to add price: {str(e)}"}), 500
 
+@market_bp.route('/bulk', methods=['POST'])
+@login_required
+def bulk_add_prices():
+    # Body is read as a stream: text/csv with a header row, or one JSON object per line
+    fmt = request.args.get('format')
+    if not fmt:
+        if request.mimetype == 'text/csv':
+            fmt = 'csv'
+        elif request.mimetype in ('application/x-ndjson', 'application/ndjson'):
+            fmt = 'ndjson'
+    if fmt not in ('csv', 'ndjson'):
+        return jsonify({"message": "Upload a text/csv or application/x-ndjson body"}), 415
+
+    try:
+        rows = iter_csv_rows(request.stream) if fmt == 'csv' else iter_ndjson_rows(request.stream)
+        report = ingest_market_prices(rows)
+    except ValueError as e:
+        return jsonify({"message": str(e)}), 400
+    except Exception as e:
+        return jsonify({"message": f"Bulk ingestion failed: {str(e)}"}), 500
+
+    report['message'] = "Bulk ingestion completed"
+    return jsonify(report), 200
+
+@market_bp.route('/summary', methods=['GET'])
+@login_required
+@produce_type_param
+def get_price_summary_route(produce_type):
+    # Reads only the precomputed rollups, e.g. ?produce_type=maize&region=Nakuru&days=90
+    region = request.args.get('region')
+    period = request.args.get('period', 'day')
+    if period not in PERIODS:
+        return jsonify({"message": f"period must be one of: {', '.join(PERIODS)}"}), 400
+
+    try:
+        if request.args.get('date_from') or request.args.get('date_to'):
+            date_from = request.args.get('date_from')
+            date_to = request.args.get('date_to')
+            date_from = datetime.strptime(date_from, '%Y-%m-%d') if date_from else None
+            date_to = datetime.strptime(date_to, '%Y-%m-%d') if date_to else None
+        else:
+            days = min(int(request.args.get('days', Config.SUMMARY_DEFAULT_DAYS)), Config.SUMMARY_MAX_DAYS)
+            date_from, date_to = datetime.utcnow() - timedelta(days=days), None
+    except ValueError:
+        return jsonify({"message": "days must be an integer and dates YYYY-MM-DD"}), 400
+
+    summary = []
+    for row in get_price_summary(produce_type, region, period, date_from, date_to):
+        row['period_start'] = row['period_start'].date().isoformat()
+        summary.append(row)
+    return jsonify({"period": period, "summary": summary}), 200
+
+@market_bp.route('/analytics', methods=['GET'])
+@login_required
+@produce_type_param
+def get_price_analytics(produce_type):
+    # Moving average, volatility, % change over ?window= days and cross-region spreads
+    region = request.args.get('region')
+    if not produce_type or not region:
+        return jsonify({"message": "produce_type and region are required"}), 400
+    try:
+        window = int(request.args.get('window', 7))
+        points = int(request.args.get('points', 90))
+    except ValueError:
+        return jsonify({"message": "window and points must be integers"}), 400
+    if not 1 <= window <= Config.ANALYTICS_MAX_WINDOW or points < 1:
+        return jsonify({"message": f"window must be between 1 and {Config.ANALYTICS_MAX_WINDOW}"}), 400
+
+    return jsonify(price_analytics(produce_type, region, window, points)), 200
+
 @market_bp.route('/', methods=['GET'])
 @login_required
-def get_prices():
-    produce_type = request.args.get('produce_type')
+@produce_type_param
+def get_prices(produce_type):
     region = request.args.get('region')
     date_from = request.args.get('date_from')
     date_to = request.args.get('date_to')
     
-    prices = get_market_prices(produce_type, region, date_from, date_to)
-    for price in prices:
-        price['_id'] = str(price['_id'])
-    return jsonify(prices), 200
+    def fetch(after, projection, limit):
+        return get_market_prices(produce_type, region, date_from, date_to, after, projection, limit)
+    try:
+        return list_response(fetch, MARKET_PRICE_SORT, 'market_prices')
+    except ValueError as e:
+        return jsonify({"message": str(e)}), 400
 
 # --- Buyer Request Routes ---
 @buyer_bp.route('/', methods=['POST'])
 @buyer_required
 def add_buyer_request():
     data = request.json
-    required_fields = ['produce_type', 'quantity_needed', 'unit', 'delivery_location']
-    if not all(field in data for field in required_fields):
+    if not all(field in data for field in REQUEST_REQUIRED_FIELDS):
         return jsonify({"message": "Missing required fields"}), 400
     
     data['buyer_id'] = session['user_id'] # Link request to buyer
@@ -216,23 +402,34 @@ def add_buyer_request():
     try:
         result = create_buyer_request(data)
         return jsonify({"message": "Buyer request added successfully", "request_id": str(result.inserted_id)}), 201
+    except ValueError as e:
+        return jsonify({"message": str(e)}), 400
     except Exception as e:
         return jsonify({"message": f"Failed to add request: {str(e)}"}), 500
 
 @buyer_bp.route('/', methods=['GET'])
 @login_required # Anyone logged in can view requests
 def get_requests():
-    requests = get_all_buyer_requests()
-    for req in requests:
-        req['_id'] = str(req['_id'])
-    return jsonify(requests), 200
+    try:
+        return list_response(get_all_buyer_requests, BUYER_REQUEST_SORT, 'buyer_requests')
+    except ValueError as e:
+        return jsonify({"message": str(e)}), 400
+
+@buyer_bp.route('/sync', methods=['GET'])
+@login_required
+def sync_requests():
+    return sync_response('buyer_requests')
+
+@buyer_bp.route('/batch', methods=['POST'])
+@buyer_required
+def batch_requests():
+    return batch_response('buyer_requests', session['user_id'])
 
 @buyer_bp.route('/<id>', methods=['GET'])
 @login_required
 def get_single_request(id):
     req = get_buyer_request_by_id(id)
     if req:
-        req['_id'] = str(req['_id'])
         return jsonify(req), 200
     return jsonify({"message": "Request not found"}), 404
 
@@ -240,37 +437,28 @@ def get_single_request(id):
 @buyer_required
 def update_request(id):
     data = request.json
-    req = get_buyer_request_by_id(id)
-    if not req:
-        return jsonify({"message": "Request not found"}), 404
-    
-    if req['buyer_id'] != session['user_id']:
-        return jsonify({"message": "Forbidden: You can only update your own requests"}), 403
-
     try:
-        update_buyer_request(id, data)
-        return jsonify({"message": "Request updated successfully"}), 200
+        req = update_buyer_request(id, data, buyer_id=session['user_id'])
+    except ValueError as e:
+        return jsonify({"message": str(e)}), 400
     except Exception as e:
         return jsonify({"message": f"Failed to update request: {str(e)}"}), 500
+    if not req:
+        return owner_write_miss('buyer_requests', id, "Request", "update")
+    return jsonify({"message": "Request updated successfully", "request": req}), 200
 
 @buyer_bp.route('/<id>', methods=['DELETE'])
 @buyer_required
 def delete_request(id):
-    req = get_buyer_request_by_id(id)
-    if not req:
-        return jsonify({"message": "Request not found"}), 404
-    
-    if req['buyer_id'] != session['user_id']:
-        return jsonify({"message": "Forbidden: You can only delete your own requests"}), 403
-
     try:
-        delete_buyer_request(id)
-        return jsonify({"message": "Request deleted successfully"}), 200
+        req = delete_buyer_request(id, buyer_id=session['user_id'])
     except Exception as e:
         return jsonify({"message": f"Failed to delete request: {str(e)}"}), 500
+    if not req:
+        return owner_write_miss('buyer_requests', id, "Request", "delete")
+    return jsonify({"message": "Request deleted successfully"}), 200
 
-# --- Matching and Alert Logic (Conceptual - requires more sophisticated algorithm) ---
-# This would typically be a background task or a more complex endpoint
+# --- Matching and Alert Logic ---
 @produce_bp.route('/<listing_id>/match', methods=['GET'])
 @farmer_required
 def find_matches_for_listing(listing_id):
@@ -281,32 +469,59 @@ def find_matches_for_listing(listing_id):
     if listing['farmer_id'] != session['user_id']:
         return jsonify({"message": "Forbidden"}), 403
 
-    # Basic matching logic: Find buyer requests for the same produce type
-    potential_matches = []
-    buyer_requests = get_all_buyer_requests()
-    for req in buyer_requests:
-        if req['produce_type'] == listing['produce_type'] and req['is_active']:
-            # More complex logic here: proximity, quantity match, price range
-            # For now, just matching by type
-            potential_matches.append({
-                "request_id": str(req['_id']),
-                "buyer_id": req['buyer_id'],
-                "quantity_needed": req['quantity_needed'],
-                "delivery_location": req['delivery_location'],
-                "target_price": req.get('target_price_per_unit')
-            })
-    
-    # In a real scenario, you'd trigger SMS alerts here or via a background job
-    # For demonstration, let's say a buyer expresses interest
-    # For now, just return potential matches
-    return jsonify({"message": "Potential matches found", "matches": potential_matches}), 200
+    try:
+        limit, offset, max_distance_km = parse_match_args(request.args)
+    except ValueError as e:
+        return jsonify({"message": str(e)}), 400
+
+    # Only active requests for the same produce type are scored (indexed on produce_type + is_active)
+    matches, total = match_listing(listing, limit, offset, max_distance_km)
+    return jsonify({"message": "Potential matches found", "matches": matches,
+                    "total": total, "limit": limit, "offset": offset}), 200
+
+@buyer_bp.route('/<request_id>/match', methods=['GET'])
+@buyer_required
+def find_matches_for_request(request_id):
+    req = get_buyer_request_by_id(request_id)
+    if not req:
+        return jsonify({"message": "Request not found"}), 404
+
+    if req['buyer_id'] != session['user_id']:
+        return jsonify({"message": "Forbidden"}), 403
 
+    try:
+        limit, offset, max_distance_km = parse_match_args(request.args)
+    except ValueError as e:
+        return jsonify({"message": str(e)}), 400
+
+    matches, total = match_request(req, limit, offset, max_distance_km)
+    return jsonify({"message": "Potential matches found", "matches": matches,
+                    "total": total, "limit": limit, "offset": offset}), 200
+
+@market_bp.route('/allocations', methods=['GET'])
+@login_required
+@produce_type_param
+def get_allocations_route(produce_type):
+    # Latest batch allocation; ?mine=true limits it to the caller's listings or requests
+    farmer_id = buyer_id = None
+    if request.args.get('mine') == 'true':
+        if session_role() == 'farmer':
+            farmer_id = session['user_id']
+        else:
+            buyer_id = session['user_id']
+
+    def fetch(after, projection, limit):
+        return get_allocations(produce_type, farmer_id, buyer_id, after, projection, limit)
+    try:
+        return list_response(fetch, ALLOCATION_SORT)
+    except ValueError as e:
+        return jsonify({"message": str(e)}), 400
 
 @market_bp.route('/send_price_alert', methods=['POST'])
 @login_required # Restricted to admin or a background task
-def send_price_alert_to_farmers():
+@produce_type_param
+def send_price_alert_to_farmers(produce_type):
     data = request.json
-    produce_type = data.get('produce_type')
     region = data.get('region')
     price = data.get('price')
     unit = data.get('unit')
@@ -314,19 +529,20 @@ def send_price_alert_to_farmers():
     if not all([produce_type, region, price, unit]):
         return jsonify({"message": "Missing required fields for alert"}), 400
 
-    # Find farmers who list this produce or are in this region
-    # This is highly simplified; a real system would have more complex filtering
-    farmers_to_alert = find_user_by_email('farmer@example.com') # Placeholder: find all farmers, or farmers interested in this produce
-    
-    # In a real app, you'd iterate through relevant farmers
-    # For now, let's simulate sending to a single user (e.g., the current user if they are a farmer)
-    user_to_alert = find_user_by_id(session['user_id'])
-    if user_to_alert and user_to_alert.get('user_type') == 'farmer':
-        message = f"Agritech Alert: Latest market price for {produce_type} in {region} is {price} {unit}."
-        if send_sms(user_to_alert['contact_number'], message):
-            return jsonify({"message": f"Price alert sent to {user_to_alert['email']}"}), 200
-        else:
-            return jsonify({"message": "Failed to send SMS alert"}), 500
-    
-    return jsonify({"message": "No relevant farmers found to send alert or not a farmer"}), 404
+    # Farmers with an active listing of this produce in this region, from the subscription index
+    recipients = open_recipients(produce_type, region)
+    if recipients is None:
+        return jsonify({"message": "No relevant farmers found to send alert"}), 404
+
+    message = f"Agritech Alert: Latest market price for {produce_type} in {region} is {price} {unit}."
+    # Recipients are streamed into the SMS queue; the client polls the job for delivery status
+    job_id = get_sms_queue().enqueue(recipients, message, dedupe_key=message)
+    return jsonify({"message": "Price alert queued", "job_id": job_id}), 202
 
+@market_bp.route('/alerts/<job_id>', methods=['GET'])
+@login_required
+def get_alert_job(job_id):
+    job = get_sms_queue().job_status(job_id)
+    if not job:
+        return jsonify({"message": "Alert job not found"}), 404
+    return jsonify(job), 200
@@ -0,0 +1,89 @@
+import secrets
+from datetime import datetime
+from flask.sessions import SessionInterface, SessionMixin
+from itsdangerous import BadSignature, Signer
+from werkzeug.datastructures import CallbackDict
+from database import db
+
+# Session backends, selected with Config.SESSION_TYPE:
+#   'filesystem' - Flask-Session files under SESSION_FILE_DIR (single node only)
+#   'mongodb'    - MongoSessionInterface below: shared across nodes, written only when changed
+#   'signed'     - Flask's signed cookie: stateless, no storage round trip at all
+
+class MongoSession(CallbackDict, SessionMixin):
+    def __init__(self, initial=None, sid=None, new=False, expires_at=None):
+        def on_update(self):
+            self.modified = True
+        super().__init__(initial, on_update)
+        self.sid = sid
+        self.new = new
+        self.expires_at = expires_at
+        self.modified = False
+
+class MongoSessionInterface(SessionInterface):
+    # One document per session in `sessions`; a TTL index on expires_at removes stale ones.
+    # Requests that do not change the session cost one indexed read and no write, except
+    # that a session past half its lifetime is extended so active users stay logged in.
+    collection_name = 'sessions'
+
+    def _signer(self, app):
+        return Signer(app.secret_key, salt='mongo-session')
+
+    def _lifetime(self, app):
+        return app.permanent_session_lifetime
+
+    def open_session(self, app, request):
+        cookie = request.cookies.get(self.get_cookie_name(app))
+        if cookie:
+            try:
+                sid = self._signer(app).unsign(cookie).decode() if app.config.get('SESSION_USE_SIGNER') else cookie
+            except BadSignature:
+                sid = None
+            if sid:
+                doc = db[self.collection_name].find_one({"_id": sid, "expires_at": {"$gt": datetime.utcnow()}})
+                if doc:
+                    return MongoSession(doc.get('data'), sid=sid, expires_at=doc['expires_at'])
+        return MongoSession(sid=secrets.token_urlsafe(32), new=True)
+
+    def save_session(self, app, session, response):
+        name = self.get_cookie_name(app)
+        domain = self.get_cookie_domain(app)
+        path = self.get_cookie_path(app)
+        if not session:
+            if session.modified:
+                if not session.new:
+                    db[self.collection_name].delete_one({"_id": session.sid})
+                response.delete_cookie(name, domain=domain, path=path)
+            return
+
+        now = datetime.utcnow()
+        lifetime = self._lifetime(app)
+        refresh = session.expires_at is not None and session.expires_at - now < lifetime / 2
+        if not (session.modified or session.new or refresh):
+            return
+
+        expires_at = now + lifetime
+        db[self.collection_name].update_one(
+            {"_id": session.sid},
+            {"$set": {"data": dict(session), "expires_at": expires_at}},
+            upsert=True
+        )
+        cookie = self._signer(app).sign(session.sid).decode() if app.config.get('SESSION_USE_SIGNER') else session.sid
+        response.set_cookie(
+            name, cookie,
+            expires=self.get_expiration_time(app, session),
+            httponly=self.get_cookie_httponly(app),
+            domain=domain, path=path,
+            secure=self.get_cookie_secure(app),
+            samesite=self.get_cookie_samesite(app)
+        )
+
+def init_sessions(app):
+    session_type = app.config.get('SESSION_TYPE')
+    if session_type == 'mongodb':
+        app.session_interface = MongoSessionInterface()
+    elif session_type == 'signed':
+        pass # Flask's default SecureCookieSessionInterface
+    else:
+        from flask_session import Session # For session management
+        Session(app)
@@ -0,0 +1,233 @@
+import heapq
+import itertools
+import logging
+import os
+import queue
+import random
+import threading
+import time
+import uuid
+from collections import deque
+from cache import LRUCache
+from config import Config
+from ratelimit import TokenBucket
+from services import send_sms
+
+logger = logging.getLogger(__name__)
+
+# --- Providers ---
+# A provider sends a batch of (to_number, message) pairs and returns one bool per message.
+class ConsoleSMSProvider:
+    name = 'console'
+
+    def send_batch(self, messages):
+        return [bool(send_sms(to_number, body)) for to_number, body in messages]
+
+class LocalSMSProvider:
+    # Offline stand-in for load tests: simulated latency and failures, no network.
+    name = 'local'
+
+    def __init__(self, latency=0.0, failure_rate=0.0, keep=1000):
+        self.latency = latency
+        self.failure_rate = failure_rate
+        self.sent = deque(maxlen=keep) # Most recent deliveries, for inspection
+        self.delivered = 0
+        self._lock = threading.Lock()
+
+    def send_batch(self, messages):
+        if self.latency:
+            time.sleep(self.latency)
+        results = [random.random() >= self.failure_rate for _ in messages]
+        with self._lock:
+            for message, ok in zip(messages, results):
+                if ok:
+                    self.sent.append(message)
+                    self.delivered += 1
+        return results
+
+PROVIDERS = {
+    'console': ConsoleSMSProvider,
+    'local': LocalSMSProvider,
+}
+
+# --- Queue ---
+class SMSQueue:
+    def __init__(self, provider, workers=4, batch_size=50, rate=20, max_retries=3,
+                 backoff=1.0, dedupe_ttl=3600, max_jobs=10000):
+        self.provider = provider
+        self.workers = workers
+        self.batch_size = batch_size
+        self.max_retries = max_retries
+        self.backoff = backoff
+        self.bucket = TokenBucket(rate, max(rate, batch_size))
+        self.jobs = LRUCache(max_jobs)
+        self._dedupe_ttl = dedupe_ttl
+        self._recent_jobs = LRUCache(max_jobs, dedupe_ttl) # dedupe_key -> job id
+        self._recent_messages = LRUCache(Config.SMS_DEDUPE_MAX_MESSAGES, dedupe_ttl) # (to, body) already sent
+        self._queue = queue.Queue()
+        self._retries = [] # Heap of (not_before, seq, item)
+        self._retry_cond = threading.Condition()
+        self._seq = itertools.count()
+        self._lock = threading.Lock()
+        self._pid = None
+        self.counters = {"sent": 0, "failed": 0, "retried": 0, "deduplicated": 0, "batches": 0}
+
+    def _start(self):
+        # Threads are started lazily and again after a fork, where they do not survive
+        with self._lock:
+            if self._pid == os.getpid():
+                return
+            self._pid = os.getpid()
+            for _ in range(self.workers):
+                threading.Thread(target=self._work, daemon=True).start()
+            threading.Thread(target=self._schedule_retries, daemon=True).start()
+
+    def enqueue(self, recipients, message, dedupe_key=None):
+        # recipients may be any iterable (e.g. a Mongo cursor); it is consumed by a worker.
+        # A dedupe_key only joins a job that is still in flight: once it has finished, a repeat
+        # is a new job, and numbers that already got the message are skipped via _recent_messages.
+        self._start()
+        job = {"id": uuid.uuid4().hex, "state": "queued", "total": 0, "sent": 0, "failed": 0,
+               "deduplicated": 0, "expanded": False, "created_at": time.time()}
+        with self._lock:
+            if dedupe_key is not None:
+                existing = self.jobs.get(self._recent_jobs.get(dedupe_key))
+                if existing is not None and existing['state'] in ('queued', 'running'):
+                    return existing['id']
+                self._recent_jobs.set(dedupe_key, job['id'])
+            self.jobs.set(job['id'], job)
+        self._queue.put(('expand', job, iter(recipients), message))
+        return job['id']
+
+    def job_status(self, job_id):
+        job = self.jobs.get(job_id)
+        if job is None:
+            return None
+        with self._lock:
+            return {k: v for k, v in job.items() if k != 'expanded'}
+
+    def stats(self):
+        with self._lock:
+            stats = dict(self.counters)
+        stats['queued'] = self._queue.qsize()
+        stats['retry_pending'] = len(self._retries)
+        return stats
+
+    def _finish_if_done(self, job):
+        # Caller holds self._lock
+        if job['expanded'] and job['state'] != 'failed' and job['sent'] + job['failed'] + job['deduplicated'] >= job['total']:
+            job['state'] = 'completed'
+
+    def _expand(self, job, recipients, message):
+        seen = set()
+        try:
+            for to_number in recipients:
+                if not to_number or to_number in seen:
+                    continue
+                seen.add(to_number)
+                with self._lock:
+                    job['total'] += 1
+                    job['state'] = 'running'
+                if self._recent_messages.get((to_number, message)) is not None:
+                    with self._lock:
+                        job['deduplicated'] += 1
+                        self.counters['deduplicated'] += 1
+                    continue
+                self._queue.put(('send', job, to_number, message, 0))
+        except Exception as e:
+            # e.g. the recipients cursor failed mid-way; sends already queued still go out
+            logger.exception("SMS job %s failed while reading recipients", job['id'])
+            with self._lock:
+                job['state'] = 'failed'
+                job['error'] = str(e)
+        with self._lock:
+            job['expanded'] = True
+            self._finish_if_done(job)
+
+    def _next_batch(self):
+        batch = []
+        item = self._queue.get()
+        while True:
+            if item[0] == 'expand':
+                self._expand(*item[1:])
+            else:
+                batch.append(item)
+            if len(batch) >= self.batch_size:
+                break
+            try:
+                item = self._queue.get_nowait()
+            except queue.Empty:
+                break
+        return batch
+
+    def _work(self):
+        while True:
+            try:
+                self._process(self._next_batch())
+            except Exception:
+                # Never let one bad batch kill the worker: _start() only replaces threads after a fork
+                logger.exception("SMS worker error")
+
+    def _process(self, batch):
+        if not batch:
+            return
+        self.bucket.acquire(len(batch))
+        try:
+            results = self.provider.send_batch([(to_number, body) for _, _, to_number, body, _ in batch])
+        except Exception as e:
+            logger.warning("SMS provider %s failed a batch of %d: %s", self.provider.name, len(batch), e)
+            results = [False] * len(batch)
+        with self._lock:
+            self.counters['batches'] += 1
+        for (_, job, to_number, body, attempt), ok in zip(batch, results):
+            if ok:
+                self._recent_messages.set((to_number, body), True)
+                with self._lock:
+                    job['sent'] += 1
+                    self.counters['sent'] += 1
+                    self._finish_if_done(job)
+            elif attempt < self.max_retries:
+                delay = self.backoff * (2 ** attempt) * (0.5 + random.random())
+                with self._retry_cond:
+                    heapq.heappush(self._retries, (time.monotonic() + delay, next(self._seq),
+                                                   ('send', job, to_number, body, attempt + 1)))
+                    self._retry_cond.notify()
+                with self._lock:
+                    self.counters['retried'] += 1
+            else:
+                logger.warning("SMS to %s failed after %d attempts (job %s)", to_number, attempt + 1, job['id'])
+                with self._lock:
+                    job['failed'] += 1
+                    self.counters['failed'] += 1
+                    self._finish_if_done(job)
+
+    def _schedule_retries(self):
+        while True:
+            with self._retry_cond:
+                while not self._retries:
+                    self._retry_cond.wait()
+                not_before, _, item = self._retries[0]
+                wait = not_before - time.monotonic()
+                if wait > 0:
+                    self._retry_cond.wait(wait)
+                    continue
+                heapq.heappop(self._retries)
+            self._queue.put(item)
+
+_sms_queue = None
+_sms_queue_lock = threading.Lock()
+
+def get_sms_queue():
+    global _sms_queue
+    with _sms_queue_lock:
+        if _sms_queue is None:
+            _sms_queue = SMSQueue(
+                PROVIDERS[Config.SMS_PROVIDER](),
+                workers=Config.SMS_WORKERS,
+                batch_size=Config.SMS_BATCH_SIZE,
+                rate=Config.SMS_RATE_PER_SECOND,
+                max_retries=Config.SMS_MAX_RETRIES,
+                backoff=Config.SMS_RETRY_BACKOFF,
+                dedupe_ttl=Config.SMS_DEDUPE_TTL
+            )
+        return _sms_queue
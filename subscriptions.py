@@ -0,0 +1,93 @@
+import itertools
+from datetime import datetime
+from pymongo import ReplaceOne, DeleteOne
+from bson.objectid import ObjectId
+from database import db
+
+# alert_subscriptions: one document per active listing, keyed by the listing id, holding the
+# (produce_type, region) it subscribes its farmer to and the farmer's contact number.
+# Price alerts resolve their recipients with one indexed lookup on (produce_type, region).
+
+def listing_region(listing, farmer):
+    region = listing.get('region') or farmer.get('region')
+    if not region and isinstance(farmer.get('location'), str):
+        region = farmer['location'] # Users register with a free text location
+    return region
+
+def _subscription_op(listing, farmer):
+    region = listing_region(listing, farmer) if farmer else None
+    if not listing.get('is_active') or not region or not farmer.get('contact_number'):
+        return DeleteOne({"_id": listing['_id']})
+    return ReplaceOne({"_id": listing['_id']}, {
+        "farmer_id": listing['farmer_id'],
+        "produce_type": listing['produce_type'],
+        "region": region,
+        "contact_number": farmer['contact_number'],
+        "updated_at": datetime.utcnow()
+    }, upsert=True)
+
+def sync_listing(listing, farmer):
+    db.alert_subscriptions.bulk_write([_subscription_op(listing, farmer)])
+
+def sync_listings(listings, farmer):
+    ops = [_subscription_op(listing, farmer) for listing in listings]
+    if ops:
+        db.alert_subscriptions.bulk_write(ops, ordered=False)
+
+def remove_listing(listing_id):
+    db.alert_subscriptions.delete_one({"_id": listing_id})
+
+def remove_listings(listing_ids):
+    db.alert_subscriptions.delete_many({"_id": {"$in": list(listing_ids)}})
+
+def resync_farmer(farmer):
+    # Contact number or location changed: rewrite every subscription of this farmer
+    farmer_id = str(farmer['_id'])
+    ops = [_subscription_op(listing, farmer)
+           for listing in db.produce_listings.find({"farmer_id": farmer_id, "is_active": True})]
+    db.alert_subscriptions.delete_many({"farmer_id": farmer_id})
+    if ops:
+        db.alert_subscriptions.bulk_write(ops, ordered=False)
+
+def remove_farmer(farmer_id):
+    db.alert_subscriptions.delete_many({"farmer_id": str(farmer_id)})
+
+def iter_recipients(produce_type, region):
+    # Streams contact numbers straight from the index; the SMS queue drops repeats
+    cursor = db.alert_subscriptions.find(
+        {"produce_type": produce_type, "region": region}, {"_id": 0, "contact_number": 1}
+    ).batch_size(1000)
+    for sub in cursor:
+        yield sub.get('contact_number')
+
+def open_recipients(produce_type, region):
+    # One indexed query: the first subscription is read here to tell whether anyone is
+    # subscribed at all (None if not); the rest of the cursor streams to the consumer
+    recipients = iter_recipients(produce_type, region)
+    first = next(recipients, StopIteration)
+    if first is StopIteration:
+        return None
+    return itertools.chain([first], recipients)
+
+def rebuild_subscriptions(batch_size=1000):
+    db.alert_subscriptions.delete_many({})
+    count = 0
+    batch = []
+    for listing in db.produce_listings.find({"is_active": True}).batch_size(batch_size):
+        batch.append(listing)
+        if len(batch) >= batch_size:
+            count += _rebuild_batch(batch)
+            batch = []
+    if batch:
+        count += _rebuild_batch(batch)
+    return count
+
+def _rebuild_batch(listings):
+    farmer_ids = {listing['farmer_id'] for listing in listings}
+    farmers = {str(f['_id']): f for f in db.users.find(
+        {"_id": {"$in": [ObjectId(i) for i in farmer_ids if ObjectId.is_valid(i)]}},
+        {"contact_number": 1, "location": 1, "region": 1}
+    )}
+    ops = [_subscription_op(listing, farmers.get(listing['farmer_id'])) for listing in listings]
+    result = db.alert_subscriptions.bulk_write(ops, ordered=False)
+    return result.upserted_count
@@ -0,0 +1,90 @@
+import base64
+from datetime import datetime, timedelta
+from bson import json_util
+from config import Config
+from database import db
+
+# Delta sync for offline-first clients. Changes are read in (updated_at, _id) order; hard
+# deletes leave a tombstone ({collection, doc_id, deleted_at}) that a TTL index drops after
+# SYNC_TOMBSTONE_RETENTION_DAYS. Documents that went inactive (expired) are reported as
+# deletions too, so a client only ever holds live listings and requests.
+#
+# The cursor holds a keyset position for each stream and `since`, the time of the client's
+# first sync: documents that were already inactive before then are skipped, since the client
+# never received them. A position of [t, None] means "from t inclusive". Only changes older
+# than SYNC_SETTLE_SECONDS are returned, so a write stamped just before a sync but committed
+# just after it is not skipped.
+SYNC_SORT = [("updated_at", 1), ("_id", 1)]
+TOMBSTONE_SORT = [("deleted_at", 1), ("_id", 1)]
+
+class CursorExpired(Exception):
+    # The cursor predates tombstone retention; the client must drop its copy and resync
+    pass
+
+def record_tombstone(collection, doc_id):
+    db.tombstones.insert_one({"collection": collection, "doc_id": doc_id, "deleted_at": datetime.utcnow()})
+
+def encode_sync_cursor(state):
+    raw = json_util.dumps(state)
+    return base64.urlsafe_b64encode(raw.encode()).decode().rstrip('=')
+
+def decode_sync_cursor(token):
+    try:
+        state = json_util.loads(base64.urlsafe_b64decode(token + '=' * (-len(token) % 4)).decode())
+    except (ValueError, TypeError):
+        raise ValueError("Invalid sync cursor")
+    if not isinstance(state, dict) or not {'since', 'changes', 'tombstones'} <= state.keys():
+        raise ValueError("Invalid sync cursor")
+    return state
+
+def _page(collection, query, sort, position, limit, projection=None):
+    # Next `limit` documents strictly after `position` in a two-field ascending sort
+    if position is not None:
+        (first, second), (x, y) = [field for field, _ in sort], position
+        if y is None:
+            after = {first: {"$gte": x}}
+        else:
+            after = {"$or": [{first: {"$gt": x}}, {first: x, second: {"$gt": y}}]}
+        query = {"$and": [query, after]}
+    docs = list(collection.find(query, projection).sort(sort).limit(limit + 1))
+    return docs[:limit], len(docs) > limit
+
+def sync_changes(collection_name, token=None, limit=None):
+    limit = min(limit or Config.SYNC_PAGE_SIZE, Config.SYNC_MAX_PAGE_SIZE)
+    now = datetime.utcnow()
+    horizon = now - timedelta(seconds=Config.SYNC_SETTLE_SECONDS)
+    if token:
+        state = decode_sync_cursor(token)
+        if state['tombstones'][0] < now - timedelta(days=Config.SYNC_TOMBSTONE_RETENTION_DAYS):
+            raise CursorExpired("Sync cursor is older than tombstone retention; resync from scratch")
+    else:
+        state = {"since": horizon, "changes": None, "tombstones": [horizon, None]}
+
+    changes, more_changes = _page(
+        db[collection_name],
+        {"updated_at": {"$lt": horizon},
+         "$or": [{"is_active": True}, {"updated_at": {"$gte": state['since']}}]},
+        SYNC_SORT, state['changes'], limit
+    )
+    tombstones, more_tombstones = _page(
+        db.tombstones,
+        {"collection": collection_name, "deleted_at": {"$lt": horizon}},
+        TOMBSTONE_SORT, state['tombstones'], limit, {"doc_id": 1, "deleted_at": 1}
+    )
+
+    upserts, deleted = [], [t['doc_id'] for t in tombstones]
+    for doc in changes:
+        if doc.get('is_active', True):
+            upserts.append(doc)
+        else:
+            deleted.append(doc['_id'])
+    if changes:
+        state['changes'] = [changes[-1]['updated_at'], changes[-1]['_id']]
+    if more_tombstones:
+        state['tombstones'] = [tombstones[-1]['deleted_at'], tombstones[-1]['_id']]
+    else:
+        # Every tombstone before the horizon has been seen; this also keeps an idle client's
+        # cursor from aging past retention
+        state['tombstones'] = [horizon, None]
+    return {"upserts": upserts, "deleted": deleted, "has_more": more_changes or more_tombstones,
+            "cursor": encode_sync_cursor(state)}
@@ -0,0 +1,27 @@
+import os
+import sys
+import time
+import pytest
+
+# Tests run against an in-memory mongomock store (optional mongomock dependency); the settings
+# must be in place before config.py is first imported.
+os.environ['MONGO_URI'] = 'mongomock://localhost/agritech_test'
+os.environ['SMS_PROVIDER'] = 'local'
+os.environ['GEO_BACKEND'] = 'grid'
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+@pytest.fixture
+def db():
+    from database import get_client, get_db
+    import versions
+    database = get_db()
+    get_client().drop_database(database.name)
+    versions._local.clear() # Local copies of the counters that were just dropped
+    return database
+
+def wait_for(predicate, timeout=5.0):
+    deadline = time.monotonic() + timeout
+    while not predicate():
+        if time.monotonic() > deadline:
+            raise AssertionError("timed out waiting for condition")
+        time.sleep(0.005)
@@ -0,0 +1,96 @@
+import threading
+import time
+import pytest
+from admission import MemoryAdmissionStore, SQLiteAdmissionStore
+from ratelimit import TokenBucket, take_tokens
+
+def test_take_tokens_refills_up_to_capacity():
+    assert take_tokens(0, 0.0, 10.0, rate=1, capacity=5) == (True, 0.0, 4)
+    acquired, wait, left = take_tokens(0.5, 0.0, 0.0, rate=2, capacity=5)
+    assert not acquired and wait == pytest.approx(0.25) and left == 0.5
+    assert take_tokens(0, 0.0, 0.0, rate=0, capacity=5)[1] == float('inf')
+
+def test_token_bucket_burst_then_wait():
+    bucket = TokenBucket(rate=1000, capacity=3)
+    assert [bucket.try_acquire()[0] for _ in range(4)] == [True, True, True, False]
+    assert bucket.acquire(timeout=1)
+
+@pytest.fixture(params=['memory', 'sqlite'])
+def store(request, tmp_path):
+    if request.param == 'memory':
+        return MemoryAdmissionStore()
+    return SQLiteAdmissionStore(str(tmp_path / 'admission.db'))
+
+def test_store_buckets_are_per_key(store):
+    assert [store.take('user:a', 0.001, 2)[0] for _ in range(3)] == [True, True, False]
+    acquired, wait = store.take('user:a', 0.001, 2)
+    assert not acquired and wait > 0
+    assert store.take('user:b', 0.001, 2)[0]
+
+def test_store_slots_cap_and_release(store):
+    first = store.acquire_slot('match', 1, 0)
+    assert first is not None
+    assert store.acquire_slot('match', 1, 0) is None
+    assert store.acquire_slot('alert', 1, 0) is not None
+    threading.Timer(0.05, store.release_slot, ('match', first)).start()
+    start = time.monotonic()
+    assert store.acquire_slot('match', 1, 2) is not None
+    assert time.monotonic() - start < 1
+
+def test_sqlite_drops_refilled_buckets(tmp_path):
+    import sqlite3
+    path = str(tmp_path / 'admission.db')
+    store = SQLiteAdmissionStore(path)
+    for i in range(20):
+        store.take(f'user:{i}', 1000, 1)
+    time.sleep(0.01)
+    store.take('user:last', 1000, 1)
+    assert sqlite3.connect(path).execute("SELECT key FROM buckets").fetchall() == [('user:last',)]
+
+def test_store_sheds_past_max_waiters(store):
+    held = store.acquire_slot('match', 1, 0)
+    results = []
+    waiter = threading.Thread(target=lambda: results.append(store.acquire_slot('match', 1, 2, max_waiters=1)))
+    waiter.start()
+    time.sleep(0.1) # Let it join the queue
+    start = time.monotonic()
+    assert store.acquire_slot('match', 1, 2, max_waiters=1) is None
+    assert time.monotonic() - start < 0.5 # Shed at once instead of waiting out the timeout
+    store.release_slot('match', held)
+    waiter.join()
+    assert results[0] is not None
+
+@pytest.fixture
+def limits(monkeypatch):
+    import admission
+    from config import Config
+    monkeypatch.setattr(admission, '_store', MemoryAdmissionStore())
+    monkeypatch.setattr(Config, 'ADMISSION_ENDPOINT_CLASSES', {'match_route': 'match'})
+    monkeypatch.setattr(Config, 'ADMISSION_LIMITS', {'match': {"user_rate": 0.001, "user_burst": 1,
+                                                               "concurrency": 1, "max_waiters": 0}})
+    return admission
+
+def test_admit_takes_slot_before_charging_user(limits):
+    rejection, slot = limits.admit('match_route', 'user-a')
+    assert rejection is None and slot is not None
+    # Shed for capacity: user-b keeps its only token
+    rejection, _ = limits.admit('match_route', 'user-b')
+    assert rejection[0] == 503
+    limits.release(slot)
+    rejection, slot = limits.admit('match_route', 'user-b')
+    assert rejection is None
+    limits.release(slot)
+
+def test_admit_bucket_rejection_hands_slot_back(limits):
+    limits.release(limits.admit('match_route', 'user-a')[1])
+    rejection, slot = limits.admit('match_route', 'user-a')
+    assert rejection[0] == 429 and slot is None
+    # The slot taken before the bucket check was released, so another caller gets in
+    rejection, slot = limits.admit('match_route', 'user-b')
+    assert rejection is None
+    limits.release(slot)
+
+def test_default_limits_leave_threads_for_unlimited_endpoints():
+    from config import Config
+    held = sum(l['concurrency'] + l['max_waiters'] for l in Config.ADMISSION_LIMITS.values())
+    assert held < Config.WEB_THREADS
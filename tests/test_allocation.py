@@ -0,0 +1,41 @@
+import numpy as np
+from allocation import candidate_edges, solve_least_cost
+
+def _side(n, rng, price):
+    return {"lng": rng.uniform(36.7, 36.9, n), "lat": rng.uniform(-1.4, -1.2, n),
+            "qty": np.full(n, 10.0), "price": np.full(n, price), "units": ['kg'] * n,
+            "start": np.full(n, np.datetime64('2026-01-01')), "end": np.full(n, np.datetime64('2026-03-01'))}
+
+def _edges(listings, requests, **overrides):
+    params = dict(max_km=150, cell_km=25, max_edges=5, max_candidates=50, candidate_cell_km=2,
+                  block_size=100000, cost_per_km=0.05, price_tolerance=0.0)
+    params.update(overrides)
+    return candidate_edges(listings, requests, **params)
+
+def test_dense_region_costs_nearest_candidates_only():
+    rng = np.random.default_rng(1)
+    listings, requests = _side(400, rng, 50.0), _side(400, rng, 60.0)
+    edge_l, edge_r, edge_cost, edge_dist = _edges(listings, requests)
+    assert len(edge_l) == 400 * 5
+    # Candidates are picked per 2 km sub-cell, so a listing's edges stay close to it
+    assert edge_dist.max() < 10
+    # ...and listings in different sub-cells reach different requests
+    assert len(set(edge_r.tolist())) > 200
+
+def test_small_neighbourhood_is_costed_in_full():
+    rng = np.random.default_rng(2)
+    listings, requests = _side(20, rng, 50.0), _side(20, rng, 60.0)
+    edge_l, edge_r, _, _ = _edges(listings, requests, max_edges=20)
+    assert len(edge_l) == 20 * 20
+
+def test_infeasible_pairs_are_dropped():
+    rng = np.random.default_rng(3)
+    listings, requests = _side(10, rng, 70.0), _side(10, rng, 60.0)
+    assert len(_edges(listings, requests)[0]) == 0
+    assert len(_edges(listings, requests, price_tolerance=0.2)[0]) == 10 * 5
+
+def test_least_cost_respects_both_quantities():
+    edge_l, edge_r = np.array([0, 0, 1]), np.array([0, 1, 1])
+    assignments = solve_least_cost(np.array([5.0, 5.0]), np.array([3.0, 10.0]), edge_l, edge_r,
+                                   np.array([1.0, 2.0, 3.0]))
+    assert assignments == [(0, 3.0), (1, 2.0), (2, 5.0)]
@@ -0,0 +1,47 @@
+from datetime import datetime, timedelta
+import numpy as np
+import pytest
+import analytics
+import versions
+
+@pytest.fixture
+def rollups(db):
+    analytics._cache.clear()
+    start = datetime(2026, 1, 1)
+    docs = []
+    for region, base in (("Nairobi", 40.0), ("Mombasa", 50.0), ("Kisumu", 45.0)):
+        for day in range(30):
+            docs.append({"produce_type": "maize", "region": region, "period": "day",
+                         "period_start": start + timedelta(days=day), "close": base + day})
+    db.market_price_rollups.insert_many(docs)
+    return db
+
+def test_indicators():
+    values = np.array([1.0, 2.0, 3.0, 4.0])
+    assert analytics.moving_average(values, 2)[1:].tolist() == [1.5, 2.5, 3.5]
+    assert analytics.pct_change(values, 1)[1:].tolist() == [1.0, 0.5, pytest.approx(1 / 3)]
+    assert np.isnan(analytics.pct_change(np.array([0.0, 1.0]), 1)[1])
+
+def test_regional_spreads(rollups):
+    result = analytics.price_analytics("maize", "Nairobi", window=7, points=5)
+    assert result["latest"]["close"] == 69.0 and len(result["series"]["close"]) == 5
+    spreads = result["regional_spreads"]
+    assert spreads["mean"] == 74.0 and spreads["max_spread"] == 10.0
+    assert spreads["regions"]["Mombasa"] == {"close": 79.0, "spread": 5.0}
+
+def test_spreads_computed_once_per_produce_type_and_version(rollups, monkeypatch):
+    calls = []
+    compute = analytics._compute_regional_spreads
+    monkeypatch.setattr(analytics, "_compute_regional_spreads", lambda p: calls.append(p) or compute(p))
+    for region in ("Nairobi", "Mombasa", "Kisumu"):
+        analytics.price_analytics("maize", region)
+    analytics.price_analytics("maize", "Nairobi", window=14)
+    assert calls == ["maize"]
+
+    rollups.market_price_rollups.update_one({"region": "Nairobi", "period_start": datetime(2026, 1, 30)},
+                                            {"$set": {"close": 100.0}})
+    versions.bump('market_prices')
+    result = analytics.price_analytics("maize", "Nairobi")
+    assert calls == ["maize", "maize"]
+    assert result["latest"]["close"] == 100.0
+    assert result["regional_spreads"]["regions"]["Nairobi"]["close"] == 100.0
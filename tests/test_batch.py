@@ -0,0 +1,52 @@
+import pytest
+from bson.objectid import ObjectId
+from batch import apply_batch
+
+LISTING = {"produce_type": "maize", "quantity": 10, "unit": "kg", "price_per_unit": 40,
+           "available_from": "2026-01-01", "available_until": "2026-12-31"}
+
+@pytest.fixture
+def farmers(db):
+    ids = [db.users.insert_one({"email": f"f{i}@x.io", "user_type": "farmer", "contact_number": f"+25470000000{i}",
+                                "location": "Nakuru"}).inserted_id for i in range(2)]
+    return [str(i) for i in ids]
+
+def _statuses(report):
+    return [(r['op'], r['status']) for r in report['results']]
+
+def test_per_item_statuses(db, farmers):
+    mine, theirs = farmers
+    created = apply_batch('produce_listings', mine, [{"op": "create", "data": LISTING}])
+    own_id = created['results'][0]['id']
+    other_id = apply_batch('produce_listings', theirs, [{"op": "create", "data": LISTING}])['results'][0]['id']
+
+    report = apply_batch('produce_listings', mine, [
+        {"op": "update", "id": str(own_id), "data": {"price_per_unit": 45}},
+        {"op": "update", "id": str(other_id), "data": {"price_per_unit": 1}},
+        {"op": "deactivate", "id": str(ObjectId())},
+        {"op": "create", "data": {"produce_type": "maize"}},
+        {"op": "explode"},
+    ])
+    assert _statuses(report) == [("update", 200), ("update", 403), ("deactivate", 404), ("create", 400),
+                                 ("explode", 400)]
+    assert report['applied'] == 1 and report['failed'] == 4
+    assert db.produce_listings.find_one({"_id": own_id})['price_per_unit'] == 45
+    assert db.produce_listings.find_one({"_id": other_id})['price_per_unit'] == 40
+
+def test_nothing_is_stamped_on_documents(db, farmers):
+    report = apply_batch('produce_listings', farmers[0], [{"op": "create", "data": LISTING}])
+    doc_id = report['results'][0]['id']
+    apply_batch('produce_listings', farmers[0], [{"op": "deactivate", "id": str(doc_id)}])
+    assert set(db.produce_listings.find_one({"_id": doc_id})) & {"last_batch_id", "batch_id"} == set()
+
+def test_deactivation_removes_alert_subscription(db, farmers):
+    doc_id = apply_batch('produce_listings', farmers[0], [{"op": "create", "data": LISTING}])['results'][0]['id']
+    assert db.alert_subscriptions.count_documents({"_id": doc_id}) == 1
+    apply_batch('produce_listings', farmers[0], [{"op": "deactivate", "id": str(doc_id)}])
+    assert db.alert_subscriptions.count_documents({"_id": doc_id}) == 0
+
+def test_rejects_bad_batches(db, farmers):
+    with pytest.raises(ValueError):
+        apply_batch('produce_listings', farmers[0], [])
+    with pytest.raises(ValueError):
+        apply_batch('produce_listings', farmers[0], {"op": "create"})
@@ -0,0 +1,69 @@
+import pytest
+import catalog
+import versions
+from catalog import (SEED, CatalogIndex, canonical_produce_type, lookup_produce_type, normalize_key, search_produce,
+                     seed_catalog, verify)
+
+@pytest.fixture(autouse=True)
+def fresh_index(monkeypatch):
+    # Versions restart with every dropped database, so a cached index could look current
+    monkeypatch.setattr(catalog, '_index', None)
+
+@pytest.fixture
+def index():
+    return CatalogIndex([{"_id": produce_id, "name": name, "aliases": aliases, "verified": True}
+                         for produce_id, (name, aliases) in SEED.items()])
+
+def test_normalize_key():
+    assert normalize_key("  Mahíndi\tYA-Njano ") == "mahindi ya njano"
+    assert normalize_key("!!!") == ""
+
+def test_exact_alias_wins(index):
+    results = index.search("corn")
+    assert results[0]["id"] == "maize" and results[0]["match"] == "exact"
+
+def test_prefix_match(index):
+    results = index.search("toma")
+    assert results[0]["id"] == "tomatoes" and results[0]["match"] == "prefix"
+
+def test_fuzzy_match_tolerates_typos(index):
+    assert index.search("potatos")[0]["id"] == "potatoes"
+    assert index.search("cabage")[0]["id"] == "cabbages"
+
+def test_one_result_per_produce_and_limit(index):
+    ids = [r["id"] for r in index.search("ma", limit=3)]
+    assert len(ids) == len(set(ids)) <= 3
+    assert index.search("") == [] and index.search("zzzzqqq") == []
+
+def test_canonical_ids_on_write_and_read(db):
+    seed_catalog()
+    assert canonical_produce_type("  MAHINDI ") == "maize"
+    assert canonical_produce_type("Sukuma Wiki") == "sukuma-wiki"
+    assert lookup_produce_type("Corn") == "maize"
+    assert lookup_produce_type(None) is None
+    with pytest.raises(ValueError):
+        canonical_produce_type("!!!")
+
+def test_unknown_types_are_unverified_until_verified(db):
+    seed_catalog()
+    assert canonical_produce_type("Macadamia Nuts") == "macadamia-nuts"
+    assert lookup_produce_type("macadamia  nuts") == "macadamia-nuts"
+    assert db.produce_catalog.find_one({"_id": "macadamia-nuts"})["verified"] is False
+    assert search_produce("macadamia") == []
+    assert verify("macadamia-nuts") and not verify("no-such-type")
+    assert search_produce("macadamia")[0]["id"] == "macadamia-nuts"
+
+def test_seeding_verifies_a_previously_registered_type(db):
+    canonical_produce_type("Maize")
+    assert search_produce("maize") == []
+    seed_catalog()
+    assert search_produce("corn")[0]["id"] == "maize"
+
+def test_register_bumps_version_only_on_change(db):
+    seed_catalog()
+    version = versions.current('produce_catalog')
+    catalog.register("maize", "Maize", ["maize", "corn"], verified=True)
+    canonical_produce_type("corn")
+    assert versions.current('produce_catalog') == version
+    catalog.register("maize", "Maize", ["makaa"], verified=True)
+    assert versions.current('produce_catalog') == version + 1
@@ -0,0 +1,37 @@
+import math
+import random
+import pytest
+from geo import geohash_cover, geohash_encode, haversine_km, to_lng_lat
+
+def test_geohash_encode_known_value():
+    assert geohash_encode(-5.6, 42.6, 5) == 'ezs42'
+
+def test_to_lng_lat_accepts_common_shapes():
+    assert to_lng_lat({"type": "Point", "coordinates": [36.8, -1.3]}) == (36.8, -1.3)
+    assert to_lng_lat({"lat": -1.3, "lng": 36.8}) == (36.8, -1.3)
+    assert to_lng_lat([36.8, -1.3]) == (36.8, -1.3)
+    assert to_lng_lat([200, 0]) is None
+    assert to_lng_lat("Nakuru") is None
+
+def test_haversine_one_degree_of_latitude():
+    assert haversine_km((0, 0), (0, 1)) == pytest.approx(111.19, abs=0.01)
+
+def _point_at(lng, lat, distance_km, bearing):
+    # Destination point on a sphere
+    d = distance_km / 6371.0088
+    lat1, lng1, b = math.radians(lat), math.radians(lng), math.radians(bearing)
+    lat2 = math.asin(math.sin(lat1) * math.cos(d) + math.cos(lat1) * math.sin(d) * math.cos(b))
+    lng2 = lng1 + math.atan2(math.sin(b) * math.sin(d) * math.cos(lat1), math.cos(d) - math.sin(lat1) * math.sin(lat2))
+    return (math.degrees(lng2) + 540) % 360 - 180, math.degrees(lat2)
+
+@pytest.mark.parametrize('lng,lat,radius_km', [
+    (36.8, -1.3, 1), (36.8, -1.3, 25), (36.8, -1.3, 300), (179.9, 10, 50), (-179.95, -20, 10), (10, 70, 40)
+])
+def test_geohash_cover_contains_every_point_in_the_circle(lng, lat, radius_km):
+    cells = geohash_cover(lng, lat, radius_km)
+    assert len(cells) <= 9
+    rng = random.Random(1)
+    for _ in range(500):
+        point = _point_at(lng, lat, radius_km * math.sqrt(rng.random()), rng.uniform(0, 360))
+        code = geohash_encode(*point)
+        assert any(code.startswith(cell) for cell in cells), point
@@ -0,0 +1,45 @@
+import random
+import pytest
+from matching import TopMatches, parse_match_args, rank_listings, score_pair
+from config import Config
+
+REQUEST = {"_id": "r", "quantity_needed": 100, "target_price_per_unit": 50,
+           "delivery_location": {"type": "Point", "coordinates": [36.8, -1.3]}}
+
+def _listings(n, seed=7):
+    rng = random.Random(seed)
+    return [{"_id": i, "quantity": rng.choice([20, 50, 100, 150]), "price_per_unit": rng.choice([40, 50, 60]),
+             "location": {"type": "Point", "coordinates": [36.8 + rng.uniform(-1, 1), -1.3 + rng.uniform(-1, 1)]}}
+            for i in range(n)]
+
+def _full_sort(listings, max_distance_km=None):
+    scored = []
+    for seq, listing in enumerate(listings):
+        score, distance_km, _ = score_pair(listing, REQUEST)
+        if max_distance_km is None or (distance_km is not None and distance_km <= max_distance_km):
+            scored.append((score, -seq, listing['_id']))
+    return [listing_id for _, _, listing_id in sorted(scored, reverse=True)]
+
+@pytest.mark.parametrize('limit,offset,max_distance_km', [(5, 0, None), (10, 7, None), (3, 0, 40.0), (50, 190, None)])
+def test_top_matches_equals_full_sort_page(limit, offset, max_distance_km):
+    listings = _listings(200)
+    top = TopMatches(lambda listing: (listing, REQUEST), limit, offset, max_distance_km)
+    for listing in listings:
+        top.add(listing)
+    expected = _full_sort(listings, max_distance_km)
+    assert [item[2]['_id'] for item in top.ranked()] == expected[offset:offset + limit]
+    assert top.total == len(expected)
+    assert len(top.scored) <= offset + limit
+
+def test_rank_listings_shapes_results():
+    matches, total = rank_listings(REQUEST, _listings(30), limit=2)
+    assert total == 30 and len(matches) == 2
+    assert matches[0]['score'] >= matches[1]['score']
+    assert set(matches[0]['scores']) == {'distance', 'quantity', 'price'}
+
+def test_parse_match_args_bounds():
+    assert parse_match_args({}) == (Config.MATCH_PAGE_SIZE, 0, None)
+    assert parse_match_args({"limit": "10000", "offset": "10000000"}) == (Config.MATCH_MAX_PAGE_SIZE, Config.MATCH_MAX_OFFSET, None)
+    for args in ({"limit": "0"}, {"offset": "-1"}, {"limit": "x"}, {"max_distance_km": "nan"}, {"max_distance_km": "-5"}):
+        with pytest.raises(ValueError):
+            parse_match_args(args)
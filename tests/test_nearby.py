@@ -0,0 +1,47 @@
+import pytest
+from config import Config
+from geo import geohash_encode, haversine_km
+from nearby import _near_with_grid, find_nearby_listings
+
+CENTRE = (36.07, -0.30) # Nakuru
+
+def _listing(db, lng, lat, **fields):
+    doc = {"is_active": True, "produce_type": "maize", "price_per_unit": 40,
+           "available_from": "2026-01-01", "available_until": "2026-12-31",
+           "location": {"type": "Point", "coordinates": [lng, lat]}, "location_geohash": geohash_encode(lng, lat)}
+    doc.update(fields)
+    return db.produce_listings.insert_one(doc).inserted_id
+
+@pytest.fixture
+def listings(db):
+    ids = {
+        'near': _listing(db, 36.08, -0.30),
+        'mid': _listing(db, 36.20, -0.35),
+        'beans': _listing(db, 36.10, -0.31, produce_type="beans"),
+        'pricey': _listing(db, 36.09, -0.29, price_per_unit=90),
+        'inactive': _listing(db, 36.07, -0.30, is_active=False),
+        'far': _listing(db, 36.82, -1.29), # Nairobi, ~140 km
+    }
+    return ids
+
+def test_grid_returns_listings_in_radius_nearest_first(listings):
+    results = _near_with_grid(CENTRE, 25, {"is_active": True}, 10, 0)
+    assert [r['_id'] for r in results] == [listings['near'], listings['pricey'], listings['beans'], listings['mid']]
+    distances = [r['distance_km'] for r in results]
+    assert distances == sorted(distances) and distances[-1] <= 25
+    assert results[0]['distance_km'] == pytest.approx(haversine_km(CENTRE, (36.08, -0.30)), abs=1e-3)
+
+def test_grid_applies_filters_and_pages(listings, monkeypatch):
+    monkeypatch.setattr(Config, 'GEO_BACKEND', 'grid')
+    results = find_nearby_listings(CENTRE, 25, produce_type="maize", max_price=50)
+    assert [r['_id'] for r in results] == [listings['near'], listings['mid']]
+    page = find_nearby_listings(CENTRE, 25, limit=2, offset=1)
+    assert [r['_id'] for r in page] == [listings['pricey'], listings['beans']]
+    assert listings['far'] in [r['_id'] for r in find_nearby_listings(CENTRE, 200)]
+
+def test_grid_availability_window_overlaps(db):
+    early = _listing(db, 36.08, -0.30, available_from="2026-01-01", available_until="2026-02-01")
+    late = _listing(db, 36.08, -0.30, available_from="2026-06-01", available_until="2026-07-01")
+    results = _near_with_grid(CENTRE, 5, {"is_active": True, "available_until": {"$gte": "2026-05-01"}}, 10, 0)
+    assert [r['_id'] for r in results] == [late]
+    assert early not in [r['_id'] for r in results]
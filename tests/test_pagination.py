@@ -0,0 +1,40 @@
+from datetime import datetime, timedelta
+import pytest
+from bson.objectid import ObjectId
+from pagination import decode_cursor, encode_cursor, keyset_filter, parse_fields
+
+SORT = [("date_recorded", -1), ("_id", -1)]
+
+def test_cursor_round_trips_bson_types():
+    doc = {"_id": ObjectId(), "date_recorded": datetime(2026, 5, 1, 12, 30)}
+    sort = [("date_recorded", -1), ("_id", -1)]
+    assert decode_cursor(encode_cursor(doc, sort), sort) == [doc['date_recorded'], doc['_id']]
+
+@pytest.mark.parametrize('token', ['not base64!', 'e30', encode_cursor({"a": 1}, [("a", 1)])])
+def test_invalid_cursor_is_a_value_error(token):
+    with pytest.raises(ValueError):
+        decode_cursor(token, SORT)
+
+def test_keyset_filter_without_cursor_keeps_query():
+    assert keyset_filter({"region": "Nakuru"}, SORT, None) == {"region": "Nakuru"}
+
+def test_keyset_pages_match_full_sort_with_ties(db):
+    start = datetime(2026, 1, 1)
+    # Several documents per sort value, so the _id tie-breaker matters
+    db.prices.insert_many([{"date_recorded": start + timedelta(days=i // 3), "region": "Nakuru" if i % 2 else "Eldoret"}
+                           for i in range(25)])
+    query = {"region": "Nakuru"}
+    expected = [d['_id'] for d in db.prices.find(query).sort(SORT)]
+    seen, after = [], None
+    while True:
+        page = list(db.prices.find(keyset_filter(query, SORT, after)).sort(SORT).limit(4))
+        if not page:
+            break
+        seen.extend(d['_id'] for d in page)
+        after = decode_cursor(encode_cursor(page[-1], SORT), SORT)
+    assert seen == expected
+
+def test_parse_fields_always_includes_sort_keys():
+    assert parse_fields("price, region", SORT) == {"price": 1, "region": 1, "date_recorded": 1, "_id": 1}
+    with pytest.raises(ValueError):
+        parse_fields("$where", SORT)
@@ -0,0 +1,86 @@
+import pytest
+from conftest import wait_for
+from sms_queue import LocalSMSProvider, SMSQueue
+
+def make_queue(provider, **kwargs):
+    kwargs.setdefault('workers', 2)
+    kwargs.setdefault('rate', 10000)
+    kwargs.setdefault('backoff', 0.001)
+    return SMSQueue(provider, **kwargs)
+
+def finished(queue, job_id):
+    return lambda: queue.job_status(job_id)['state'] in ('completed', 'failed')
+
+def test_sends_each_number_once():
+    provider = LocalSMSProvider()
+    queue = make_queue(provider)
+    job_id = queue.enqueue(['+1', '+2', '+1', None, '', '+3'], "hello")
+    wait_for(finished(queue, job_id))
+    job = queue.job_status(job_id)
+    assert (job['state'], job['total'], job['sent'], job['failed']) == ('completed', 3, 3, 0)
+    assert sorted(to for to, _ in provider.sent) == ['+1', '+2', '+3']
+
+def test_gives_up_after_max_retries():
+    queue = make_queue(LocalSMSProvider(failure_rate=1.0), max_retries=2)
+    job_id = queue.enqueue(['+1', '+2'], "hello")
+    wait_for(finished(queue, job_id))
+    job = queue.job_status(job_id)
+    assert (job['state'], job['sent'], job['failed']) == ('completed', 0, 2)
+    assert queue.stats()['retried'] == 4
+
+def test_retry_succeeds_once_provider_recovers():
+    provider = LocalSMSProvider(failure_rate=1.0)
+    queue = make_queue(provider, max_retries=5, backoff=0.05)
+    job_id = queue.enqueue(['+1'], "hello")
+    wait_for(lambda: queue.stats()['retried'] >= 1)
+    provider.failure_rate = 0.0
+    wait_for(finished(queue, job_id))
+    job = queue.job_status(job_id)
+    assert (job['state'], job['sent'], job['failed']) == ('completed', 1, 0)
+
+def test_skips_numbers_that_already_got_the_message():
+    queue = make_queue(LocalSMSProvider())
+    first = queue.enqueue(['+1', '+2'], "hello")
+    wait_for(finished(queue, first))
+    second = queue.enqueue(['+1', '+2', '+3'], "hello")
+    wait_for(finished(queue, second))
+    job = queue.job_status(second)
+    assert (job['sent'], job['deduplicated']) == (1, 2)
+
+def test_dedupe_key_joins_only_in_flight_jobs():
+    provider = LocalSMSProvider(latency=0.2, failure_rate=1.0)
+    queue = make_queue(provider, max_retries=0)
+    first = queue.enqueue(['+1'], "alert", dedupe_key='alert')
+    assert queue.enqueue(['+1'], "alert", dedupe_key='alert') == first
+    wait_for(finished(queue, first))
+    assert queue.job_status(first)['failed'] == 1
+
+    # After the outage the same alert is a new job and is delivered
+    provider.failure_rate = 0.0
+    again = queue.enqueue(['+1'], "alert", dedupe_key='alert')
+    assert again != first
+    wait_for(finished(queue, again))
+    assert queue.job_status(again)['sent'] == 1
+
+def test_recipient_errors_fail_the_job_but_not_the_worker():
+    def recipients():
+        yield '+1'
+        raise RuntimeError("cursor died")
+
+    queue = make_queue(LocalSMSProvider(), workers=1)
+    broken = queue.enqueue(recipients(), "hello")
+    wait_for(lambda: queue.job_status(broken)['state'] == 'failed')
+    assert queue.job_status(broken)['error'] == "cursor died"
+
+    job_id = queue.enqueue(['+2'], "hello")
+    wait_for(finished(queue, job_id))
+    assert queue.job_status(job_id)['state'] == 'completed'
+    wait_for(lambda: queue.job_status(broken)['sent'] == 1)
+
+@pytest.mark.parametrize('failure_rate', [0.0, 1.0])
+def test_counters_add_up(failure_rate):
+    queue = make_queue(LocalSMSProvider(failure_rate=failure_rate), max_retries=1)
+    job_id = queue.enqueue([f"+{i}" for i in range(120)], "hello")
+    wait_for(finished(queue, job_id))
+    job = queue.job_status(job_id)
+    assert job['total'] == 120 and job['sent'] + job['failed'] == 120
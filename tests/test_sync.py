@@ -0,0 +1,67 @@
+import time
+from datetime import datetime, timedelta
+import pytest
+from config import Config
+from sync import CursorExpired, decode_sync_cursor, encode_sync_cursor, record_tombstone, sync_changes
+
+@pytest.fixture(autouse=True)
+def no_settle_delay(monkeypatch):
+    monkeypatch.setattr(Config, 'SYNC_SETTLE_SECONDS', 0)
+
+def _insert(db, n, start):
+    docs = [{"produce_type": "maize", "is_active": True, "updated_at": start + timedelta(seconds=i // 2)}
+            for i in range(n)]
+    return db.produce_listings.insert_many(docs).inserted_ids
+
+def _drain(token, limit):
+    upserts, deleted = [], []
+    while True:
+        page = sync_changes('produce_listings', token, limit)
+        upserts += [doc['_id'] for doc in page['upserts']]
+        deleted += page['deleted']
+        token = page['cursor']
+        if not page['has_more']:
+            return upserts, deleted, token
+
+def test_initial_sync_pages_through_everything_once(db):
+    ids = _insert(db, 11, datetime.utcnow() - timedelta(minutes=5))
+    upserts, deleted, _ = _drain(None, 3)
+    assert upserts == ids and deleted == []
+
+def test_incremental_sync_reports_updates_deletes_and_expiry(db):
+    ids = _insert(db, 4, datetime.utcnow() - timedelta(minutes=5))
+    _, _, token = _drain(None, 10)
+
+    time.sleep(0.01) # Changes land after the first sync's horizon
+    now = datetime.utcnow()
+    db.produce_listings.update_one({"_id": ids[0]}, {"$set": {"quantity": 5, "updated_at": now}})
+    db.produce_listings.update_one({"_id": ids[1]}, {"$set": {"is_active": False, "updated_at": now}})
+    db.produce_listings.delete_one({"_id": ids[2]})
+    record_tombstone('produce_listings', ids[2])
+
+    time.sleep(0.01)
+    upserts, deleted, token = _drain(token, 10)
+    assert upserts == [ids[0]]
+    assert sorted(deleted) == sorted([ids[1], ids[2]])
+    assert _drain(token, 10)[:2] == ([], [])
+
+def test_first_sync_skips_documents_already_inactive(db):
+    db.produce_listings.insert_one({"is_active": False, "updated_at": datetime.utcnow() - timedelta(days=1)})
+    assert _drain(None, 10)[:2] == ([], [])
+
+def test_tombstones_of_other_collections_are_ignored(db):
+    _, _, token = _drain(None, 10)
+    record_tombstone('buyer_requests', 'x')
+    time.sleep(0.01)
+    assert _drain(token, 10)[1] == []
+
+def test_old_cursor_expires(db):
+    old = datetime.utcnow() - timedelta(days=Config.SYNC_TOMBSTONE_RETENTION_DAYS + 1)
+    token = encode_sync_cursor({"since": old, "changes": None, "tombstones": [old, None]})
+    with pytest.raises(CursorExpired):
+        sync_changes('produce_listings', token)
+
+@pytest.mark.parametrize('token', ['garbage', encode_sync_cursor({"since": 1})])
+def test_invalid_cursor(token):
+    with pytest.raises(ValueError):
+        decode_sync_cursor(token)
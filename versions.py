@@ -0,0 +1,36 @@
+import threading
+import time
+from pymongo import ReturnDocument
+from config import Config
+from database import db
+
+# Per-collection change counters stored in `collection_versions` ({_id: <collection>, version: n}).
+# Every write path bumps the counter of the collection it touched; readers compare versions
+# instead of re-querying. Each process keeps a local copy and only re-reads a counter from
+# Mongo once it is older than VERSION_CHECK_INTERVAL, so a write made by another worker is
+# seen at most that many seconds late; writes made by this process are seen immediately.
+_local = {} # collection -> (version, checked_at)
+_lock = threading.Lock()
+
+def bump(collection):
+    doc = db.collection_versions.find_one_and_update(
+        {"_id": collection},
+        {"$inc": {"version": 1}},
+        upsert=True,
+        return_document=ReturnDocument.AFTER
+    )
+    with _lock:
+        _local[collection] = (doc['version'], time.monotonic())
+    return doc['version']
+
+def current(collection):
+    now = time.monotonic()
+    with _lock:
+        entry = _local.get(collection)
+    if entry is not None and now - entry[1] < Config.VERSION_CHECK_INTERVAL:
+        return entry[0]
+    doc = db.collection_versions.find_one({"_id": collection})
+    version = doc['version'] if doc else 0
+    with _lock:
+        _local[collection] = (version, now)
+    return version